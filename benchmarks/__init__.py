@@ -0,0 +1,4 @@
+"""
+Benchmarks Package
+حزمة قياس الأداء
+"""
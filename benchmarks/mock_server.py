@@ -0,0 +1,387 @@
+"""
+Mock Platform Server
+خادم محاكاة للمنصات
+
+Local HTTP stand-in for the Graph (Facebook/Instagram), TikTok and YouTube
+endpoints used by the publishers, with configurable latency, error rate and
+throttling
+"""
+
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+GRAPH_PATH = re.compile(r'^/v[\d.]+/(?P<node>[^/]+)(?:/(?P<edge>[^/]+))?/?$')
+MULTIPART_FIELD = re.compile(
+    rb'Content-Disposition: form-data; name="([^"]+)"\r\n\r\n(.*?)\r\n--', re.DOTALL
+)
+CONTENT_RANGE = re.compile(r'bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)')
+
+
+def form_fields(body, content_type):
+    """
+    Extract the non-file fields of a urlencoded or multipart request body
+    
+    Args:
+        body (bytes): Request body
+        content_type (str): Content-Type header
+    
+    Returns:
+        dict: field -> value
+    """
+    if content_type.startswith('multipart/form-data'):
+        return {
+            name.decode(): value.decode('utf-8', 'replace')
+            for name, value in MULTIPART_FIELD.findall(body)
+        }
+    if content_type.startswith('application/json'):
+        try:
+            return json.loads(body or b'{}')
+        except ValueError:
+            return {}
+    return {key: values[0] for key, values in parse_qs(body.decode('utf-8', 'replace')).items()}
+
+
+class MockServer:
+    """Threaded mock of the platform APIs / خادم محاكاة متعدد الخيوط"""
+    
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 rate_limit=0, chunk_size=8 * 1024 * 1024, processing_polls=0):
+        """
+        Initialize mock server
+        
+        Args:
+            host (str): Bind address
+            port (int): Bind port (0 = any free port)
+            latency (float): Seconds added to every response
+            jitter (float): Random extra latency, up to this many seconds
+            error_rate (float): Fraction of requests answered with a transient 500
+            rate_limit (float): Requests/second before throttling (0 = unlimited)
+            chunk_size (int): Chunk size dictated to resumable uploads
+            processing_polls (int): Status checks for which a new media
+                container reports IN_PROGRESS before FINISHED
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.chunk_size = chunk_size
+        self.processing_polls = processing_polls
+        
+        self.stats = {'requests': 0, 'bytes_in': 0, 'errors': 0, 'throttled': 0, 'status_checks': 0,
+                      'token_refreshes': 0}
+        self._ids = itertools.count(1)
+        self._uploads = {}
+        self._containers = {}
+        self._lock = threading.Lock()
+        self._tokens = float(rate_limit)
+        self._refilled = time.monotonic()
+        
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self._thread = None
+    
+    @property
+    def url(self):
+        """Base URL of the server"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self):
+        """Serve requests in a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='mock-server', daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Stop serving"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+    
+    def next_id(self):
+        return next(self._ids)
+    
+    def reset_stats(self):
+        with self._lock:
+            for key in self.stats:
+                self.stats[key] = 0
+    
+    def admit(self, body_size):
+        """
+        Account for a request and decide whether to fail or throttle it
+        
+        Returns:
+            str: None, 'error' or 'throttle'
+        """
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['bytes_in'] += body_size
+            
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+                self._refilled = now
+                if self._tokens < 1:
+                    self.stats['throttled'] += 1
+                    return 'throttle'
+                self._tokens -= 1
+            
+            if self.error_rate and random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 'error'
+        return None
+    
+    def container_status(self, container_id):
+        """
+        Status of a media container, counting the check
+        
+        Returns:
+            dict: Graph container status fields
+        """
+        with self._lock:
+            self.stats['status_checks'] += 1
+            polls = self._containers.get(container_id, self.processing_polls)
+            if polls < self.processing_polls:
+                self._containers[container_id] = polls + 1
+                return {'id': container_id, 'status_code': 'IN_PROGRESS', 'status': 'In Progress'}
+            self._containers.pop(container_id, None)
+        return {'id': container_id, 'status_code': 'FINISHED', 'status': 'Finished: Media has been uploaded'}
+    
+    def usage_percent(self):
+        """Approximate quota use reported in X-App-Usage"""
+        if not self.rate_limit:
+            return 0
+        with self._lock:
+            return int(100 * (1 - max(0.0, self._tokens) / self.rate_limit))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Routes requests to the mocked endpoints"""
+    
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    
+    def log_message(self, format, *args):
+        pass
+    
+    @property
+    def mock(self):
+        return self.server.mock
+    
+    def do_GET(self):
+        self._handle('GET')
+    
+    def do_POST(self):
+        self._handle('POST')
+    
+    def do_PUT(self):
+        self._handle('PUT')
+    
+    def _send(self, status, body=None, headers=None):
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('X-App-Usage', json.dumps({
+            'call_count': self.mock.usage_percent(), 'total_time': 0, 'total_cputime': 0
+        }))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def _handle(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        
+        delay = self.mock.latency + (random.random() * self.mock.jitter if self.mock.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        
+        parts = urlsplit(self.path)
+        path = parts.path
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        graph = not path.startswith(('/v2/', '/tiktok/', '/upload/youtube/'))
+        
+        verdict = self.mock.admit(len(body))
+        if verdict == 'throttle':
+            if graph:
+                return self._send(400, {'error': {
+                    'message': '(#4) Application request limit reached', 'type': 'OAuthException', 'code': 4
+                }})
+            return self._send(429, {'error': {'code': 'rate_limit_exceeded', 'message': 'Too many requests'}},
+                              {'Retry-After': '1'})
+        if verdict == 'error':
+            if graph:
+                return self._send(500, {'error': {
+                    'message': 'An unexpected error has occurred', 'code': 2, 'is_transient': True
+                }})
+            return self._send(503, {'error': {'code': 'internal_error', 'message': 'Service unavailable'}})
+        
+        fields = form_fields(body, self.headers.get('Content-Type', '')) if method == 'POST' else {}
+        fields.update(query)
+        
+        if path == '/v2/oauth/token/':
+            return self._tiktok_token(fields)
+        if path.startswith('/v2/post/publish/'):
+            return self._tiktok(path, fields)
+        if path.startswith('/tiktok/upload/'):
+            return self._tiktok_upload(path, len(body))
+        if path.startswith('/upload/youtube/'):
+            return self._youtube(method, query, len(body))
+        if path.strip('/') == '' or re.fullmatch(r'/v[\d.]+/?', path):
+            if method == 'GET' and 'ids' in query:
+                return self._send(200, {
+                    container_id: self.mock.container_status(container_id)
+                    for container_id in query['ids'].split(',')
+                })
+            return self._graph_batch(fields)
+        
+        match = GRAPH_PATH.match(path)
+        if not match:
+            return self._send(404, {'error': {'message': f'Unknown path {path}', 'code': 803}})
+        return self._graph(method, match.group('node'), match.group('edge'), fields)
+    
+    # --- Graph API (Facebook / Instagram) -----------------------------------
+    
+    def _graph(self, method, node, edge, fields):
+        new_id = self.mock.next_id()
+        
+        if method == 'GET' and edge is None:
+            # Instagram container status
+            return self._send(200, self.mock.container_status(node))
+        if edge == 'feed':
+            return self._send(200, {'id': f'{node}_{new_id}'})
+        if edge == 'photos':
+            return self._send(200, {'id': str(new_id), 'post_id': f'{node}_{new_id}'})
+        if edge == 'videos':
+            return self._graph_video(fields, new_id)
+        if edge == 'media':
+            with self.mock._lock:
+                self.mock._containers[str(new_id)] = 0
+            return self._send(200, {'id': str(new_id)})
+        if edge == 'media_publish':
+            return self._send(200, {'id': str(new_id)})
+        return self._send(400, {'error': {'message': f'Unsupported edge {edge}', 'code': 100}})
+    
+    def _graph_video(self, fields, new_id):
+        phase = fields.get('upload_phase')
+        chunk = self.mock.chunk_size
+        
+        if phase == 'start':
+            size = int(fields.get('file_size', 0))
+            session = str(new_id)
+            with self.mock._lock:
+                self.mock._uploads[session] = size
+            return self._send(200, {
+                'upload_session_id': session, 'video_id': str(new_id),
+                'start_offset': '0', 'end_offset': str(min(chunk, size))
+            })
+        if phase == 'transfer':
+            size = self.mock._uploads.get(fields.get('upload_session_id'), 0)
+            start = min(int(fields.get('start_offset', 0)) + chunk, size)
+            return self._send(200, {'start_offset': str(start), 'end_offset': str(min(start + chunk, size))})
+        if phase == 'finish':
+            with self.mock._lock:
+                self.mock._uploads.pop(fields.get('upload_session_id'), None)
+            return self._send(200, {'success': True})
+        return self._send(200, {'id': str(new_id)})
+    
+    def _graph_batch(self, fields):
+        try:
+            operations = json.loads(fields.get('batch', '[]'))
+        except ValueError:
+            return self._send(400, {'error': {'message': 'Invalid batch', 'code': 100}})
+        
+        responses = []
+        for operation in operations:
+            new_id = self.mock.next_id()
+            node = operation.get('relative_url', '').split('/')[0]
+            responses.append({
+                'code': 200,
+                'headers': [],
+                'body': json.dumps({'id': str(new_id), 'post_id': f'{node}_{new_id}'})
+            })
+        return self._send(200, responses)
+    
+    # --- TikTok --------------------------------------------------------------
+    
+    def _tiktok(self, path, fields):
+        if path.endswith('/status/fetch/'):
+            status = self.mock.container_status(str(fields.get('publish_id')))
+            data = {'status': 'PROCESSING_UPLOAD'}
+            if status['status_code'] == 'FINISHED':
+                data = {'status': 'PUBLISH_COMPLETE', 'publicaly_available_post_id': [self.mock.next_id()]}
+            return self._send(200, {'data': data, 'error': {'code': 'ok', 'message': ''}})
+        
+        publish_id = f'v_pub_{self.mock.next_id()}'
+        data = {'publish_id': publish_id}
+        source = fields.get('source_info') or {}
+        if isinstance(source, dict) and source.get('source') == 'FILE_UPLOAD':
+            data['upload_url'] = f"{self.mock.url}/tiktok/upload/{publish_id}"
+            with self.mock._lock:
+                self.mock._uploads[publish_id] = 0
+        with self.mock._lock:
+            self.mock._containers[publish_id] = 0
+        return self._send(200, {'data': data, 'error': {'code': 'ok', 'message': ''}})
+    
+    def _tiktok_token(self, fields):
+        if fields.get('grant_type') != 'refresh_token' or not fields.get('refresh_token'):
+            return self._send(400, {'error': 'invalid_request', 'error_description': 'Missing refresh token'})
+        with self.mock._lock:
+            self.mock.stats['token_refreshes'] += 1
+        token_id = self.mock.next_id()
+        return self._send(200, {
+            'access_token': f'act.{token_id}', 'expires_in': 86400,
+            'refresh_token': f'rft.{token_id}', 'refresh_expires_in': 31536000, 'token_type': 'Bearer'
+        })
+    
+    def _tiktok_upload(self, path, length):
+        match = CONTENT_RANGE.match(self.headers.get('Content-Range', ''))
+        if not match or match.group(1) is None:
+            return self._send(416, {'error': {'code': 'invalid_range'}})
+        end, total = int(match.group(2)), int(match.group(3))
+        return self._send(201 if end + 1 >= total else 206)
+    
+    # --- YouTube -------------------------------------------------------------
+    
+    def _youtube(self, method, query, length):
+        if method == 'POST':
+            upload_id = f'yt_up_{self.mock.next_id()}'
+            with self.mock._lock:
+                self.mock._uploads[upload_id] = 0
+            return self._send(200, headers={
+                'Location': f"{self.mock.url}/upload/youtube/v3/videos?uploadType=resumable&upload_id={upload_id}"
+            })
+        
+        upload_id = query.get('upload_id')
+        if upload_id not in self.mock._uploads:
+            return self._send(404, {'error': {'code': 404, 'message': 'Upload session not found'}})
+        
+        match = CONTENT_RANGE.match(self.headers.get('Content-Range', ''))
+        received = self.mock._uploads[upload_id]
+        if match and match.group(1) is not None:
+            received = int(match.group(2)) + 1
+            with self.mock._lock:
+                self.mock._uploads[upload_id] = received
+        total = match.group(3) if match else '*'
+        
+        if total != '*' and received >= int(total):
+            with self.mock._lock:
+                self.mock._uploads.pop(upload_id, None)
+            return self._send(200, {'id': f'yt_{self.mock.next_id()}', 'status': {'uploadStatus': 'uploaded'}})
+        headers = {'Range': f'bytes=0-{received - 1}'} if received else {}
+        return self._send(308, headers=headers)
@@ -0,0 +1,378 @@
+"""
+Benchmark Harness
+أداة قياس أداء النشر
+
+Drives the publishers against the local mock server at several concurrency
+levels and writes throughput, latency, upload speed and memory figures to a
+JSON file that can be compared across releases
+
+Usage:
+    python -m benchmarks.run --concurrency 1,4,16 --posts 200 --latency 0.02
+    python -m benchmarks.run --baseline benchmarks/results/previous.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add project root to path
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from config import Config
+from benchmarks.mock_server import MockServer
+
+
+SCENARIOS = ['facebook_text', 'facebook_image', 'facebook_batch', 'facebook_video', 'instagram_video',
+             'tiktok_video', 'youtube_video', 'post_to_all_text', 'post_to_all_video']
+
+
+class BenchmarkCredentials:
+    """Never-expiring OAuth credentials accepted by the mock server"""
+    
+    valid = True
+    token = 'benchmark-token'
+
+
+def make_video(path, size_mb, duration=60):
+    """
+    Write a minimal MP4 (ftyp + mdat + moov) that passes video validation
+    
+    Args:
+        path (str): Output path
+        size_mb (float): Approximate file size in MB
+        duration (int): Duration written to the movie header, in seconds
+    """
+    def box(box_type, payload):
+        return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+    
+    def full_box(box_type, payload):
+        return box(box_type, b'\0\0\0\0' + payload)
+    
+    mvhd = full_box(b'mvhd', struct.pack('>IIII', 0, 0, 1000, duration * 1000) + b'\0' * 80)
+    tkhd = full_box(b'tkhd', b'\0' * 72 + struct.pack('>II', 1280 << 16, 720 << 16))
+    hdlr = full_box(b'hdlr', b'\0' * 4 + b'vide' + b'\0' * 13)
+    stsd = full_box(b'stsd', struct.pack('>I', 1) + box(b'avc1', b'\0' * 78))
+    trak = box(b'trak', tkhd + box(b'mdia', hdlr + box(b'minf', box(b'stbl', stsd))))
+    moov = box(b'moov', mvhd + trak)
+    
+    payload_size = max(0, int(size_mb * 1024 * 1024) - 64 - len(moov))
+    with open(path, 'wb') as f:
+        f.write(box(b'ftyp', b'isom\0\0\0\0'))
+        f.write(struct.pack('>I4s', 8 + payload_size, b'mdat'))
+        block = os.urandom(1024 * 1024)
+        remaining = payload_size
+        while remaining > 0:
+            f.write(block[:remaining])
+            remaining -= len(block)
+        f.write(moov)
+
+
+class RssSampler:
+    """Samples the process's resident set size in the background"""
+    
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @staticmethod
+    def current():
+        """Current RSS in bytes (0 where /proc is unavailable)"""
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError):
+            return 0
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(self.interval)
+    
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def configure(server, args, work_dir):
+    """Point the publishers at the mock server and silence per-post logging"""
+    Config.FACEBOOK_ACCESS_TOKEN = 'benchmark-token'
+    Config.FACEBOOK_PAGE_ID = '1000'
+    Config.FACEBOOK_GRAPH_URL = f"{server.url}/v18.0"
+    Config.FACEBOOK_CHUNKED_UPLOAD_MB = args.chunked_mb
+    Config.INSTAGRAM_ACCESS_TOKEN = 'benchmark-token'
+    Config.INSTAGRAM_ACCOUNT_ID = '2000'
+    Config.INSTAGRAM_GRAPH_URL = f"{server.url}/v18.0"
+    Config.TIKTOK_ACCESS_TOKEN = 'benchmark-token'
+    Config.TIKTOK_API_URL = server.url
+    Config.TIKTOK_UPLOAD_CHUNK_MB = args.tiktok_chunk_mb
+    Config.TIKTOK_UPLOAD_WORKERS = args.tiktok_workers
+    Config.YOUTUBE_UPLOAD_URL = f"{server.url}/upload/youtube/v3/videos"
+    Config.YOUTUBE_CREDENTIALS_PICKLE = str(Path(work_dir) / 'youtube_credentials.pickle')
+    Config.POLL_INTERVAL = args.poll_interval
+    Config.POLL_MAX_INTERVAL = args.poll_interval * 4
+    Config.MEDIA_CACHE_ENABLED = False
+    Config.RATE_LIMIT_ENABLED = args.client_rate_limit
+    Config.UPLOAD_STATE_DIR = str(Path(work_dir) / 'upload_state')
+    Config.POST_HISTORY_DB = str(Path(work_dir) / 'post_history.db')
+    Config.LOG_FILE = str(Path(work_dir) / 'benchmark.log')
+    Config.LOG_LEVEL = 'WARNING'
+    Config.HTTP_POOL_MAXSIZE = max(Config.HTTP_POOL_MAXSIZE, max(args.concurrency))
+
+
+def build_operations(args, video_path):
+    """Map scenario names to (callable(i), bytes uploaded per call, posts per call)"""
+    from main import SocialMediaAutomation, LOCAL_VIDEO_PLATFORMS
+    from platforms.facebook_publisher import FacebookPublisher
+    from platforms.instagram_publisher import InstagramPublisher
+    from platforms.tiktok_publisher import TikTokPublisher
+    from platforms.youtube_publisher import YouTubePublisher
+    
+    facebook = FacebookPublisher()
+    instagram = InstagramPublisher()
+    tiktok = TikTokPublisher()
+    youtube = YouTubePublisher(credentials=BenchmarkCredentials())
+    automation = SocialMediaAutomation()
+    automation.facebook = facebook
+    automation.instagram = instagram
+    automation.tiktok = tiktok
+    automation.youtube = youtube
+    video_bytes = os.path.getsize(video_path)
+    
+    return {
+        'facebook_text': (lambda i: facebook.post_text(f"Benchmark post {i}"), 0, 1),
+        'facebook_image': (
+            lambda i: facebook.post_image(f"Benchmark image {i}", 'https://example.com/image.jpg'), 0, 1
+        ),
+        'facebook_batch': (
+            lambda i: {'success': all(r['success'] for r in facebook.post_text_batch(
+                [f"Batch {i}-{n}" for n in range(args.batch_size)]
+            ))},
+            0,
+            args.batch_size
+        ),
+        'facebook_video': (lambda i: facebook.post_video(video_path, f"Benchmark video {i}"), video_bytes, 1),
+        'instagram_video': (
+            lambda i: instagram.post_video('https://example.com/reel.mp4', f"Benchmark reel {i}"), 0, 1
+        ),
+        'tiktok_video': (lambda i: tiktok.post_video(video_path, f"Benchmark video {i}"), video_bytes, 1),
+        'youtube_video': (
+            lambda i: youtube.upload_video(video_path, f"Benchmark video {i}", "Benchmark"), video_bytes, 1
+        ),
+        'post_to_all_text': (
+            lambda i: {'success': all(r.get('success') for r in automation.post_to_all(
+                'text', message=f"Benchmark post {i}"
+            ).values())},
+            0,
+            1
+        ),
+        'post_to_all_video': (
+            lambda i: {'success': all(r.get('success') for r in automation.post_to_all(
+                'video', concurrent=True, video_path=video_path, video_url='https://example.com/reel.mp4',
+                title=f"Benchmark video {i}", message=f"Benchmark video {i}"
+            ).values())},
+            video_bytes * len(LOCAL_VIDEO_PLATFORMS),
+            1
+        )
+    }
+
+
+def run_scenario(name, operation, upload_bytes, posts_per_call, calls, concurrency):
+    """
+    Run one scenario (calls operations, concurrency at a time)
+    
+    Returns:
+        dict: Result record
+    """
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+    
+    def call(i):
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            ok = bool(operation(i).get('success'))
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                failures += 1
+    
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(call, range(calls)))
+        wall = time.perf_counter() - started
+    
+    latencies.sort()
+    succeeded = calls - failures
+    return {
+        'scenario': name,
+        'concurrency': concurrency,
+        'calls': calls,
+        'posts_per_call': posts_per_call,
+        'succeeded': succeeded,
+        'failed': failures,
+        'seconds': round(wall, 4),
+        'posts_per_sec': round(succeeded * posts_per_call / wall, 2) if wall else None,
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies) * 1000, 2),
+            'p50': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+            'max': round(latencies[-1] * 1000, 2)
+        },
+        'upload_mb_per_sec': round(upload_bytes * succeeded / wall / 1024 / 1024, 2) if upload_bytes else None,
+        'peak_rss_mb': round(rss.peak / 1024 / 1024, 1)
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Print posts/sec and p95 changes against a previous results file"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {
+            (r['scenario'], r['concurrency']): r for r in json.load(f)['results']
+        }
+    
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        previous = baseline.get((result['scenario'], result['concurrency']))
+        if not previous or not previous['posts_per_sec']:
+            continue
+        throughput = (result['posts_per_sec'] / previous['posts_per_sec'] - 1) * 100
+        p95 = (result['latency_ms']['p95'] / previous['latency_ms']['p95'] - 1) * 100
+        print(f"   {result['scenario']:<18} c={result['concurrency']:<3} "
+              f"posts/s {throughput:+6.1f}%   p95 {p95:+6.1f}%")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Publishing benchmark against a local mock server")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Comma-separated scenarios ({', '.join(SCENARIOS)})")
+    parser.add_argument('--concurrency', default='1,4,16',
+                        type=lambda value: [int(v) for v in value.split(',')],
+                        help="Comma-separated concurrency levels")
+    parser.add_argument('--posts', type=int, default=200, help="Calls per scenario and level")
+    parser.add_argument('--video-posts', type=int, default=10, help="Calls for the video upload scenarios")
+    parser.add_argument('--video-mb', type=float, default=5, help="Size of the generated test video")
+    parser.add_argument('--chunked-mb', type=float, default=Config.FACEBOOK_CHUNKED_UPLOAD_MB,
+                        help="Size from which videos use the resumable upload")
+    parser.add_argument('--processing-polls', type=int, default=3,
+                        help="Status checks before a mock Instagram container or TikTok post is ready")
+    parser.add_argument('--poll-interval', type=float, default=0.05,
+                        help="First status check delay in seconds")
+    parser.add_argument('--tiktok-chunk-mb', type=int, default=Config.TIKTOK_UPLOAD_CHUNK_MB,
+                        help="TikTok upload chunk size")
+    parser.add_argument('--tiktok-workers', type=int, default=Config.TIKTOK_UPLOAD_WORKERS,
+                        help="TikTok chunks uploaded in parallel")
+    parser.add_argument('--batch-size', type=int, default=50, help="Posts per facebook_batch call")
+    parser.add_argument('--latency', type=float, default=0.02, help="Server latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Random extra server latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of 5xx responses")
+    parser.add_argument('--rate-limit', type=float, default=0, help="Server requests/second (0 = unlimited)")
+    parser.add_argument('--client-rate-limit', action='store_true',
+                        help="Keep the client-side rate limiter enabled")
+    parser.add_argument('--output', help="Results file (defaults to benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--baseline', help="Previous results file to compare against")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    
+    results = []
+    with tempfile.TemporaryDirectory(prefix='sma-bench-') as work_dir, MockServer(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, rate_limit=args.rate_limit,
+        processing_polls=args.processing_polls
+    ) as server:
+        configure(server, args, work_dir)
+        video_path = str(Path(work_dir) / 'benchmark.mp4')
+        make_video(video_path, args.video_mb)
+        operations = build_operations(args, video_path)
+        
+        for name in scenarios:
+            operation, upload_bytes, posts_per_call = operations[name]
+            calls = args.video_posts if name in ('facebook_video', 'tiktok_video', 'youtube_video', 'post_to_all_video') else args.posts
+            for concurrency in args.concurrency:
+                server.reset_stats()
+                result = run_scenario(name, operation, upload_bytes, posts_per_call, calls, concurrency)
+                result['server'] = dict(server.stats)
+                results.append(result)
+                print(f"{name:<18} c={concurrency:<3} {result['posts_per_sec']:>9} posts/s  "
+                      f"p50 {result['latency_ms']['p50']:>8}ms  p95 {result['latency_ms']['p95']:>8}ms  "
+                      f"p99 {result['latency_ms']['p99']:>8}ms  "
+                      + (f"{result['upload_mb_per_sec']} MB/s  " if result['upload_mb_per_sec'] else "")
+                      + f"rss {result['peak_rss_mb']}MB  failed {result['failed']}")
+    
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'args': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')}
+        },
+        'results': results
+    }
+    
+    output = Path(args.output or ROOT / 'benchmarks' / 'results' /
+                  f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+    
+    if args.baseline:
+        compare(results, args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,21 +18,146 @@ class Config:
     # Facebook Configuration
     FACEBOOK_ACCESS_TOKEN = os.getenv('FACEBOOK_ACCESS_TOKEN')
     FACEBOOK_PAGE_ID = os.getenv('FACEBOOK_PAGE_ID')
+    FACEBOOK_GRAPH_URL = os.getenv('FACEBOOK_GRAPH_URL', 'https://graph.facebook.com/v18.0')
+    FACEBOOK_APP_ID = os.getenv('FACEBOOK_APP_ID')
+    FACEBOOK_APP_SECRET = os.getenv('FACEBOOK_APP_SECRET')
     
     # YouTube Configuration
     YOUTUBE_CLIENT_SECRETS_FILE = os.getenv('YOUTUBE_CLIENT_SECRETS_FILE', 'client_secrets.json')
     YOUTUBE_CREDENTIALS_PICKLE = os.getenv('YOUTUBE_CREDENTIALS_PICKLE', 'youtube_credentials.pickle')
+    YOUTUBE_UPLOAD_URL = os.getenv('YOUTUBE_UPLOAD_URL', 'https://www.googleapis.com/upload/youtube/v3/videos')
+    YOUTUBE_CATEGORY_ID = os.getenv('YOUTUBE_CATEGORY_ID', '22')
     
     # TikTok Configuration
     TIKTOK_ACCESS_TOKEN = os.getenv('TIKTOK_ACCESS_TOKEN')
+    TIKTOK_API_URL = os.getenv('TIKTOK_API_URL', 'https://open.tiktokapis.com')
+    TIKTOK_REFRESH_TOKEN = os.getenv('TIKTOK_REFRESH_TOKEN')
+    TIKTOK_CLIENT_KEY = os.getenv('TIKTOK_CLIENT_KEY')
+    TIKTOK_CLIENT_SECRET = os.getenv('TIKTOK_CLIENT_SECRET')
     
     # Instagram Configuration
     INSTAGRAM_ACCESS_TOKEN = os.getenv('INSTAGRAM_ACCESS_TOKEN')
     INSTAGRAM_ACCOUNT_ID = os.getenv('INSTAGRAM_ACCOUNT_ID')
+    INSTAGRAM_GRAPH_URL = os.getenv('INSTAGRAM_GRAPH_URL', 'https://graph.facebook.com/v18.0')
+    
+    # Status Polling Configuration (Instagram containers, TikTok publish jobs)
+    POLL_INTERVAL = float(os.getenv('POLL_INTERVAL', '3'))
+    POLL_MAX_INTERVAL = float(os.getenv('POLL_MAX_INTERVAL', '30'))
+    POLL_BACKOFF = float(os.getenv('POLL_BACKOFF', '1.5'))
+    POLL_TIMEOUT = float(os.getenv('POLL_TIMEOUT', '900'))
+    POLL_BATCH = int(os.getenv('POLL_BATCH', '50'))
+    POLL_PUBLISH_WORKERS = int(os.getenv('POLL_PUBLISH_WORKERS', '4'))
+    
+    # Accounts Configuration
+    ACCOUNTS_FILE = os.getenv('ACCOUNTS_FILE', 'accounts.json')
+    
+    # Credential Configuration
+    CREDENTIAL_STORE = os.getenv('CREDENTIAL_STORE', 'data/credentials.json')
+    CREDENTIAL_REFRESH_MARGIN = float(os.getenv('CREDENTIAL_REFRESH_MARGIN', '300'))
     
     # Logging Configuration
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FILE = os.getenv('LOG_FILE', 'logs/automation.log')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+    LOG_ROTATION = os.getenv('LOG_ROTATION', 'size')
+    LOG_ROTATION_WHEN = os.getenv('LOG_ROTATION_WHEN', 'midnight')
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '7'))
+    
+    # HTTP Transport Configuration
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+    HTTP_POOL_BLOCK = os.getenv('HTTP_POOL_BLOCK', 'False').lower() == 'true'
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '0'))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '10'))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '300'))
+    HTTP_ASYNC_POOL_LIMIT = int(os.getenv('HTTP_ASYNC_POOL_LIMIT', '100'))
+    HTTP_ASYNC_POOL_PER_HOST = int(os.getenv('HTTP_ASYNC_POOL_PER_HOST', '0'))
+    
+    # Metrics Configuration
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    
+    # Rate Limiting Configuration
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    RATE_LIMIT_APP_PER_MINUTE = float(os.getenv('RATE_LIMIT_APP_PER_MINUTE', '600'))
+    RATE_LIMIT_ACCOUNT_PER_MINUTE = float(os.getenv('RATE_LIMIT_ACCOUNT_PER_MINUTE', '60'))
+    RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', '10'))
+    RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', '300'))
+    RATE_LIMIT_COOLDOWN = float(os.getenv('RATE_LIMIT_COOLDOWN', '60'))
+    RATE_LIMIT_RECOVERY = float(os.getenv('RATE_LIMIT_RECOVERY', '60'))
+    
+    # Retry Configuration
+    RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', '3'))
+    RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '1'))
+    RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '30'))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '60'))
+    
+    # Adaptive Concurrency Configuration
+    ADAPTIVE_CONCURRENCY_ENABLED = os.getenv('ADAPTIVE_CONCURRENCY_ENABLED', 'True').lower() == 'true'
+    ADAPTIVE_INITIAL_LIMIT = int(os.getenv('ADAPTIVE_INITIAL_LIMIT', '10'))
+    ADAPTIVE_MIN_LIMIT = int(os.getenv('ADAPTIVE_MIN_LIMIT', '1'))
+    ADAPTIVE_MAX_LIMIT = int(os.getenv('ADAPTIVE_MAX_LIMIT', '100'))
+    ADAPTIVE_BACKOFF = float(os.getenv('ADAPTIVE_BACKOFF', '0.9'))
+    ADAPTIVE_LATENCY_TOLERANCE = float(os.getenv('ADAPTIVE_LATENCY_TOLERANCE', '2.0'))
+    ADAPTIVE_MAX_WAIT = float(os.getenv('ADAPTIVE_MAX_WAIT', '30'))
+    
+    # Batch Configuration
+    FACEBOOK_BATCH_SIZE = min(int(os.getenv('FACEBOOK_BATCH_SIZE', '50')), 50)
+    
+    # Upload Configuration
+    UPLOAD_STATE_DIR = os.getenv('UPLOAD_STATE_DIR', '.upload_state')
+    UPLOAD_CHUNK_RETRIES = int(os.getenv('UPLOAD_CHUNK_RETRIES', '3'))
+    FACEBOOK_CHUNKED_UPLOAD_MB = float(os.getenv('FACEBOOK_CHUNKED_UPLOAD_MB', '20'))
+    FACEBOOK_UPLOAD_CHUNK_MB = int(os.getenv('FACEBOOK_UPLOAD_CHUNK_MB', '8'))
+    FACEBOOK_UPLOAD_WORKERS = int(os.getenv('FACEBOOK_UPLOAD_WORKERS', '1'))
+    TIKTOK_UPLOAD_CHUNK_MB = int(os.getenv('TIKTOK_UPLOAD_CHUNK_MB', '10'))
+    TIKTOK_UPLOAD_WORKERS = int(os.getenv('TIKTOK_UPLOAD_WORKERS', '1'))
+    YOUTUBE_UPLOAD_CHUNK_MB = int(os.getenv('YOUTUBE_UPLOAD_CHUNK_MB', '8'))
+    SHARED_READ_WINDOW_MB = float(os.getenv('SHARED_READ_WINDOW_MB', '32'))
+    SHARED_READ_STALL_TIMEOUT = float(os.getenv('SHARED_READ_STALL_TIMEOUT', '60'))
+    
+    # Media Cache Configuration
+    MEDIA_CACHE_ENABLED = os.getenv('MEDIA_CACHE_ENABLED', 'True').lower() == 'true'
+    MEDIA_CACHE_DB = os.getenv('MEDIA_CACHE_DB', 'data/media_cache.db')
+    MEDIA_CACHE_MAX_ENTRIES = int(os.getenv('MEDIA_CACHE_MAX_ENTRIES', '10000'))
+    MEDIA_CACHE_TTL_DAYS = float(os.getenv('MEDIA_CACHE_TTL_DAYS', '30'))
+    
+    # Image Variant Configuration
+    IMAGE_VARIANTS_ENABLED = os.getenv('IMAGE_VARIANTS_ENABLED', 'True').lower() == 'true'
+    IMAGE_VARIANT_DIR = os.getenv('IMAGE_VARIANT_DIR', 'data/image_variants')
+    IMAGE_VARIANT_BASE_URL = os.getenv('IMAGE_VARIANT_BASE_URL', '')
+    IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', '0'))
+    
+    # Publishing Configuration
+    CONCURRENT_PUBLISHING = os.getenv('CONCURRENT_PUBLISHING', 'True').lower() == 'true'
+    MAX_CONCURRENT_PLATFORMS = int(os.getenv('MAX_CONCURRENT_PLATFORMS', '4'))
+    PLATFORM_TIMEOUT = float(os.getenv('PLATFORM_TIMEOUT', '600'))
+    MAX_CONCURRENT_ACCOUNTS = int(os.getenv('MAX_CONCURRENT_ACCOUNTS', '16'))
+    
+    # Job Queue Configuration
+    JOB_QUEUE_DB = os.getenv('JOB_QUEUE_DB', 'data/jobs.db')
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '2'))
+    JOB_STALE_AFTER = float(os.getenv('JOB_STALE_AFTER', '3600'))
+    JOB_SHARDS = int(os.getenv('JOB_SHARDS', '0'))
+    JOB_SHARD_WORKERS = int(os.getenv('JOB_SHARD_WORKERS', '1'))
+    JOB_QUEUE_BACKEND = os.getenv('JOB_QUEUE_BACKEND', 'jobs.job_queue:JobQueue')
+    JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '60'))
+    JOB_HEARTBEAT_INTERVAL = float(os.getenv('JOB_HEARTBEAT_INTERVAL', '20'))
+    JOB_ORDERED_PARTITIONS = os.getenv('JOB_ORDERED_PARTITIONS', 'False').lower() == 'true'
+    
+    # Campaign Configuration
+    CAMPAIGN_DB = os.getenv('CAMPAIGN_DB', 'data/campaigns.db')
+    CAMPAIGN_CONCURRENCY = int(os.getenv('CAMPAIGN_CONCURRENCY', '4'))
+    
+    # Post History Configuration
+    POST_HISTORY_ENABLED = os.getenv('POST_HISTORY_ENABLED', 'True').lower() == 'true'
+    POST_HISTORY_DB = os.getenv('POST_HISTORY_DB', 'data/post_history.db')
+    POST_HISTORY_STALE_AFTER = float(os.getenv('POST_HISTORY_STALE_AFTER', '3600'))
     
     # Scheduler Configuration
     ENABLE_SCHEDULER = os.getenv('ENABLE_SCHEDULER', 'False').lower() == 'true'
@@ -53,7 +178,7 @@ class Config:
             errors.append("Instagram Access Token is missing")
         if not cls.INSTAGRAM_ACCOUNT_ID:
             errors.append("Instagram Account ID is missing")
-            
+        
         if errors:
             print("⚠️  Configuration Warnings:")
             for error in errors:
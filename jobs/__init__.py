@@ -0,0 +1,10 @@
+"""
+Jobs Module
+مودول مهام النشر
+"""
+
+from .job_queue import JobBackend, JobQueue, create_job_queue
+from .worker import WorkerPool, ShardedWorkerPool, dispatch_job
+from .campaign import CampaignCheckpoint, CampaignRunner, read_rows
+
+__all__ = ['JobBackend', 'JobQueue', 'create_job_queue', 'WorkerPool', 'ShardedWorkerPool', 'dispatch_job', 'CampaignCheckpoint', 'CampaignRunner', 'read_rows']
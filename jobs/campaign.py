@@ -0,0 +1,489 @@
+"""
+Campaign Import Module
+مودول استيراد الحملات
+
+Streams CSV/JSONL campaign files through parse -> validate -> dedupe ->
+publish, with a SQLite checkpoint so interrupted imports resume where they
+stopped
+"""
+
+import csv
+import hashlib
+import inspect
+import json
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+from config import Config
+from utils.logger import setup_logger
+from utils.validator import validate_url, validate_video_file, validate_image_file
+from utils.video_probe import PLATFORM_VIDEO_LIMITS
+from .worker import dispatch_job
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    committed_row INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS campaign_posts (
+    campaign TEXT NOT NULL,
+    post_key TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    success INTEGER NOT NULL,
+    result TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (campaign, post_key)
+);
+"""
+
+CONTENT_TYPES = ('text', 'image', 'video')
+
+# Columns holding lists / الأعمدة التي تحتوي على قوائم
+LIST_FIELDS = {'tags'}
+
+
+def read_rows(file_path, file_format=None):
+    """
+    Stream raw rows from a CSV or JSONL campaign file
+    قراءة صفوف ملف الحملة تدريجياً
+    
+    Args:
+        file_path (str): Campaign file
+        file_format (str, optional): 'csv' or 'jsonl' (defaults to the file extension)
+    
+    Yields:
+        tuple: (row number starting at 1, dict)
+    """
+    file_format = (file_format or Path(file_path).suffix.lstrip('.')).lower()
+    
+    with open(file_path, newline='', encoding='utf-8-sig') as f:
+        if file_format == 'csv':
+            for row_number, row in enumerate(csv.DictReader(f), 1):
+                yield row_number, row
+        elif file_format in ('jsonl', 'ndjson', 'json'):
+            row_number = 0
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                row_number += 1
+                try:
+                    yield row_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield row_number, {'_error': f'Invalid JSON: {e}'}
+        else:
+            raise ValueError(f'Unsupported campaign format: {file_format}')
+
+
+def parse_row(row):
+    """
+    Normalize a raw row into a post
+    
+    Empty values are dropped, list columns are split on "|" or "," (or
+    parsed as JSON), and a nested 'kwargs' object is merged in.
+    
+    Args:
+        row (dict): Raw CSV/JSONL row
+    
+    Returns:
+        dict: {'platform', 'content_type', 'kwargs'} or {'error'}
+    """
+    if '_error' in row:
+        return {'error': row['_error']}
+    
+    fields = dict(row)
+    fields.update(fields.pop('kwargs', None) or {})
+    
+    kwargs = {}
+    for key, value in fields.items():
+        if key is None or value is None or value == '':
+            continue
+        key = key.strip()
+        if isinstance(value, str):
+            value = value.strip()
+            if key in LIST_FIELDS:
+                value = json.loads(value) if value.startswith('[') else \
+                    [item.strip() for item in re.split(r'[|,]', value) if item.strip()]
+        kwargs[key] = value
+    
+    platform = str(kwargs.pop('platform', 'all')).lower()
+    content_type = kwargs.pop('content_type', None)
+    if not content_type:
+        if 'video_path' in kwargs or 'video_url' in kwargs:
+            content_type = 'video'
+        elif 'image_path' in kwargs or 'image_url' in kwargs:
+            content_type = 'image'
+        else:
+            content_type = 'text'
+    
+    return {'platform': platform, 'content_type': str(content_type).lower(), 'kwargs': kwargs}
+
+
+def post_key(post):
+    """
+    Content key used to detect duplicate posts
+    
+    Args:
+        post (dict): Parsed post
+    
+    Returns:
+        str: SHA-256 of the post's platform, content type and arguments
+    """
+    payload = json.dumps([post['platform'], post['content_type'], post['kwargs']], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CampaignCheckpoint:
+    """Campaign progress and posted-content store / نقطة حفظ تقدم الحملة"""
+    
+    def __init__(self, campaign_id, source='', db_path=None):
+        """
+        Initialize checkpoint
+        
+        Args:
+            campaign_id (str): Campaign identifier
+            source (str): Campaign file (informational)
+            db_path (str, optional): SQLite database path
+                (defaults to Config.CAMPAIGN_DB)
+        """
+        self.campaign_id = campaign_id
+        self.db_path = db_path or Config.CAMPAIGN_DB
+        self._local = threading.local()
+        
+        if self.db_path != ':memory:':
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        conn.execute(
+            "INSERT OR IGNORE INTO campaigns (id, source, committed_row, updated_at) VALUES (?, ?, 0, ?)",
+            (campaign_id, str(source), time.time())
+        )
+    
+    def _connection(self):
+        """Get this thread's SQLite connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    @staticmethod
+    def campaign_id_for(file_path):
+        """
+        Default campaign ID: a hash of the campaign file's absolute path
+        
+        Args:
+            file_path (str): Campaign file
+        
+        Returns:
+            str: Campaign ID
+        """
+        return hashlib.sha1(str(Path(file_path).resolve()).encode('utf-8')).hexdigest()[:16]
+    
+    def committed_row(self):
+        """
+        Get the last row below which every row has been handled
+        
+        Returns:
+            int: Row number (0 if nothing is committed)
+        """
+        row = self._connection().execute(
+            "SELECT committed_row FROM campaigns WHERE id = ?", (self.campaign_id,)
+        ).fetchone()
+        return row[0] if row else 0
+    
+    def commit(self, row_number):
+        """
+        Move the committed row forward
+        
+        Args:
+            row_number (int): New committed row
+        """
+        self._connection().execute(
+            "UPDATE campaigns SET committed_row = MAX(committed_row, ?), updated_at = ? WHERE id = ?",
+            (row_number, time.time(), self.campaign_id)
+        )
+    
+    def is_posted(self, key):
+        """
+        Check whether a post with this content key already succeeded
+        
+        Args:
+            key (str): Post key
+        
+        Returns:
+            bool: True if already posted in this campaign
+        """
+        return self._connection().execute(
+            "SELECT 1 FROM campaign_posts WHERE campaign = ? AND post_key = ? AND success = 1",
+            (self.campaign_id, key)
+        ).fetchone() is not None
+    
+    def record(self, key, row_number, result):
+        """
+        Record a publishing result
+        
+        Args:
+            key (str): Post key
+            row_number (int): Source row
+            result (dict): Publishing result
+        """
+        self._connection().execute(
+            "INSERT OR REPLACE INTO campaign_posts (campaign, post_key, row, success, result, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (self.campaign_id, key, row_number, int(bool(result.get('success'))),
+             json.dumps(result, default=str), time.time())
+        )
+
+
+class CampaignRunner:
+    """Streaming campaign publisher / ناشر الحملات المتدفق"""
+    
+    def __init__(self, automation, checkpoint=None, concurrency=None, dry_run=False):
+        """
+        Initialize campaign runner
+        
+        Args:
+            automation (SocialMediaAutomation): Automation instance
+            checkpoint (CampaignCheckpoint, optional): Progress store; without
+                one every row is processed and nothing is recorded
+            concurrency (int, optional): Posts published at once
+                (defaults to Config.CAMPAIGN_CONCURRENCY)
+            dry_run (bool): Validate and dedupe only, without publishing
+        """
+        self.logger = setup_logger(__name__)
+        self.automation = automation
+        self.checkpoint = checkpoint
+        self.concurrency = max(1, concurrency or Config.CAMPAIGN_CONCURRENCY)
+        self.dry_run = dry_run
+        self.stats = {
+            'rows': 0, 'skipped': 0, 'invalid': 0, 'duplicate': 0, 'posted': 0, 'failed': 0
+        }
+    
+    def validate(self, post):
+        """
+        Validate a parsed post before publishing
+        التحقق من المنشور قبل النشر
+        
+        Args:
+            post (dict): Parsed post
+        
+        Returns:
+            str: Error message, or None if the post is valid
+        """
+        platform = post['platform']
+        kwargs = post['kwargs']
+        
+        # An 'account' column picks the account's platform when none is given
+        account_id = kwargs.get('account')
+        if account_id:
+            account = self.automation.accounts.get(account_id)
+            if account is None:
+                return f'Unknown account: {account_id}'
+            if platform == 'all':
+                post['platform'] = platform = account.platform
+            elif platform != account.platform:
+                return f'Account {account_id} is a {account.platform} account, not {platform}'
+        
+        if platform == 'all':
+            if post['content_type'] not in CONTENT_TYPES:
+                return f"Unknown content type: {post['content_type']}"
+        else:
+            method = getattr(self.automation, f'post_to_{platform}', None)
+            if method is None:
+                return f'Unknown platform: {platform}'
+            # Drop columns this platform does not use, then check required ones
+            params = inspect.signature(method).parameters
+            post['kwargs'] = kwargs = {k: v for k, v in kwargs.items() if k in params}
+            try:
+                inspect.signature(method).bind(**kwargs)
+            except TypeError as e:
+                return f'Invalid arguments for {platform}: {e}'
+        
+        for field in ('image_url', 'video_url'):
+            if field in kwargs and not validate_url(kwargs[field]):
+                return f'Invalid URL in {field}: {kwargs[field]}'
+        
+        if 'video_path' in kwargs:
+            limits = PLATFORM_VIDEO_LIMITS.get(platform)
+            max_size_mb = limits['max_size_mb'] if limits else max(
+                limit['max_size_mb'] for limit in PLATFORM_VIDEO_LIMITS.values()
+            )
+            result = validate_video_file(
+                kwargs['video_path'], max_size_mb=max_size_mb, platform=platform if limits else None
+            )
+            if not result['valid']:
+                return f"{kwargs['video_path']}: {result['error']}"
+        
+        if 'image_path' in kwargs:
+            result = validate_image_file(kwargs['image_path'])
+            if not result['valid']:
+                return f"{kwargs['image_path']}: {result['error']}"
+        
+        return None
+    
+    def posts(self, rows):
+        """
+        Parse, validate and dedupe a stream of rows
+        
+        Rows at or below the checkpoint's committed row are skipped.
+        
+        Args:
+            rows (iterable): (row number, raw row) tuples
+        
+        Yields:
+            tuple: (row number, post key, post); (row number, None, None) for
+                rows that need no publishing
+        """
+        committed = self.checkpoint.committed_row() if self.checkpoint else 0
+        if committed:
+            self.logger.info(f"Resuming after row {committed}")
+        
+        for row_number, row in rows:
+            self.stats['rows'] += 1
+            if row_number <= committed:
+                self.stats['skipped'] += 1
+                continue
+            
+            post = parse_row(row)
+            error = post.get('error') or self.validate(post)
+            if error:
+                self.stats['invalid'] += 1
+                self.logger.warning(f"⚠️ Row {row_number} skipped: {error}")
+                yield row_number, None, None
+                continue
+            
+            key = post_key(post)
+            if self.checkpoint and self.checkpoint.is_posted(key):
+                self.stats['duplicate'] += 1
+                self.logger.info(f"Row {row_number} already posted, skipping")
+                yield row_number, None, None
+                continue
+            
+            yield row_number, key, post
+    
+    def run(self, rows):
+        """
+        Publish a stream of campaign rows
+        نشر صفوف الحملة
+        
+        At most 2 x concurrency posts are held in memory at once, so memory
+        use does not depend on the file size. The committed row only moves
+        past a row once it and every row before it have finished. A row
+        identical to one still being published waits for it: it counts as a
+        duplicate if that post succeeds and is published itself if it fails.
+        
+        Args:
+            rows (iterable): (row number, raw row) tuples, e.g. from read_rows
+        
+        Returns:
+            dict: Row counts (rows, skipped, invalid, duplicate, posted, failed)
+        """
+        in_flight = {}
+        in_flight_keys = set()
+        # key -> [(row number, post)] of identical rows waiting for the in-flight one
+        deferred = {}
+        last_row = 0
+        stopping = False
+        started = time.time()
+        
+        def submit(executor, row_number, key, post):
+            job = {'platform': post['platform'], 'content_type': post['content_type'],
+                   'kwargs': post['kwargs']}
+            if self.checkpoint:
+                # Covers a crash between the post and its checkpoint record
+                job['idempotency_key'] = f"campaign:{self.checkpoint.campaign_id}:{key}"
+            future = executor.submit(dispatch_job, self.automation, job)
+            in_flight[future] = (row_number, key)
+            in_flight_keys.add(key)
+        
+        def collect(done, executor):
+            for future in done:
+                row_number, key = in_flight.pop(future)
+                in_flight_keys.discard(key)
+                try:
+                    result = future.result()
+                except BaseException as e:
+                    result = {'success': False, 'error': str(e)}
+                self.stats['posted' if result.get('success') else 'failed'] += 1
+                if self.checkpoint:
+                    self.checkpoint.record(key, row_number, result)
+                if not result.get('success'):
+                    self.logger.error(f"✗ Row {row_number} failed: {result.get('error')}")
+                
+                waiting = deferred.pop(key, [])
+                if waiting and result.get('success'):
+                    self.stats['duplicate'] += len(waiting)
+                elif waiting and not stopping:
+                    # The post did not go out: the next identical row gets its own attempt
+                    next_row, next_post = waiting.pop(0)
+                    submit(executor, next_row, key, next_post)
+                    if waiting:
+                        deferred[key] = waiting
+                elif waiting:
+                    deferred[key] = waiting
+            if self.checkpoint:
+                pending = [row for row, _ in in_flight.values()]
+                pending += [row for waiting in deferred.values() for row, _ in waiting]
+                self.checkpoint.commit(min(pending) - 1 if pending else last_row)
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='campaign') as executor:
+            try:
+                for row_number, key, post in self.posts(rows):
+                    if post is None:
+                        last_row = row_number
+                        if self.checkpoint and not in_flight and not deferred and not self.dry_run:
+                            self.checkpoint.commit(row_number)
+                        continue
+                    
+                    if self.dry_run:
+                        self.stats['posted'] += 1
+                        last_row = row_number
+                        continue
+                    
+                    # Identical rows already being published in this run wait for the outcome
+                    if key in in_flight_keys:
+                        deferred.setdefault(key, []).append((row_number, post))
+                        last_row = row_number
+                        continue
+                    
+                    submit(executor, row_number, key, post)
+                    last_row = row_number
+                    
+                    if len(in_flight) >= self.concurrency * 2:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(done, executor)
+                
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done, executor)
+            except BaseException:
+                # Record posts that were already sent, so a resumed run skips them;
+                # the committed row stops before the first post that never started
+                stopping = True
+                cancelled = [in_flight.pop(future)[0] for future in list(in_flight) if future.cancel()]
+                cancelled += [row for waiting in deferred.values() for row, _ in waiting]
+                if cancelled:
+                    last_row = min(cancelled) - 1
+                wait(in_flight)
+                collect(list(in_flight), executor)
+                raise
+        
+        if self.checkpoint and not self.dry_run:
+            self.checkpoint.commit(last_row)
+        
+        elapsed = time.time() - started
+        self.logger.info(
+            f"Campaign finished in {elapsed:.1f}s: " +
+            ", ".join(f"{name}={count}" for name, count in self.stats.items())
+        )
+        return dict(self.stats)
@@ -0,0 +1,501 @@
+"""
+Job Queue Module
+مودول طابور مهام النشر
+
+Durable queue of publishing jobs shared by one or more worker nodes. Jobs
+are claimed with time-bounded leases that workers extend with heartbeats;
+the SQLite backend can be swapped through Config.JOB_QUEUE_BACKEND.
+"""
+
+import importlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import Config
+from utils.logger import setup_logger
+
+
+# Job states / حالات المهام
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    platform TEXT NOT NULL,
+    account TEXT NOT NULL DEFAULT '',
+    content_type TEXT,
+    kwargs TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    result TEXT,
+    error TEXT,
+    worker_id TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    started_at REAL,
+    lease_expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, id);
+"""
+
+# Created after older databases gain the account and lease columns
+MIGRATED_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_jobs_account ON jobs (state, account, id);
+CREATE INDEX IF NOT EXISTS idx_jobs_partition ON jobs (state, platform, account);
+CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (state, lease_expires_at);
+"""
+
+
+def worker_identity():
+    """
+    Build an identifier for the current worker thread
+    
+    Returns:
+        str: "host:pid:thread" identifier
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def _pid_alive(pid):
+    """Check whether a process with this PID is still running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobBackend:
+    """Interface of job queue backends / واجهة خلفيات طابور المهام"""
+    
+    def enqueue(self, platform, content_type=None, account=None, **kwargs):
+        """Add one job and return its ID"""
+        raise NotImplementedError
+    
+    def enqueue_many(self, jobs, batch_size=1000):
+        """Add many jobs ({'platform', 'account', 'content_type', 'kwargs'} dicts)"""
+        count = 0
+        for job in jobs:
+            self.enqueue(job['platform'], job.get('content_type'), job.get('account'), **job.get('kwargs', {}))
+            count += 1
+        return count
+    
+    def claim(self, worker_id=None, accounts=None):
+        """
+        Atomically lease the next runnable job to worker_id and return it
+        (None if there is none); jobs whose lease expired are runnable again
+        """
+        raise NotImplementedError
+    
+    def heartbeat(self, job_id, worker_id):
+        """Extend worker_id's lease on a job; False if it no longer holds it"""
+        raise NotImplementedError
+    
+    def complete(self, job_id, result, worker_id=None):
+        """Record a job result and return the new state (None if the lease was lost)"""
+        raise NotImplementedError
+    
+    def get(self, job_id):
+        """Get a job dict by ID, or None"""
+        raise NotImplementedError
+    
+    def recover(self, stale_after=None):
+        """Return abandoned running jobs to the queue and return how many"""
+        return 0
+    
+    def stats(self):
+        """Count jobs by state"""
+        raise NotImplementedError
+
+
+def create_job_queue(backend=None, **kwargs):
+    """
+    Build a job queue backend
+    
+    Args:
+        backend (str or type, optional): Backend class, or "module:Class" to
+            import (defaults to Config.JOB_QUEUE_BACKEND)
+        **kwargs: Arguments for the backend class
+    
+    Returns:
+        JobBackend: Job queue
+    """
+    backend = backend or Config.JOB_QUEUE_BACKEND
+    if isinstance(backend, str):
+        module_name, _, class_name = backend.partition(':')
+        backend = getattr(importlib.import_module(module_name), class_name)
+    return backend(**kwargs)
+
+
+class JobQueue(JobBackend):
+    """Persistent publishing job queue / طابور مهام نشر دائم"""
+    
+    def __init__(self, db_path=None, max_attempts=None, lease=None, ordered=None):
+        """
+        Initialize job queue
+        
+        Several processes and hosts may share the database file; every
+        claim is one write transaction.
+        
+        Args:
+            db_path (str, optional): SQLite database path
+                (defaults to Config.JOB_QUEUE_DB)
+            max_attempts (int, optional): Attempts before a job is marked failed
+                (defaults to Config.JOB_MAX_ATTEMPTS)
+            lease (float, optional): Seconds a claim lasts without a heartbeat
+                (defaults to Config.JOB_LEASE_SECONDS)
+            ordered (bool, optional): Run the jobs of each platform/account
+                one at a time in queue order
+                (defaults to Config.JOB_ORDERED_PARTITIONS)
+        """
+        self.logger = setup_logger(__name__)
+        self.db_path = db_path or Config.JOB_QUEUE_DB
+        self.max_attempts = max_attempts or Config.JOB_MAX_ATTEMPTS
+        self.lease = lease or Config.JOB_LEASE_SECONDS
+        self.ordered = Config.JOB_ORDERED_PARTITIONS if ordered is None else ordered
+        self._local = threading.local()
+        
+        if self.db_path != ':memory:':
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if 'account' not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN account TEXT NOT NULL DEFAULT ''")
+        if 'lease_expires_at' not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN lease_expires_at REAL")
+        conn.executescript(MIGRATED_INDEXES)
+    
+    def _connection(self):
+        """Get this thread's SQLite connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    def enqueue(self, platform, content_type=None, account=None, **kwargs):
+        """
+        Add one job to the queue
+        إضافة مهمة إلى الطابور
+        
+        Args:
+            platform (str): 'facebook', 'instagram', 'tiktok', 'youtube' or 'all'
+            content_type (str, optional): Content type for 'all' jobs
+            account (str, optional): Account ID to publish as (defaults to the
+                credentials in Config)
+            **kwargs: Arguments for the post_to_* method
+        
+        Returns:
+            int: Job ID
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO jobs (platform, account, content_type, kwargs, max_attempts, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (platform, account or '', content_type, json.dumps(kwargs), self.max_attempts, now, now)
+        )
+        return cursor.lastrowid
+    
+    def enqueue_many(self, jobs, batch_size=1000):
+        """
+        Add many jobs using batched transactions
+        إضافة مهام كثيرة دفعة واحدة
+        
+        Args:
+            jobs (iterable): Dicts with 'platform', optional 'account',
+                'content_type' and 'kwargs' keys
+            batch_size (int): Jobs inserted per transaction
+        
+        Returns:
+            int: Number of jobs enqueued
+        """
+        conn = self._connection()
+        count = 0
+        batch = []
+        
+        def flush():
+            conn.execute('BEGIN')
+            try:
+                conn.executemany(
+                    "INSERT INTO jobs (platform, account, content_type, kwargs, max_attempts, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    batch
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        
+        for job in jobs:
+            now = time.time()
+            batch.append((
+                job['platform'],
+                job.get('account') or '',
+                job.get('content_type'),
+                json.dumps(job.get('kwargs', {})),
+                self.max_attempts,
+                now,
+                now
+            ))
+            if len(batch) >= batch_size:
+                flush()
+                count += len(batch)
+                batch = []
+        if batch:
+            flush()
+            count += len(batch)
+        
+        self.logger.info(f"Enqueued {count} jobs")
+        return count
+    
+    def claim(self, worker_id=None, accounts=None):
+        """
+        Atomically lease the oldest runnable job
+        
+        Running jobs whose lease has expired (their worker died or lost
+        contact) go back to pending first, or fail if they are out of
+        attempts. With ordered partitions, jobs of a platform/account that
+        already has a running job are skipped.
+        
+        Args:
+            worker_id (str, optional): Worker identifier (defaults to this thread)
+            accounts (list, optional): Only claim jobs of these account IDs
+                ('' = jobs using the Config credentials)
+        
+        Returns:
+            dict: Claimed job, or None if no job can run now
+        """
+        conn = self._connection()
+        now = time.time()
+        
+        query = "SELECT id FROM jobs WHERE state = ?"
+        params = [PENDING]
+        if accounts is not None:
+            query += f" AND account IN ({', '.join('?' * len(accounts))})"
+            params.extend(accounts)
+        
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._expire_leases(conn, now)
+            if self.ordered:
+                job_id = self._next_in_free_partition(conn, accounts)
+            else:
+                row = conn.execute(query + " ORDER BY id LIMIT 1", params).fetchone()
+                job_id = row and row['id']
+            if job_id is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, worker_id = ?, "
+                "started_at = ?, updated_at = ?, lease_expires_at = ? WHERE id = ?",
+                (RUNNING, worker_id or worker_identity(), now, now, now + self.lease, job_id)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        
+        return self.get(job_id)
+    
+    @staticmethod
+    def _next_in_free_partition(conn, accounts=None):
+        """
+        Find the oldest pending job whose platform/account has no running job
+        
+        Walks the pending platform/account pairs through idx_jobs_partition
+        one index seek at a time, so the cost grows with the number of
+        partitions rather than with the backlog.
+        """
+        busy = {tuple(row) for row in conn.execute(
+            "SELECT DISTINCT platform, account FROM jobs WHERE state = ?", (RUNNING,)
+        )}
+        oldest = None
+        partition = conn.execute(
+            "SELECT platform, account FROM jobs WHERE state = ? ORDER BY platform, account LIMIT 1", (PENDING,)
+        ).fetchone()
+        while partition is not None:
+            platform, account = partition
+            if (platform, account) not in busy and (accounts is None or account in accounts):
+                head = conn.execute(
+                    "SELECT MIN(id) FROM jobs WHERE state = ? AND platform = ? AND account = ?",
+                    (PENDING, platform, account)
+                ).fetchone()[0]
+                oldest = head if oldest is None else min(oldest, head)
+            partition = conn.execute(
+                "SELECT platform, account FROM jobs WHERE state = ? AND platform = ? AND account > ? "
+                "ORDER BY account LIMIT 1",
+                (PENDING, platform, account)
+            ).fetchone() or conn.execute(
+                "SELECT platform, account FROM jobs WHERE state = ? AND platform > ? "
+                "ORDER BY platform, account LIMIT 1",
+                (PENDING, platform)
+            ).fetchone()
+        return oldest
+    
+    def _expire_leases(self, conn, now):
+        """Release running jobs whose lease has expired (inside a transaction)"""
+        failed = conn.execute(
+            "UPDATE jobs SET state = ?, error = ?, worker_id = NULL, lease_expires_at = NULL, updated_at = ? "
+            "WHERE state = ? AND lease_expires_at < ? AND attempts >= max_attempts",
+            (FAILED, 'Lease expired', now, RUNNING, now)
+        ).rowcount
+        requeued = conn.execute(
+            "UPDATE jobs SET state = ?, worker_id = NULL, lease_expires_at = NULL, updated_at = ? "
+            "WHERE state = ? AND lease_expires_at < ?",
+            (PENDING, now, RUNNING, now)
+        ).rowcount
+        if failed or requeued:
+            self.logger.warning(f"⚠️ Leases expired: {requeued} jobs requeued, {failed} failed")
+    
+    def heartbeat(self, job_id, worker_id):
+        """
+        Extend a worker's lease on a running job
+        تمديد عقد المهمة
+        
+        Args:
+            job_id (int): Job ID
+            worker_id (str): Worker holding the lease
+        
+        Returns:
+            bool: False if the job is no longer leased to this worker
+        """
+        cursor = self._connection().execute(
+            "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND state = ? AND worker_id = ?",
+            (time.time() + self.lease, job_id, RUNNING, worker_id)
+        )
+        return cursor.rowcount == 1
+    
+    def complete(self, job_id, result, worker_id=None):
+        """
+        Record the result of a job
+        
+        Failed jobs go back to pending until they run out of attempts.
+        
+        Args:
+            job_id (int): Job ID
+            result (dict): Result dict from the publisher
+            worker_id (str, optional): Only record the result if this worker
+                still holds the job's lease
+        
+        Returns:
+            str: New job state, or None if the lease was lost (the job was
+                reassigned and the result is dropped)
+        """
+        job = self.get(job_id)
+        if result.get('success'):
+            state = DONE
+        elif job and job['attempts'] < job['max_attempts']:
+            state = PENDING
+        else:
+            state = FAILED
+        
+        error = None if result.get('success') else result.get('error', 'Unknown error')
+        query = ("UPDATE jobs SET state = ?, result = ?, error = ?, worker_id = NULL, lease_expires_at = NULL, "
+                 "updated_at = ? WHERE id = ?")
+        params = [state, json.dumps(result, default=str), None if error is None else str(error),
+                  time.time(), job_id]
+        if worker_id is not None:
+            query += " AND state = ? AND worker_id = ?"
+            params.extend([RUNNING, worker_id])
+        
+        cursor = self._connection().execute(query, params)
+        return state if cursor.rowcount else None
+    
+    def get(self, job_id):
+        """
+        Get a job by ID
+        
+        Args:
+            job_id (int): Job ID
+        
+        Returns:
+            dict: Job fields, or None if not found
+        """
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['kwargs'] = json.loads(job['kwargs'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+    
+    def recover(self, stale_after=None):
+        """
+        Return jobs stuck in 'running' to the queue after a crash
+        استعادة المهام العالقة بعد توقف مفاجئ
+        
+        A running job is recovered when its worker process on this host no
+        longer exists, or when it has been running longer than stale_after
+        without a live lease (jobs claimed before leases existed). As with
+        expired leases, a job that has used up its attempts is marked failed
+        instead, so a job that crashes its worker is not retried forever.
+        
+        Args:
+            stale_after (float, optional): Seconds after which any running job
+                is considered abandoned (defaults to Config.JOB_STALE_AFTER)
+        
+        Returns:
+            int: Number of recovered jobs (requeued or failed)
+        """
+        stale_after = Config.JOB_STALE_AFTER if stale_after is None else stale_after
+        conn = self._connection()
+        host = socket.gethostname()
+        now = time.time()
+        
+        recovered = []
+        for row in conn.execute(
+            "SELECT id, worker_id, started_at, lease_expires_at, attempts, max_attempts FROM jobs WHERE state = ?",
+            (RUNNING,)
+        ).fetchall():
+            worker_host, _, rest = (row['worker_id'] or '').partition(':')
+            pid = rest.partition(':')[0]
+            dead = worker_host == host and pid.isdigit() and not _pid_alive(int(pid))
+            stale = row['started_at'] is None or now - row['started_at'] > stale_after
+            leased = row['lease_expires_at'] is not None and row['lease_expires_at'] > now
+            if not (dead or (stale and not leased)):
+                continue
+            if row['attempts'] >= row['max_attempts']:
+                recovered.append((FAILED, 'Worker exited while running the job', now, row['id']))
+            else:
+                recovered.append((PENDING, None, now, row['id']))
+        
+        if recovered:
+            conn.executemany(
+                "UPDATE jobs SET state = ?, error = COALESCE(?, error), worker_id = NULL, lease_expires_at = NULL, "
+                "updated_at = ? WHERE id = ? AND state = 'running'",
+                recovered
+            )
+            failed = sum(1 for entry in recovered if entry[0] == FAILED)
+            self.logger.warning(f"Recovered {len(recovered)} jobs stuck in running state")
+            if failed:
+                self.logger.error(f"✗ {failed} recovered jobs had no attempts left and were marked failed")
+        return len(recovered)
+    
+    def stats(self):
+        """
+        Count jobs by state
+        
+        Returns:
+            dict: {state: count}
+        """
+        rows = self._connection().execute(
+            "SELECT state, COUNT(*) AS n FROM jobs GROUP BY state"
+        ).fetchall()
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update({row['state']: row['n'] for row in rows})
+        return counts
@@ -0,0 +1,256 @@
+"""
+Worker Pool Module
+مودول مجموعة العمال
+
+Drains the job queue by calling the SocialMediaAutomation post_to_* methods,
+optionally with workers sharded by account. Any number of pools, on one or
+many hosts, can share a queue: jobs are leased to one worker at a time and
+the pool's heartbeat keeps the leases of running jobs alive.
+"""
+
+import threading
+import time
+
+from config import Config
+from utils.logger import setup_logger
+from utils.metrics import get_metrics
+from .job_queue import create_job_queue, worker_identity
+
+
+def dispatch_job(automation, job):
+    """
+    Run one job against a SocialMediaAutomation instance
+    تنفيذ مهمة واحدة
+    
+    Queued jobs are posted under the idempotency key 'job:<id>@<created_at>',
+    so a job retried after its post went through is not posted again.
+    
+    Args:
+        automation (SocialMediaAutomation): Automation instance
+        job (dict): Claimed job; an 'idempotency_key' field (or kwarg)
+            overrides the default key
+    
+    Returns:
+        dict: Result with success status and details
+    """
+    platform = job['platform']
+    account = job.get('account')
+    kwargs = dict(job['kwargs'])
+    if job.get('idempotency_key'):
+        kwargs.setdefault('idempotency_key', job['idempotency_key'])
+    elif job.get('id') is not None:
+        kwargs.setdefault('idempotency_key', f"job:{job['id']}@{job['created_at']:.6f}")
+    
+    if platform == 'all' and account:
+        return {'success': False, 'error': "Account jobs need a platform, not 'all'", 'platform': 'all'}
+    if platform == 'all':
+        results = automation.post_to_all(job['content_type'], **kwargs)
+        success = bool(results) and all(r.get('success') for r in results.values())
+        result = {'success': success, 'platform': 'all', 'results': results}
+        if not success:
+            result['error'] = {p: r.get('error') for p, r in results.items() if not r.get('success')}
+        return result
+    
+    method = getattr(automation, f'post_to_{platform}', None)
+    if method is None:
+        return {'success': False, 'error': f'Unknown platform: {platform}', 'platform': platform}
+    if account:
+        return method(account=account, **kwargs)
+    return method(**kwargs)
+
+
+class WorkerPool:
+    """Pool of threads draining the job queue / مجموعة عمال لتنفيذ المهام"""
+    
+    def __init__(self, automation, queue=None, workers=None, poll_interval=None, heartbeat_interval=None):
+        """
+        Initialize worker pool
+        
+        Args:
+            automation (SocialMediaAutomation): Automation instance to publish with
+            queue (JobBackend, optional): Job queue (defaults to a
+                Config.JOB_QUEUE_BACKEND queue)
+            workers (int, optional): Number of worker threads
+                (defaults to Config.JOB_WORKERS)
+            poll_interval (float, optional): Seconds to wait when the queue is empty
+                (defaults to Config.JOB_POLL_INTERVAL)
+            heartbeat_interval (float, optional): Seconds between lease renewals
+                (defaults to Config.JOB_HEARTBEAT_INTERVAL)
+        """
+        self.logger = setup_logger(__name__)
+        self.automation = automation
+        self.queue = queue or create_job_queue()
+        self.workers = workers or Config.JOB_WORKERS
+        self.poll_interval = Config.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.heartbeat_interval = heartbeat_interval or Config.JOB_HEARTBEAT_INTERVAL
+        
+        self._stop = threading.Event()
+        self._threads = []
+        self._heartbeat_thread = None
+        self._leases = {}
+        self._leases_lock = threading.Lock()
+        
+        get_metrics().add_collector(self._collect_metrics)
+    
+    def _collect_metrics(self, registry):
+        """Refresh the queue depth gauges before metrics are exported"""
+        depth = registry.gauge('sma_job_queue_depth', 'Jobs in the queue by state', ('state',))
+        for state, count in self.queue.stats().items():
+            depth.set(count, state=state)
+        registry.gauge('sma_job_workers', 'Running job worker threads').set(
+            sum(thread.is_alive() for thread in self._threads)
+        )
+    
+    def start(self, drain=False):
+        """
+        Recover crashed jobs and start the worker threads
+        
+        Args:
+            drain (bool): Stop each worker once the queue is empty
+        """
+        self.queue.recover()
+        self._stop.clear()
+        
+        assignments = self._assignments()
+        for name, accounts in assignments:
+            thread = threading.Thread(
+                target=self._work, args=(drain, accounts), name=name, daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        
+        if self._heartbeat_thread is None or not self._heartbeat_thread.is_alive():
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True)
+            self._heartbeat_thread.start()
+        
+        self.logger.info(f"✓ Started {len(assignments)} job workers")
+    
+    def _assignments(self):
+        """
+        Decide which threads to start
+        
+        Returns:
+            list: (thread name, account IDs or None for any account) tuples
+        """
+        return [(f'job-worker-{i}', None) for i in range(self.workers)]
+    
+    def stop(self, timeout=None):
+        """
+        Ask workers to stop after their current job and wait for them
+        
+        Args:
+            timeout (float, optional): Seconds to wait per worker
+        """
+        self._stop.set()
+        self.join(timeout)
+    
+    def join(self, timeout=None):
+        """Wait for worker threads to exit"""
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = [t for t in self._threads if t.is_alive()]
+    
+    def run_until_empty(self):
+        """
+        Process every queued job and return (for cron-style runs)
+        
+        Returns:
+            dict: Job counts by state
+        """
+        self.start(drain=True)
+        self.join()
+        return self.queue.stats()
+    
+    def _heartbeat(self):
+        """Renew the leases of running jobs until every worker has exited"""
+        while any(thread.is_alive() for thread in self._threads):
+            time.sleep(self.heartbeat_interval)
+            with self._leases_lock:
+                leases = list(self._leases.items())
+            for job_id, worker_id in leases:
+                try:
+                    if not self.queue.heartbeat(job_id, worker_id):
+                        self.logger.warning(f"⚠️ Lost the lease on job {job_id}; it may be reassigned")
+                except Exception as e:
+                    self.logger.warning(f"⚠️ Could not renew the lease on job {job_id}: {e}")
+    
+    def _work(self, drain, accounts=None):
+        """Worker loop"""
+        worker_id = worker_identity()
+        
+        while not self._stop.is_set():
+            job = self.queue.claim(worker_id, accounts)
+            if job is None:
+                # A running job may still fail back to pending or hold up its partition
+                if drain and not self.queue.stats().get('running'):
+                    return
+                self._stop.wait(self.poll_interval)
+                continue
+            
+            self.logger.info(f"Running job {job['id']} ({job['platform']}, attempt {job['attempts']})")
+            with self._leases_lock:
+                self._leases[job['id']] = worker_id
+            try:
+                result = dispatch_job(self.automation, job)
+            except Exception as e:
+                self.logger.error(f"✗ Job {job['id']} raised an error: {e}")
+                result = {'success': False, 'error': str(e), 'platform': job['platform']}
+            finally:
+                with self._leases_lock:
+                    self._leases.pop(job['id'], None)
+            
+            state = self.queue.complete(job['id'], result, worker_id)
+            if state is None:
+                self.logger.warning(f"⚠️ Job {job['id']} was reassigned while running; result not recorded")
+            elif state == 'done':
+                self.logger.info(f"✓ Job {job['id']} done")
+            else:
+                self.logger.error(f"✗ Job {job['id']} {state}: {result.get('error', 'Unknown error')}")
+
+
+class ShardedWorkerPool(WorkerPool):
+    """Worker pool with threads sharded by account / مجموعة عمال موزعة حسب الحساب"""
+    
+    def __init__(self, automation, queue=None, shards=None, workers_per_shard=None,
+                 poll_interval=None, accounts=None, heartbeat_interval=None):
+        """
+        Initialize sharded worker pool
+        
+        Each shard's workers only claim jobs of the shard's accounts, so an
+        account that is throttled or slow only holds up its own shard. Jobs
+        without an account (Config credentials) get a shard of their own.
+        Accounts are assigned when the pool starts; jobs of accounts missing
+        from the registry at that point stay pending.
+        
+        Args:
+            automation (SocialMediaAutomation): Automation instance to publish with
+            queue (JobBackend, optional): Job queue (defaults to a
+                Config.JOB_QUEUE_BACKEND queue)
+            shards (int, optional): Number of account shards
+                (defaults to Config.JOB_SHARDS, 0 = one shard per account)
+            workers_per_shard (int, optional): Threads per shard
+                (defaults to Config.JOB_SHARD_WORKERS)
+            poll_interval (float, optional): Seconds to wait when a shard is empty
+            accounts (AccountRegistry, optional): Accounts to shard
+                (defaults to the automation's registry)
+            heartbeat_interval (float, optional): Seconds between lease renewals
+        """
+        self.shards = Config.JOB_SHARDS if shards is None else shards
+        self.workers_per_shard = workers_per_shard or Config.JOB_SHARD_WORKERS
+        self.accounts = accounts
+        super().__init__(automation, queue=queue, workers=self.workers_per_shard,
+                         poll_interval=poll_interval, heartbeat_interval=heartbeat_interval)
+    
+    def _assignments(self):
+        registry = self.accounts or self.automation.accounts
+        groups = [['']] + registry.shards(self.shards)
+        
+        assignments = []
+        for shard, accounts in enumerate(groups):
+            for i in range(self.workers_per_shard):
+                assignments.append((f'job-shard-{shard}-{i}', accounts))
+        
+        self.logger.info(
+            f"Sharding {sum(len(group) for group in groups) - 1} accounts across {len(groups) - 1} shards"
+        )
+        return assignments
@@ -6,7 +6,12 @@ Author: Abu Hammad
 Repository: https://github.com/forany62/social-media-automation
 """
 
+import argparse
+import asyncio
 import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 
 # Add project root to path
@@ -14,10 +19,25 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from config import Config
 from utils.logger import setup_logger
-from platforms.facebook_publisher import FacebookPublisher
-from platforms.youtube_publisher import YouTubePublisher
-from platforms.tiktok_publisher import TikTokPublisher
-from platforms.instagram_publisher import InstagramPublisher
+from utils.http_client import get_transport
+from utils.metrics import get_metrics, start_metrics_server
+from utils.retry import circuit_status
+from utils.chunked_upload import SharedMediaReader
+from utils.post_history import get_post_history
+from platforms.registry import get_registry
+from platforms.accounts import get_account_registry
+
+
+# Display names used in result dicts / أسماء المنصات المعروضة
+PLATFORM_NAMES = {
+    'facebook': 'Facebook',
+    'instagram': 'Instagram',
+    'tiktok': 'TikTok',
+    'youtube': 'YouTube'
+}
+
+# Platforms that upload the local video_path file / المنصات التي ترفع ملف الفيديو المحلي
+LOCAL_VIDEO_PLATFORMS = ('facebook', 'tiktok', 'youtube')
 
 
 class SocialMediaAutomation:
@@ -31,47 +51,204 @@ class SocialMediaAutomation:
         self.logger.info("نظام الأتمتة لوسائل التواصل الاجتماعي يبدأ...")
         self.logger.info("=" * 60)
         
-        # Display configuration
-        Config.display()
+        # Shared pooled HTTP transport for all publishers
+        self.transport = get_transport()
+        
+        # Publishers are imported and constructed on first use
+        self.registry = get_registry()
+        self._publishers = {}
+        self._unavailable = set()
+        self._publishers_lock = threading.RLock()
         
-        # Initialize publishers
-        self.facebook = None
-        self.youtube = None
-        self.tiktok = None
-        self.instagram = None
+        # Per-account publishers, keyed by account ID
+        self._accounts = None
+        self._account_publishers = {}
         
-        self._initialize_platforms()
+        # asyncio variants, keyed by (platform, account ID)
+        self._async_publishers = {}
+        
+        # Optional Prometheus endpoint
+        if Config.METRICS_ENABLED and Config.METRICS_PORT:
+            start_metrics_server()
     
-    def _initialize_platforms(self):
-        """Initialize all platform publishers"""
-        try:
-            if Config.FACEBOOK_ACCESS_TOKEN:
-                self.facebook = FacebookPublisher()
-                self.logger.info("✓ Facebook Publisher initialized successfully")
-        except Exception as e:
-            self.logger.error(f"✗ Facebook Publisher initialization failed: {e}")
+    def metrics_snapshot(self):
+        """
+        Get the current publishing metrics
+        الحصول على مقاييس النشر الحالية
         
-        try:
-            self.youtube = YouTubePublisher()
-            self.logger.info("✓ YouTube Publisher initialized successfully")
-        except Exception as e:
-            self.logger.error(f"✗ YouTube Publisher initialization failed: {e}")
+        Returns:
+            dict: Metric name -> {label values: value}
+        """
+        return get_metrics().snapshot()
+    
+    def concurrency_limits(self):
+        """
+        Get the adaptive concurrency limits learned so far
+        الحصول على حدود التزامن الحالية
         
-        try:
-            if Config.TIKTOK_ACCESS_TOKEN:
-                self.tiktok = TikTokPublisher()
-                self.logger.info("✓ TikTok Publisher initialized successfully")
-        except Exception as e:
-            self.logger.error(f"✗ TikTok Publisher initialization failed: {e}")
+        Returns:
+            dict: "platform:endpoint" -> limit, in_flight, latency_ms,
+                baseline_ms, drops and overflows ({} when disabled)
+        """
+        concurrency = getattr(self.transport, 'concurrency', None)
+        return concurrency.status() if concurrency else {}
+    
+    def get_publisher(self, platform):
+        """
+        Get a platform publisher, creating it the first time it is needed
+        الحصول على ناشر المنصة وإنشاؤه عند أول استخدام
         
-        try:
-            if Config.INSTAGRAM_ACCESS_TOKEN:
-                self.instagram = InstagramPublisher()
-                self.logger.info("✓ Instagram Publisher initialized successfully")
-        except Exception as e:
-            self.logger.error(f"✗ Instagram Publisher initialization failed: {e}")
+        Args:
+            platform (str): Platform name
+        
+        Returns:
+            object: Publisher instance, or None if the platform is not
+                configured or failed to initialize
+        """
+        publisher = self._publishers.get(platform)
+        if publisher is not None or platform in self._unavailable:
+            return publisher
+        
+        with self._publishers_lock:
+            if platform in self._publishers or platform in self._unavailable:
+                return self._publishers.get(platform)
+            
+            name = PLATFORM_NAMES.get(platform, platform.capitalize())
+            if not self.registry.is_configured(platform):
+                self._unavailable.add(platform)
+                return None
+            
+            try:
+                publisher = self.registry.create(platform, transport=self.transport)
+                self.logger.info(f"✓ {name} Publisher initialized successfully")
+            except Exception as e:
+                self.logger.error(f"✗ {name} Publisher initialization failed: {e}")
+                self._unavailable.add(platform)
+                return None
+            
+            self._publishers[platform] = publisher
+            return publisher
     
-    def post_to_facebook(self, message, image_url=None, video_path=None):
+    @property
+    def accounts(self):
+        """Account registry, loaded from Config.ACCOUNTS_FILE on first use"""
+        if self._accounts is None:
+            self._accounts = get_account_registry()
+        return self._accounts
+    
+    @accounts.setter
+    def accounts(self, registry):
+        with self._publishers_lock:
+            self._accounts = registry
+            self._account_publishers = {}
+            self._async_publishers = {key: value for key, value in self._async_publishers.items() if not key[1]}
+    
+    def get_account_publisher(self, account_id, platform=None):
+        """
+        Get the publisher of one account, creating it the first time it is needed
+        الحصول على ناشر حساب محدد
+        
+        Args:
+            account_id (str): Account ID from the account registry
+            platform (str, optional): Expected platform of the account
+        
+        Returns:
+            object: Publisher instance, or None if the account is unknown,
+                belongs to another platform or failed to initialize
+        """
+        publisher = self._account_publishers.get(account_id)
+        if publisher is not None:
+            return publisher
+        
+        account = self.accounts.get(account_id)
+        if account is None:
+            self.logger.error(f"✗ Unknown account: {account_id}")
+            return None
+        if platform and account.platform != platform:
+            self.logger.error(f"✗ Account {account_id} is a {account.platform} account, not {platform}")
+            return None
+        
+        with self._publishers_lock:
+            publisher = self._account_publishers.get(account_id)
+            if publisher is not None:
+                return publisher
+            
+            name = PLATFORM_NAMES.get(account.platform, account.platform.capitalize())
+            try:
+                publisher = self.registry.create(
+                    account.platform, optional=('transport',), transport=self.transport,
+                    **account.credentials
+                )
+                self.logger.info(f"✓ {name} Publisher initialized for account {account_id}")
+            except Exception as e:
+                self.logger.error(f"✗ {name} Publisher initialization failed for account {account_id}: {e}")
+                return None
+            
+            self._account_publishers[account_id] = publisher
+            return publisher
+    
+    def _publisher_for(self, platform, account=None):
+        """Get the default publisher of a platform, or an account's publisher"""
+        if account:
+            return self.get_account_publisher(account, platform)
+        return self.get_publisher(platform)
+    
+    def _set_publisher(self, platform, publisher):
+        """Replace a platform publisher (None disables the platform)"""
+        with self._publishers_lock:
+            self._publishers.pop(platform, None)
+            self._async_publishers.pop((platform, None), None)
+            self._unavailable.discard(platform)
+            if publisher is None:
+                self._unavailable.add(platform)
+            else:
+                self._publishers[platform] = publisher
+    
+    def get_async_publisher(self, platform, account=None):
+        """
+        Get the asyncio variant of a platform (or account) publisher
+        الحصول على الناشر غير المتزامن للمنصة
+        
+        The async publisher wraps the regular one, so both share credentials,
+        rate limits and upload state.
+        
+        Args:
+            platform (str): Platform name
+            account (str, optional): Account ID to publish as
+        
+        Returns:
+            object: Async publisher (see platforms.async_publishers), or None if
+                the platform is unavailable or has no async variant
+        """
+        key = (platform, account)
+        publisher = self._async_publishers.get(key)
+        if publisher is not None:
+            return publisher
+        
+        base = self._publisher_for(platform, account)
+        if base is None:
+            return None
+        
+        # Imported here so aiohttp is only loaded by asyncio callers
+        from platforms.async_publishers import ASYNC_PUBLISHERS
+        
+        cls = ASYNC_PUBLISHERS.get(platform)
+        if cls is None:
+            return None
+        with self._publishers_lock:
+            return self._async_publishers.setdefault(key, cls(base))
+    
+    facebook = property(lambda self: self.get_publisher('facebook'),
+                        lambda self, value: self._set_publisher('facebook', value))
+    youtube = property(lambda self: self.get_publisher('youtube'),
+                       lambda self, value: self._set_publisher('youtube', value))
+    tiktok = property(lambda self: self.get_publisher('tiktok'),
+                      lambda self, value: self._set_publisher('tiktok', value))
+    instagram = property(lambda self: self.get_publisher('instagram'),
+                         lambda self, value: self._set_publisher('instagram', value))
+    
+    def post_to_facebook(self, message, image_url=None, video_path=None, image_path=None, account=None,
+                         idempotency_key=None):
         """
         Post to Facebook
         
@@ -79,22 +256,31 @@ class SocialMediaAutomation:
             message (str): Post message
             image_url (str, optional): URL of image to post
             video_path (str, optional): Path to video file
+            image_path (str, optional): Local image file to upload
+            account (str, optional): Account ID to post as (defaults to the
+                page configured in Config)
+            idempotency_key (str, optional): Post only if this key has not
+                succeeded before (see PostHistory.run)
         
         Returns:
             dict: Result with success status and details
         """
-        if not self.facebook:
+        facebook = self._publisher_for('facebook', account)
+        if not facebook:
             self.logger.error("Facebook publisher not initialized")
             return {'success': False, 'error': 'Publisher not initialized', 'platform': 'Facebook'}
         
         if video_path:
-            return self.facebook.post_video(video_path, message)
-        elif image_url:
-            return self.facebook.post_image(message, image_url)
+            content_type, publish = "video", lambda: facebook.post_video(video_path, message)
+        elif image_path or image_url:
+            content_type, publish = "image", lambda: facebook.post_image(message, image_url, image_path=image_path)
         else:
-            return self.facebook.post_text(message)
+            content_type, publish = "text", lambda: facebook.post_text(message)
+        content = {'message': message, 'image_url': image_url, 'image_path': image_path, 'video_path': video_path}
+        return self._record_post('facebook', content_type, content, publish, account, idempotency_key)
     
-    def post_to_youtube(self, video_path, title, description, tags=None, privacy="private"):
+    def post_to_youtube(self, video_path, title, description, tags=None, privacy="private", account=None,
+                        idempotency_key=None):
         """
         Upload video to YouTube
         
@@ -104,17 +290,26 @@ class SocialMediaAutomation:
             description (str): Video description
             tags (list, optional): List of tags
             privacy (str): Privacy status (public, private, unlisted)
+            account (str, optional): Account ID of the channel to upload to
+            idempotency_key (str, optional): Upload only if this key has not
+                succeeded before
         
         Returns:
             dict: Result with success status and video ID
         """
-        if not self.youtube:
+        youtube = self._publisher_for('youtube', account)
+        if not youtube:
             self.logger.error("YouTube publisher not initialized")
             return {'success': False, 'error': 'Publisher not initialized', 'platform': 'YouTube'}
         
-        return self.youtube.upload_video(video_path, title, description, tags, privacy)
+        content = {'video_path': video_path, 'title': title, 'description': description,
+                   'tags': tags, 'privacy': privacy}
+        return self._record_post('youtube', 'video', content,
+                                 lambda: youtube.upload_video(video_path, title, description, tags, privacy),
+                                 account, idempotency_key)
     
-    def post_to_tiktok(self, video_path, title, privacy_level="PUBLIC_TO_EVERYONE"):
+    def post_to_tiktok(self, video_path, title, privacy_level="PUBLIC_TO_EVERYONE", account=None,
+                       idempotency_key=None):
         """
         Post video to TikTok
         
@@ -122,17 +317,56 @@ class SocialMediaAutomation:
             video_path (str): Path to video file
             title (str): Video title/caption
             privacy_level (str): Privacy level (PUBLIC_TO_EVERYONE, MUTUAL_FOLLOW_FRIENDS, SELF_ONLY)
+            account (str, optional): Account ID to post as
+            idempotency_key (str, optional): Post only if this key has not
+                succeeded before
         
         Returns:
             dict: Result with success status and publish ID
         """
-        if not self.tiktok:
+        tiktok = self._publisher_for('tiktok', account)
+        if not tiktok:
             self.logger.error("TikTok publisher not initialized")
             return {'success': False, 'error': 'Publisher not initialized', 'platform': 'TikTok'}
         
-        return self.tiktok.post_video(video_path, title, privacy_level)
+        content = {'video_path': video_path, 'title': title, 'privacy_level': privacy_level}
+        return self._record_post('tiktok', 'video', content,
+                                 lambda: tiktok.post_video(video_path, title, privacy_level),
+                                 account, idempotency_key)
+    
+    def post_to_tiktok_async(self, video_path, title, privacy_level="PUBLIC_TO_EVERYONE",
+                             account=None, callback=None, idempotency_key=None):
+        """
+        Upload a video to TikTok without waiting for processing
+        رفع فيديو على تيك توك دون انتظار المعالجة
+        
+        Args:
+            video_path (str): Path to video file
+            title (str): Video title
+            privacy_level (str): Privacy level
+            account (str, optional): Account ID to post as
+            callback (callable, optional): Called with the result dict
+            idempotency_key (str, optional): Post only if this key has not
+                succeeded before
+        
+        Returns:
+            Future: Resolves to the result with success status and publish ID
+        """
+        tiktok = self._publisher_for('tiktok', account)
+        if not tiktok:
+            self.logger.error("TikTok publisher not initialized")
+            future = Future()
+            future.set_result({'success': False, 'error': 'Publisher not initialized', 'platform': 'TikTok'})
+            if callback:
+                callback(future.result())
+            return future
+        
+        content = {'video_path': video_path, 'title': title, 'privacy_level': privacy_level}
+        return self._record_future('tiktok', 'video', content,
+                                   lambda: tiktok.post_video_async(video_path, title, privacy_level),
+                                   account, idempotency_key, callback)
     
-    def post_to_instagram(self, image_url=None, video_url=None, caption=""):
+    def post_to_instagram(self, image_url=None, video_url=None, caption="", account=None, idempotency_key=None):
         """
         Post to Instagram
         
@@ -140,102 +374,607 @@ class SocialMediaAutomation:
             image_url (str, optional): Public URL of image
             video_url (str, optional): Public URL of video
             caption (str): Post caption
+            account (str, optional): Account ID to post as
+            idempotency_key (str, optional): Post only if this key has not
+                succeeded before
         
         Returns:
             dict: Result with success status and media ID
         """
-        if not self.instagram:
+        instagram = self._publisher_for('instagram', account)
+        if not instagram:
             self.logger.error("Instagram publisher not initialized")
             return {'success': False, 'error': 'Publisher not initialized', 'platform': 'Instagram'}
         
         if video_url:
-            return self.instagram.post_video(video_url, caption)
+            content_type, publish = "video", lambda: instagram.post_video(video_url, caption)
         elif image_url:
-            return self.instagram.post_image(image_url, caption)
+            content_type, publish = "image", lambda: instagram.post_image(image_url, caption)
         else:
             self.logger.error("Either image_url or video_url is required for Instagram")
             return {'success': False, 'error': 'No media URL provided', 'platform': 'Instagram'}
+        
+        content = {'image_url': image_url, 'video_url': video_url, 'caption': caption}
+        return self._record_post('instagram', content_type, content, publish, account, idempotency_key)
+    
+    def post_to_instagram_async(self, video_url, caption="", account=None, callback=None, idempotency_key=None):
+        """
+        Start an Instagram video post without waiting for processing
+        بدء نشر فيديو على إنستجرام دون انتظار
+        
+        Args:
+            video_url (str): Public URL of video
+            caption (str): Post caption
+            account (str, optional): Account ID to post as
+            callback (callable, optional): Called with the result dict
+            idempotency_key (str, optional): Post only if this key has not
+                succeeded before
+        
+        Returns:
+            Future: Resolves to the result with success status and media ID
+        """
+        instagram = self._publisher_for('instagram', account)
+        if not instagram:
+            self.logger.error("Instagram publisher not initialized")
+            future = Future()
+            future.set_result({'success': False, 'error': 'Publisher not initialized', 'platform': 'Instagram'})
+            if callback:
+                callback(future.result())
+            return future
+        
+        content = {'video_url': video_url, 'caption': caption}
+        return self._record_future('instagram', 'video', content,
+                                   lambda: instagram.post_video_async(video_url, caption),
+                                   account, idempotency_key, callback)
     
-    def post_to_all(self, content_type, **kwargs):
+    @staticmethod
+    def _record_post(platform, content_type, content, publish, account=None, idempotency_key=None):
+        """
+        Run a publishing call through the post history (see PostHistory.run)
+        
+        Returns:
+            dict: Publisher result, or the recorded one for a duplicate key
+        """
+        history = get_post_history()
+        if history is None:
+            return publish()
+        content = {name: value for name, value in content.items() if value is not None}
+        return history.run(platform, content_type, content, publish, account, idempotency_key)
+    
+    @staticmethod
+    def _record_future(platform, content_type, content, publish, account=None, idempotency_key=None,
+                       callback=None):
+        """Same as _record_post for calls returning a Future; callback gets the result"""
+        history = get_post_history()
+        if history is None:
+            future = publish()
+        else:
+            content = {name: value for name, value in content.items() if value is not None}
+            future = history.run_future(platform, content_type, content, publish, account, idempotency_key)
+        if callback:
+            future.add_done_callback(lambda done: callback(done.result()))
+        return future
+    
+    def post_to_all(self, content_type, concurrent=None, idempotency_key=None, **kwargs):
         """
         Post to all available platforms
         
         Args:
             content_type (str): Type of content ('text', 'image', 'video')
+            concurrent (bool, optional): Publish to all platforms at once
+                (defaults to Config.CONCURRENT_PUBLISHING)
+            idempotency_key (str, optional): Key of this post; each platform
+                is posted under '<key>:<platform>', so a retry only posts to
+                the platforms that have not succeeded yet
             **kwargs: Platform-specific arguments
                 - message: Text message
                 - image_url: URL of image
+                - image_path: Local image; each platform gets its own variant
                 - video_path: Path to video file
                 - title: Video/post title
                 - description: Video description
                 - caption: Image/video caption
                 - tags: List of tags for YouTube
+                - privacy_level: TikTok privacy level (defaults to PUBLIC_TO_EVERYONE)
         
         Returns:
             dict: Results from all platforms
         """
-        results = {}
+        if concurrent is None:
+            concurrent = Config.CONCURRENT_PUBLISHING
         
         self.logger.info(f"\nPosting {content_type} content to all platforms...")
         self.logger.info(f"نشر محتوى {content_type} على جميع المنصات...")
         
-        # Facebook
-        if content_type == "text" and self.facebook:
-            self.logger.info("Publishing to Facebook...")
-            results['facebook'] = self.post_to_facebook(kwargs.get('message', ''))
-        elif content_type == "image" and self.facebook:
-            self.logger.info("Publishing image to Facebook...")
-            results['facebook'] = self.post_to_facebook(
-                kwargs.get('message', ''),
-                image_url=kwargs.get('image_url')
-            )
-        elif content_type == "video" and self.facebook:
-            self.logger.info("Publishing video to Facebook...")
-            results['facebook'] = self.post_to_facebook(
-                kwargs.get('message', ''),
-                video_path=kwargs.get('video_path')
+        tasks = self._build_tasks(content_type, kwargs, idempotency_key)
+        
+        if concurrent and len(tasks) > 1 and content_type == "video" and kwargs.get('video_path'):
+            results = self._run_shared_video(tasks, kwargs['video_path'], {key: key for key, _, _ in tasks})
+        elif concurrent and len(tasks) > 1:
+            results = self._run_concurrent(tasks)
+        else:
+            results = self._run_sequential(tasks)
+        
+        self._log_summary(results)
+        
+        return results
+    
+    async def post_to_all_async(self, content_type, idempotency_key=None, **kwargs):
+        """
+        Post to all available platforms from asyncio code
+        النشر على جميع المنصات بشكل غير متزامن
+        
+        Takes the same arguments and returns the same results as post_to_all.
+        Every platform is published at once on the running event loop through
+        the async publishers, without a thread per post; each one is limited
+        to Config.PLATFORM_TIMEOUT seconds.
+        
+        Args:
+            content_type (str): Type of content ('text', 'image', 'video')
+            idempotency_key (str, optional): Same as for post_to_all
+            **kwargs: Same arguments as post_to_all
+        
+        Returns:
+            dict: Results from all platforms
+        """
+        self.logger.info(f"\nPosting {content_type} content to all platforms...")
+        self.logger.info(f"نشر محتوى {content_type} على جميع المنصات...")
+        
+        # Image rendering and publisher construction block, so they run on a worker thread
+        images = {}
+        if content_type == "image" and kwargs.get('image_path'):
+            images = await asyncio.to_thread(self._prepare_images, kwargs['image_path'])
+        # Like _build_tasks, only platforms that take this content type get a publisher
+        platforms = [platform for platform in PLATFORM_NAMES
+                     if self._platform_task(platform, content_type, kwargs, images) is not None]
+        publishers = await asyncio.to_thread(
+            lambda: {platform: self.get_async_publisher(platform) for platform in platforms}
+        )
+        
+        tasks = []
+        for platform, publisher in publishers.items():
+            task = publisher and self._async_platform_task(
+                platform, publisher, content_type, kwargs, images, idempotency_key
             )
+            if task:
+                tasks.append((platform,) + task)
         
-        # Instagram
-        if content_type == "image" and self.instagram:
-            self.logger.info("Publishing image to Instagram...")
-            results['instagram'] = self.post_to_instagram(
-                image_url=kwargs.get('image_url'),
-                caption=kwargs.get('caption', kwargs.get('message', ''))
+        for _, message, _ in tasks:
+            self.logger.info(message)
+        published = await asyncio.gather(*(self._safe_publish_async(key, publish) for key, _, publish in tasks))
+        results = {key: result for (key, _, _), result in zip(tasks, published)}
+        
+        self._log_summary(results)
+        
+        return results
+    
+    def post_to_accounts(self, accounts, content_type, concurrent=None, idempotency_key=None, **kwargs):
+        """
+        Post the same content to many accounts
+        نشر المحتوى نفسه على عدة حسابات
+        
+        Each account is published with its own publisher and credentials, so
+        rate limits and throttling are tracked per page/profile; at most
+        Config.MAX_CONCURRENT_ACCOUNTS accounts are published at once and each
+        account holds at most one slot, so a throttled page only delays itself.
+        
+        Args:
+            accounts (list or str): Account IDs, 'tag:<tag>', 'platform:<name>'
+                or '*' (see AccountRegistry.select)
+            content_type (str): Type of content ('text', 'image', 'video')
+            concurrent (bool, optional): Publish to the accounts at once
+                (defaults to Config.CONCURRENT_PUBLISHING)
+            idempotency_key (str, optional): Key of this post; each account is
+                posted under '<key>:<platform>:<account>'
+            **kwargs: Same arguments as post_to_all
+        
+        Returns:
+            dict: Account ID -> result; accounts whose platform does not take
+                this content type are left out
+        """
+        if concurrent is None:
+            concurrent = Config.CONCURRENT_PUBLISHING
+        
+        try:
+            targets = self.accounts.select(accounts)
+        except KeyError as e:
+            self.logger.error(f"✗ {e.args[0]}")
+            return {}
+        
+        self.logger.info(f"\nPosting {content_type} content to {len(targets)} accounts...")
+        self.logger.info(f"نشر محتوى {content_type} على {len(targets)} حساب...")
+        
+        images = {}
+        if content_type == "image" and kwargs.get('image_path'):
+            images = self._prepare_images(kwargs['image_path'], {account.platform for account in targets})
+        
+        tasks = []
+        names = {}
+        for account in targets:
+            task = self._platform_task(
+                account.platform, content_type, kwargs, images, account=account.id, idempotency_key=idempotency_key
             )
-        elif content_type == "video" and self.instagram:
-            self.logger.info("Publishing video to Instagram...")
-            results['instagram'] = self.post_to_instagram(
-                video_url=kwargs.get('video_url'),
-                caption=kwargs.get('caption', kwargs.get('message', ''))
+            if task is None:
+                self.logger.warning(
+                    f"⚠️ Skipping account {account.id}: {account.platform} does not take {content_type} posts"
+                )
+                continue
+            message, publish = task
+            tasks.append((account.id, f"{message} [{account.id}]", publish))
+            names[account.id] = PLATFORM_NAMES.get(account.platform, account.platform)
+        
+        platforms = {account.id: account.platform for account in targets}
+        if concurrent and len(tasks) > 1 and content_type == "video" and kwargs.get('video_path'):
+            results = self._run_shared_video(
+                tasks, kwargs['video_path'], platforms, Config.MAX_CONCURRENT_ACCOUNTS, names
             )
+        elif concurrent and len(tasks) > 1:
+            results = self._run_concurrent(tasks, Config.MAX_CONCURRENT_ACCOUNTS, names)
+        else:
+            results = self._run_sequential(tasks, names)
+        for account_id, result in results.items():
+            result.setdefault('account', account_id)
+        
+        self._log_summary(results, platforms)
+        
+        return results
+    
+    def _build_tasks(self, content_type, kwargs, idempotency_key=None):
+        """
+        Build the list of per-platform publishing calls for post_to_all
+        
+        Returns:
+            list: (platform, log message, callable) tuples in publishing order
+        """
+        images = {}
+        if content_type == "image" and kwargs.get('image_path'):
+            images = self._prepare_images(kwargs['image_path'])
+        
+        tasks = []
+        for platform in PLATFORM_NAMES:
+            task = self._platform_task(platform, content_type, kwargs, images, idempotency_key=idempotency_key)
+            if task and self.get_publisher(platform):
+                tasks.append((platform,) + task)
+        return tasks
+    
+    def _platform_task(self, platform, content_type, kwargs, images, account=None, idempotency_key=None):
+        """
+        Build the publishing call for one platform (or one account)
+        
+        Args:
+            platform (str): Platform name
+            content_type (str): Type of content ('text', 'image', 'video')
+            kwargs (dict): post_to_all arguments
+            images (dict): Prepared image variants (see _prepare_images)
+            account (str, optional): Account ID to publish as
+            idempotency_key (str, optional): Key of the whole post (see
+                _task_key)
+        
+        Returns:
+            tuple: (log message, callable), or None if the platform does not
+                take this content type
+        """
+        caption = kwargs.get('caption', kwargs.get('message', ''))
+        key = self._task_key(idempotency_key, platform, account)
+        
+        # Facebook
+        if platform == 'facebook' and content_type == "text":
+            return ("Publishing to Facebook...",
+                    lambda: self.post_to_facebook(kwargs.get('message', ''), account=account, idempotency_key=key))
+        if platform == 'facebook' and content_type == "image":
+            return ("Publishing image to Facebook...",
+                    lambda: self.post_to_facebook(
+                        kwargs.get('message', ''),
+                        image_url=kwargs.get('image_url'),
+                        image_path=images.get('facebook', kwargs.get('image_path')),
+                        account=account,
+                        idempotency_key=key
+                    ))
+        if platform == 'facebook' and content_type == "video":
+            return ("Publishing video to Facebook...",
+                    lambda: self.post_to_facebook(
+                        kwargs.get('message', ''),
+                        video_path=kwargs.get('video_path'),
+                        account=account,
+                        idempotency_key=key
+                    ))
+        
+        # Instagram
+        if platform == 'instagram' and content_type == "image":
+            return ("Publishing image to Instagram...",
+                    lambda: self.post_to_instagram(
+                        image_url=kwargs.get('image_url') or images.get('instagram_url'),
+                        caption=caption,
+                        account=account,
+                        idempotency_key=key
+                    ))
+        if platform == 'instagram' and content_type == "video":
+            return ("Publishing video to Instagram...",
+                    lambda: self.post_to_instagram(
+                        video_url=kwargs.get('video_url'),
+                        caption=caption,
+                        account=account,
+                        idempotency_key=key
+                    ))
         
         # TikTok (videos only)
-        if content_type == "video" and self.tiktok:
-            self.logger.info("Publishing video to TikTok...")
-            results['tiktok'] = self.post_to_tiktok(
-                kwargs.get('video_path'),
-                kwargs.get('title', kwargs.get('message', ''))
-            )
+        if platform == 'tiktok' and content_type == "video":
+            return ("Publishing video to TikTok...",
+                    lambda: self.post_to_tiktok(
+                        kwargs.get('video_path'),
+                        kwargs.get('title', kwargs.get('message', '')),
+                        kwargs.get('privacy_level', "PUBLIC_TO_EVERYONE"),
+                        account=account,
+                        idempotency_key=key
+                    ))
         
         # YouTube (videos only)
-        if content_type == "video" and self.youtube:
-            self.logger.info("Uploading video to YouTube...")
-            results['youtube'] = self.post_to_youtube(
-                kwargs.get('video_path'),
-                kwargs.get('title', 'Video'),
-                kwargs.get('description', ''),
-                kwargs.get('tags', []),
-                kwargs.get('privacy', 'private')
-            )
+        if platform == 'youtube' and content_type == "video":
+            return ("Uploading video to YouTube...",
+                    lambda: self.post_to_youtube(
+                        kwargs.get('video_path'),
+                        kwargs.get('title', 'Video'),
+                        kwargs.get('description', ''),
+                        kwargs.get('tags', []),
+                        kwargs.get('privacy', 'private'),
+                        account=account,
+                        idempotency_key=key
+                    ))
+        
+        return None
+    
+    @staticmethod
+    def _task_key(idempotency_key, platform, account=None):
+        """Idempotency key of one platform (or account) of a post, or None"""
+        if not idempotency_key:
+            return None
+        return ':'.join(part for part in (idempotency_key, platform, account) if part)
+    
+    def _async_platform_task(self, platform, publisher, content_type, kwargs, images, idempotency_key=None):
+        """
+        Build the async publishing call for one platform (see _platform_task)
+        
+        Returns:
+            tuple: (log message, coroutine function), or None if the platform
+                does not take this content type
+        """
+        message = kwargs.get('message', '')
+        caption = kwargs.get('caption', message)
+        video_path = kwargs.get('video_path')
+        
+        if platform == 'facebook' and content_type == "text":
+            task = ("Publishing to Facebook...", {'message': message}, lambda: publisher.post_text(message))
+        elif platform == 'facebook' and content_type == "image":
+            image_url = kwargs.get('image_url')
+            image_path = images.get('facebook', kwargs.get('image_path'))
+            task = ("Publishing image to Facebook...",
+                    {'message': message, 'image_url': image_url, 'image_path': image_path},
+                    lambda: publisher.post_image(message, image_url, image_path=image_path))
+        elif platform == 'facebook' and content_type == "video":
+            task = ("Publishing video to Facebook...", {'message': message, 'video_path': video_path},
+                    lambda: publisher.post_video(video_path, message))
+        
+        elif platform == 'instagram' and content_type in ("image", "video"):
+            image_url = kwargs.get('image_url') or images.get('instagram_url')
+            media_url = kwargs.get('video_url') if content_type == "video" else image_url
+            if not media_url:
+                async def missing():
+                    self.logger.error("Either image_url or video_url is required for Instagram")
+                    return {'success': False, 'error': 'No media URL provided', 'platform': 'Instagram'}
+                return f"Publishing {content_type} to Instagram...", missing
+            if content_type == "video":
+                task = ("Publishing video to Instagram...", {'video_url': media_url, 'caption': caption},
+                        lambda: publisher.post_video(media_url, caption))
+            else:
+                task = ("Publishing image to Instagram...", {'image_url': media_url, 'caption': caption},
+                        lambda: publisher.post_image(media_url, caption))
+        
+        elif platform == 'tiktok' and content_type == "video":
+            title = kwargs.get('title', message)
+            privacy_level = kwargs.get('privacy_level', "PUBLIC_TO_EVERYONE")
+            task = ("Publishing video to TikTok...",
+                    {'video_path': video_path, 'title': title, 'privacy_level': privacy_level},
+                    lambda: publisher.post_video(video_path, title, privacy_level))
+        
+        elif platform == 'youtube' and content_type == "video":
+            upload = {
+                'video_path': video_path,
+                'title': kwargs.get('title', 'Video'),
+                'description': kwargs.get('description', ''),
+                'tags': kwargs.get('tags', []),
+                'privacy': kwargs.get('privacy', 'private')
+            }
+            task = ("Uploading video to YouTube...", upload, lambda: publisher.upload_video(**upload))
+        
+        else:
+            return None
+        
+        log_message, content, publish = task
+        history = get_post_history()
+        if history is None:
+            return log_message, publish
+        content = {name: value for name, value in content.items() if value is not None}
+        key = self._task_key(idempotency_key, platform)
+        return log_message, lambda: history.run_async(platform, content_type, content, publish, None, key)
+    
+    def _prepare_images(self, image_path, platforms=None):
+        """
+        Render the per-platform variants of a local image in parallel
+        
+        Args:
+            image_path (str): Source image
+            platforms (iterable, optional): Platforms to prepare variants for
+                (defaults to the configured ones)
+        
+        Returns:
+            dict: platform -> variant path, plus 'instagram_url' when the
+                variant directory is published at Config.IMAGE_VARIANT_BASE_URL
+        """
+        # Imported here so Pillow is only loaded when images are prepared
+        from utils.image_variants import get_image_pipeline
+        
+        pipeline = get_image_pipeline()
+        if not pipeline:
+            return {}
+        
+        if platforms is None:
+            platforms = [name for name in ('facebook', 'instagram') if getattr(self, name)]
+        images = pipeline.prepare(image_path, list(platforms))
+        if 'instagram' in images:
+            images['instagram_url'] = pipeline.public_url(images['instagram'])
+        return images
+    
+    @staticmethod
+    def _label(key, names):
+        """Display name of a task key, with the account ID for account tasks"""
+        name = names.get(key, key)
+        return name if key in PLATFORM_NAMES else f"{name} [{key}]"
+    
+    def _run_sequential(self, tasks, names=None):
+        """Run publishing calls one after another"""
+        names = names or PLATFORM_NAMES
+        results = {}
+        for key, message, publish in tasks:
+            self.logger.info(message)
+            results[key] = self._safe_publish(key, publish, names)
+        return results
+    
+    def _run_concurrent(self, tasks, max_workers=None, names=None):
+        """
+        Run publishing calls concurrently on a bounded thread pool
+        
+        Every call is dispatched at once; at most max_workers (defaults to
+        Config.MAX_CONCURRENT_PLATFORMS) run at the same time. A call that runs
+        longer than Config.PLATFORM_TIMEOUT seconds is reported as failed and
+        no longer waited on, so one hanging platform never holds up the others.
+        
+        Args:
+            tasks (list): (key, log message, callable) tuples
+            max_workers (int, optional): Calls run at the same time
+            names (dict, optional): key -> platform display name
+                (defaults to PLATFORM_NAMES)
+        """
+        names = names or PLATFORM_NAMES
+        timeout = Config.PLATFORM_TIMEOUT
+        started = {}
+        results = {}
+        
+        def run(key, publish):
+            started[key] = time.monotonic()
+            return self._safe_publish(key, publish, names)
+        
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers or Config.MAX_CONCURRENT_PLATFORMS, len(tasks))),
+            thread_name_prefix='publisher'
+        )
+        pending = {}
+        for key, message, publish in tasks:
+            self.logger.info(message)
+            pending[executor.submit(run, key, publish)] = key
+        
+        try:
+            while pending:
+                now = time.monotonic()
+                
+                # Give up on calls that have run past their deadline
+                for future, key in list(pending.items()):
+                    if key in started and now - started[key] >= timeout:
+                        self.logger.error(f"✗ {self._label(key, names)} timed out after {timeout:.0f}s")
+                        results[key] = {
+                            'success': False,
+                            'error': f'Timed out after {timeout:.0f}s',
+                            'platform': names.get(key, key)
+                        }
+                        del pending[future]
+                if not pending:
+                    break
+                
+                # Sleep until the next deadline, or briefly if some calls have not started yet
+                deadlines = [started[k] + timeout for k in pending.values() if k in started]
+                wait_for = min(deadlines) - now if deadlines else 0.5
+                if len(deadlines) < len(pending):
+                    wait_for = min(wait_for, 0.5)
+                
+                done, _ = wait(pending, timeout=max(wait_for, 0), return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        # Keep the same order as the sequential mode
+        return {key: results[key] for key, _, _ in tasks if key in results}
+    
+    def _run_shared_video(self, tasks, video_path, platforms, max_workers=None, names=None):
+        """
+        Run video uploads concurrently, reading the file once for all of them
+        
+        The uploads of video_path share one SharedMediaReader: they read the
+        same mapped pages, the fastest waits when it gets a window ahead of
+        the slowest, and pages every upload has passed are released. An
+        upload past Config.PLATFORM_TIMEOUT, or stalled, is no longer waited
+        for, so it cannot hold up the others.
+        
+        Args:
+            tasks (list): (key, log message, callable) tuples
+            video_path (str): Video file uploaded by the tasks
+            platforms (dict): key -> platform name
+            max_workers (int, optional): Calls run at the same time
+            names (dict, optional): key -> platform display name
+        """
+        uploads = {key for key, _, _ in tasks if platforms.get(key) in LOCAL_VIDEO_PLATFORMS}
+        if len(uploads) < 2:
+            return self._run_concurrent(tasks, max_workers, names)
+        
+        try:
+            reader = SharedMediaReader(video_path)
+        except OSError:
+            # Missing or unreadable: every publisher reports it on its own
+            return self._run_concurrent(tasks, max_workers, names)
         
-        # Display summary
+        try:
+            shared = [(key, message, reader.wrap(publish, Config.PLATFORM_TIMEOUT) if key in uploads else publish)
+                      for key, message, publish in tasks]
+            return self._run_concurrent(shared, max_workers, names)
+        finally:
+            reader.close()
+    
+    def _safe_publish(self, key, publish, names=None):
+        """Call a publisher, turning unexpected exceptions into a failed result"""
+        names = names or PLATFORM_NAMES
+        try:
+            return publish()
+        except Exception as e:
+            self.logger.error(f"✗ {self._label(key, names)} publishing raised an error: {e}")
+            return {'success': False, 'error': str(e), 'platform': names.get(key, key)}
+    
+    async def _safe_publish_async(self, key, publish):
+        """Await an async publisher call, turning timeouts and exceptions into a failed result"""
+        name = PLATFORM_NAMES.get(key, key)
+        timeout = Config.PLATFORM_TIMEOUT
+        try:
+            return await asyncio.wait_for(publish(), timeout)
+        except asyncio.TimeoutError:
+            self.logger.error(f"✗ {name} timed out after {timeout:.0f}s")
+            return {'success': False, 'error': f'Timed out after {timeout:.0f}s', 'platform': name}
+        except Exception as e:
+            self.logger.error(f"✗ {name} publishing raised an error: {e}")
+            return {'success': False, 'error': str(e), 'platform': name}
+    
+    def _log_summary(self, results, platforms=None):
+        """
+        Display the publication summary for post_to_all / post_to_accounts
+        
+        Args:
+            results (dict): key -> result
+            platforms (dict, optional): Account ID -> platform, for account results
+        """
+        circuits = circuit_status()
         self.logger.info("\n" + "=" * 60)
         self.logger.info("Publication Summary / ملخص النشر:")
         self.logger.info("=" * 60)
-        for platform, result in results.items():
+        for key, result in results.items():
             status = "✓ Success" if result.get('success') else "✗ Failed"
-            self.logger.info(f"{platform.capitalize()}: {status}")
+            self.logger.info(f"{key if platforms else key.capitalize()}: {status}")
             if result.get('success'):
                 if 'post_id' in result:
                     self.logger.info(f"  Post ID: {result['post_id']}")
@@ -247,20 +986,177 @@ class SocialMediaAutomation:
                     self.logger.info(f"  Publish ID: {result['publish_id']}")
             else:
                 self.logger.error(f"  Error: {result.get('error', 'Unknown error')}")
+            
+            breaker = circuits.get(platforms.get(key) if platforms else key)
+            if breaker:
+                self.logger.info(
+                    f"  Circuit: {breaker['state']} "
+                    f"(failures: {breaker['failures']}, retries: {breaker['retries']})"
+                )
+        if platforms:
+            succeeded = sum(1 for result in results.values() if result.get('success'))
+            self.logger.info(f"Accounts: {succeeded}/{len(results)} succeeded")
         self.logger.info("=" * 60 + "\n")
-        
-        return results
 
 
-def main():
+def build_parser():
+    """Build the command-line parser"""
+    parser = argparse.ArgumentParser(description="Social Media Automation Tool")
+    commands = parser.add_subparsers(dest='command')
+    
+    campaign = commands.add_parser('campaign', help="Publish a CSV/JSONL campaign file")
+    campaign.add_argument('file', help="Campaign file (.csv or .jsonl)")
+    campaign.add_argument('--format', choices=['csv', 'jsonl'],
+                          help="File format (defaults to the file extension)")
+    campaign.add_argument('--concurrency', type=int, default=Config.CAMPAIGN_CONCURRENCY,
+                          help="Posts published at once")
+    campaign.add_argument('--campaign-id',
+                          help="Checkpoint name (defaults to a hash of the file path)")
+    campaign.add_argument('--checkpoint-db', default=Config.CAMPAIGN_DB,
+                          help="Checkpoint database")
+    campaign.add_argument('--no-checkpoint', action='store_true',
+                          help="Process every row and record nothing")
+    campaign.add_argument('--dry-run', action='store_true',
+                          help="Validate and dedupe without publishing")
+    
+    worker = commands.add_parser('worker', help="Run a job worker node on the shared queue")
+    worker.add_argument('--workers', type=int, default=Config.JOB_WORKERS,
+                        help="Worker threads on this node")
+    worker.add_argument('--sharded', action='store_true',
+                        help="Shard the worker threads by account")
+    worker.add_argument('--ordered', action='store_true', default=Config.JOB_ORDERED_PARTITIONS,
+                        help="Run the jobs of each platform/account one at a time, in order")
+    worker.add_argument('--drain', action='store_true',
+                        help="Exit once the queue is empty")
+    
+    history = commands.add_parser('history', help="Show recently published posts")
+    history.add_argument('--platform', choices=sorted(PLATFORM_NAMES), help="Only this platform")
+    history.add_argument('--account', help="Only this account ID (needs --platform)")
+    history.add_argument('--days', type=float, default=7, help="How far back to look")
+    history.add_argument('--failed', action='store_true', help="Only failed posts")
+    history.add_argument('--limit', type=int, default=50, help="Posts shown")
+    return parser
+
+
+def run_campaign(automation, args):
+    """
+    Publish a campaign file from the command line
+    نشر ملف حملة من سطر الأوامر
+    
+    Returns:
+        int: Exit code (0 if no post failed)
+    """
+    from jobs.campaign import CampaignCheckpoint, CampaignRunner, read_rows
+    
+    checkpoint = None
+    if not args.no_checkpoint:
+        campaign_id = args.campaign_id or CampaignCheckpoint.campaign_id_for(args.file)
+        checkpoint = CampaignCheckpoint(campaign_id, source=args.file, db_path=args.checkpoint_db)
+    
+    runner = CampaignRunner(
+        automation, checkpoint=checkpoint, concurrency=args.concurrency, dry_run=args.dry_run
+    )
+    try:
+        stats = runner.run(read_rows(args.file, args.format))
+    except KeyboardInterrupt:
+        print("\n⚠️ Interrupted - run the same command again to resume")
+        return 130
+    
+    print("\n📊 Campaign summary:")
+    for name, count in stats.items():
+        print(f"   {name}: {count}")
+    return 1 if stats['failed'] else 0
+
+
+def run_worker(automation, args):
+    """
+    Run a job worker node until interrupted (or the queue is empty)
+    تشغيل عقدة عمال المهام
+    
+    Returns:
+        int: Exit code
+    """
+    from jobs.job_queue import create_job_queue
+    from jobs.worker import ShardedWorkerPool, WorkerPool
+    
+    queue = create_job_queue(ordered=True) if args.ordered else create_job_queue()
+    if args.sharded:
+        pool = ShardedWorkerPool(automation, queue=queue)
+    else:
+        pool = WorkerPool(automation, queue=queue, workers=args.workers)
+    
+    try:
+        if args.drain:
+            pool.run_until_empty()
+        else:
+            pool.start()
+            pool.join()
+    except KeyboardInterrupt:
+        print("\n⚠️ Stopping after the running jobs finish...")
+        pool.stop()
+    
+    print("\n📊 Queue summary:")
+    for state, count in pool.queue.stats().items():
+        print(f"   {state}: {count}")
+    
+    limits = automation.concurrency_limits()
+    if limits:
+        print("\n📊 Concurrency limits:")
+        for name, status in sorted(limits.items()):
+            print(f"   {name}: {status['limit']} (drops: {status['drops']}, latency: {status['latency_ms']} ms)")
+    return 0
+
+
+def show_history(args):
+    """
+    Print recent post history from the command line
+    عرض سجل المنشورات الأخيرة
+    
+    Returns:
+        int: Exit code
+    """
+    history = get_post_history()
+    if history is None:
+        print("Post history is disabled (POST_HISTORY_ENABLED=False)")
+        return 1
+    
+    entries = history.recent(
+        platform=args.platform,
+        account=args.account,
+        since=time.time() - args.days * 86400,
+        success=False if args.failed else None,
+        limit=args.limit
+    )
+    for entry in entries:
+        when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['finished_at']))
+        status = '✓' if entry['success'] else '✗'
+        target = entry['platform'] + (f" [{entry['account']}]" if entry['account'] else '')
+        detail = entry['remote_id'] if entry['success'] else entry['error']
+        print(f"{when}  {status} {target} {entry['content_type']}: {detail} ({entry['latency_ms']:.0f} ms)")
+    print(f"\n📊 {len(entries)} posts")
+    return 0
+
+
+def main(argv=None):
     """Main entry point"""
+    args = build_parser().parse_args(argv)
+    
     print("\n" + "=" * 60)
     print("🤖 Social Media Automation Tool")
     print("🤖 أداة الأتمتة لوسائل التواصل الاجتماعي")
     print("=" * 60 + "\n")
     
+    if args.command == 'history':
+        return show_history(args)
+    
     # Create automation instance
     automation = SocialMediaAutomation()
+    Config.display()
+    
+    if args.command == 'campaign':
+        return run_campaign(automation, args)
+    if args.command == 'worker':
+        return run_worker(automation, args)
     
     # Example usage
     print("\n📝 Ready to use!")
@@ -270,9 +1166,13 @@ def main():
     print("  - automation.post_to_youtube('video.mp4', 'Title', 'Description')")
     print("  - automation.post_to_instagram(image_url='https://...', caption='Caption')")
     print("  - automation.post_to_all('text', message='Hello all platforms!')")
+    print("  - python main.py campaign posts.csv --concurrency 8")
+    print("  - python main.py worker --workers 8   (one per host, sharing JOB_QUEUE_DB)")
+    print("  - python main.py history --platform facebook --days 7")
     print("\nCheck examples/ folder for more usage examples")
     print("راجع مجلد examples/ لأمثلة استخدام إضافية\n")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,16 +1,47 @@
 """
 Social Media Platforms Module
 مودول منصات التواصل الاجتماعي
+
+Publisher classes are imported on first access so that using one platform
+does not pull in the dependencies of the others.
 """
 
-from .facebook_publisher import FacebookPublisher
-from .youtube_publisher import YouTubePublisher
-from .tiktok_publisher import TikTokPublisher
-from .instagram_publisher import InstagramPublisher
+import importlib
+
+from .registry import PlatformRegistry, get_registry, register_platform
+from .accounts import Account, AccountRegistry, get_account_registry
+
+_LAZY_CLASSES = {
+    'FacebookPublisher': '.facebook_publisher',
+    'YouTubePublisher': '.youtube_publisher',
+    'TikTokPublisher': '.tiktok_publisher',
+    'InstagramPublisher': '.instagram_publisher',
+    'AsyncFacebookPublisher': '.async_publishers',
+    'AsyncInstagramPublisher': '.async_publishers',
+    'AsyncTikTokPublisher': '.async_publishers',
+    'AsyncYouTubePublisher': '.async_publishers'
+}
 
 __all__ = [
     'FacebookPublisher',
     'YouTubePublisher',
     'TikTokPublisher',
-    'InstagramPublisher'
+    'InstagramPublisher',
+    'AsyncFacebookPublisher',
+    'AsyncInstagramPublisher',
+    'AsyncTikTokPublisher',
+    'AsyncYouTubePublisher',
+    'PlatformRegistry',
+    'get_registry',
+    'register_platform',
+    'Account',
+    'AccountRegistry',
+    'get_account_registry'
 ]
+
+
+def __getattr__(name):
+    if name in _LAZY_CLASSES:
+        module = importlib.import_module(_LAZY_CLASSES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
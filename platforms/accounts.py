@@ -0,0 +1,295 @@
+"""
+Account Registry Module
+مودول سجل الحسابات
+
+Loads the publishing accounts (pages, profiles, channels) from a JSON file so
+each account gets its own publisher instance and credentials
+"""
+
+import json
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+
+from config import Config
+from utils.logger import setup_logger
+
+
+# Credential fields each account entry must provide, per platform; every
+# non-reserved field is passed to the publisher constructor
+REQUIRED_FIELDS = {
+    'facebook': ('access_token', 'page_id'),
+    'instagram': ('access_token', 'account_id'),
+    'tiktok': ('access_token',),
+    'youtube': ('credentials_file',)
+}
+
+# Entry keys that describe the account rather than its credentials
+RESERVED_FIELDS = ('id', 'platform', 'tags', 'enabled')
+
+# "$NAME" or "${NAME}": read the value from the environment
+ENV_REFERENCE = re.compile(r'^\$\{?([A-Za-z_][A-Za-z0-9_]*)\}?$')
+
+
+def _resolve(value):
+    """Replace an environment reference with the variable's value"""
+    if isinstance(value, str):
+        match = ENV_REFERENCE.match(value)
+        if match:
+            name = match.group(1)
+            if name not in os.environ:
+                raise ValueError(f"Environment variable {name} is not set")
+            return os.environ[name]
+    return value
+
+
+def shard_for(account_id, shards):
+    """
+    Map an account to a shard number
+    
+    The mapping is stable across processes and restarts.
+    
+    Args:
+        account_id (str): Account ID
+        shards (int): Number of shards
+    
+    Returns:
+        int: Shard number in [0, shards)
+    """
+    return zlib.crc32(account_id.encode('utf-8')) % shards
+
+
+class Account:
+    """One publishing account / حساب نشر"""
+    
+    def __init__(self, account_id, platform, credentials=None, tags=None, enabled=True):
+        """
+        Initialize account
+        
+        Args:
+            account_id (str): Unique account name
+            platform (str): Platform name
+            credentials (dict, optional): Publisher constructor arguments
+                (e.g. access_token, page_id)
+            tags (list, optional): Labels used to select groups of accounts
+            enabled (bool): Disabled accounts are only used when named explicitly
+        """
+        self.id = account_id
+        self.platform = platform
+        self.credentials = dict(credentials or {})
+        self.tags = set(tags or [])
+        self.enabled = enabled
+    
+    @classmethod
+    def from_dict(cls, entry):
+        """
+        Build an account from an accounts file entry
+        
+        Args:
+            entry (dict): {'id', 'platform', credential fields, optional 'tags', 'enabled'}
+        
+        Returns:
+            Account: Parsed account
+        
+        Raises:
+            ValueError: If the entry is incomplete
+        """
+        if not isinstance(entry, dict):
+            raise ValueError(f"Account entry must be an object, got {type(entry).__name__}")
+        
+        account_id = str(entry.get('id') or '').strip()
+        platform = str(entry.get('platform') or '').strip().lower()
+        if not account_id or not platform:
+            raise ValueError(f"Account entry needs 'id' and 'platform': {entry.get('id')!r}")
+        
+        credentials = {
+            key: _resolve(value) for key, value in entry.items() if key not in RESERVED_FIELDS
+        }
+        missing = [field for field in REQUIRED_FIELDS.get(platform, ()) if not credentials.get(field)]
+        if missing:
+            raise ValueError(f"Account {account_id} is missing {', '.join(missing)}")
+        
+        tags = entry.get('tags') or []
+        if isinstance(tags, str):
+            tags = [tag.strip() for tag in tags.split(',') if tag.strip()]
+        return cls(account_id, platform, credentials, tags, bool(entry.get('enabled', True)))
+    
+    def __repr__(self):
+        return f"Account({self.id!r}, {self.platform!r})"
+
+
+class AccountRegistry:
+    """Registry of publishing accounts / سجل حسابات النشر"""
+    
+    def __init__(self, path=None):
+        """
+        Initialize registry and load the accounts file
+        
+        Args:
+            path (str, optional): Accounts JSON file (defaults to Config.ACCOUNTS_FILE);
+                a missing file gives an empty registry
+        """
+        self.logger = setup_logger(__name__)
+        self.path = path or Config.ACCOUNTS_FILE
+        self._accounts = {}
+        self._lock = threading.Lock()
+        self.reload()
+    
+    def reload(self):
+        """
+        Re-read the accounts file
+        إعادة تحميل ملف الحسابات
+        
+        The file holds a list of account entries, or an object with an
+        'accounts' list. Credential values written as "$NAME" are read from
+        the environment so tokens can stay out of the file.
+        
+        Returns:
+            int: Number of accounts loaded
+        
+        Raises:
+            ValueError: If the file is malformed or has duplicate IDs
+        """
+        accounts = {}
+        path = Path(self.path)
+        
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            entries = data.get('accounts', []) if isinstance(data, dict) else data
+            for entry in entries:
+                account = Account.from_dict(entry)
+                if account.id in accounts:
+                    raise ValueError(f"Duplicate account ID in {path}: {account.id}")
+                accounts[account.id] = account
+            self.logger.info(f"Loaded {len(accounts)} accounts from {path}")
+        
+        with self._lock:
+            self._accounts = accounts
+        return len(accounts)
+    
+    def add(self, account):
+        """
+        Register an account in memory
+        
+        Args:
+            account (Account): Account to add (replaces one with the same ID)
+        """
+        with self._lock:
+            self._accounts[account.id] = account
+    
+    def get(self, account_id):
+        """
+        Get an account by ID
+        
+        Args:
+            account_id (str): Account ID
+        
+        Returns:
+            Account: Account, or None if unknown
+        """
+        return self._accounts.get(account_id)
+    
+    def ids(self, platform=None):
+        """
+        Get the IDs of the enabled accounts
+        
+        Args:
+            platform (str, optional): Only accounts on this platform
+        
+        Returns:
+            list: Account IDs in file order
+        """
+        return [account.id for account in self if account.enabled
+                and (platform is None or account.platform == platform)]
+    
+    def select(self, targets=None):
+        """
+        Resolve a list of targets to accounts
+        اختيار الحسابات المستهدفة
+        
+        Args:
+            targets (list or str, optional): Account IDs, 'tag:<tag>',
+                'platform:<name>' or '*' (defaults to every enabled account)
+        
+        Returns:
+            list: Matching Account objects, without duplicates
+        
+        Raises:
+            KeyError: If an account ID is unknown
+        """
+        if targets is None:
+            targets = ['*']
+        elif isinstance(targets, str):
+            targets = [targets]
+        
+        accounts = list(self)
+        selected = {}
+        for target in targets:
+            kind, _, value = target.partition(':')
+            if target == '*':
+                matches = [a for a in accounts if a.enabled]
+            elif kind == 'tag' and value:
+                matches = [a for a in accounts if a.enabled and value in a.tags]
+            elif kind == 'platform' and value:
+                matches = [a for a in accounts if a.enabled and a.platform == value.lower()]
+            else:
+                account = self.get(target)
+                if account is None:
+                    raise KeyError(f"Unknown account: {target}")
+                matches = [account]
+            for account in matches:
+                selected.setdefault(account.id, account)
+        return list(selected.values())
+    
+    def shards(self, shards=0, platform=None):
+        """
+        Split the enabled accounts into shards
+        
+        Args:
+            shards (int): Number of shards (0 = one shard per account)
+            platform (str, optional): Only accounts on this platform
+        
+        Returns:
+            list: Lists of account IDs, empty shards left out
+        """
+        ids = self.ids(platform)
+        if not shards:
+            return [[account_id] for account_id in ids]
+        
+        groups = [[] for _ in range(shards)]
+        for account_id in ids:
+            groups[shard_for(account_id, shards)].append(account_id)
+        return [group for group in groups if group]
+    
+    def __contains__(self, account_id):
+        return account_id in self._accounts
+    
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._accounts.values()))
+    
+    def __len__(self):
+        return len(self._accounts)
+
+
+_accounts = None
+_accounts_lock = threading.Lock()
+
+
+def get_account_registry():
+    """
+    Get the process-wide account registry
+    
+    Returns:
+        AccountRegistry: Registry loaded from Config.ACCOUNTS_FILE
+    """
+    global _accounts
+    
+    if _accounts is None:
+        with _accounts_lock:
+            if _accounts is None:
+                _accounts = AccountRegistry()
+    return _accounts
@@ -0,0 +1,692 @@
+"""
+Async Publishers Module
+مودول الناشرين غير المتزامنين
+
+asyncio variants of the platform publishers. Each wraps a regular publisher
+(sharing its credentials, quota keys and upload state) and sends its
+requests through the non-blocking AsyncHttpTransport, so one event loop can
+keep thousands of posts in flight without a thread per post. Results use
+the same dicts as the blocking publishers.
+"""
+
+import asyncio
+import mimetypes
+import os
+
+import aiohttp
+import requests
+from config import Config
+from utils.logger import setup_logger
+from utils.async_http import get_async_transport, read_chunk
+from utils.metrics import track_publish
+from utils.validator import validate_video_file
+from utils.video_probe import PLATFORM_VIDEO_LIMITS
+from utils.chunked_upload import (
+    UploadStateStore, UploadProgress, open_media, merge_ranges, unacked_chunks
+)
+
+
+async def _validate_video(video_path, platform):
+    """Validate a video on a worker thread (probing reads the container headers)"""
+    return await asyncio.to_thread(
+        validate_video_file, video_path,
+        max_size_mb=PLATFORM_VIDEO_LIMITS[platform]['max_size_mb'], platform=platform
+    )
+
+
+async def _access_token(publisher):
+    """
+    Get a publisher's access token without blocking the event loop
+    
+    A cached token is returned directly; one due for a refresh is renewed on
+    a worker thread, since refreshing makes an HTTP call under a file lock.
+    """
+    token = publisher.credentials.cached(publisher.credential_key)
+    if token is None:
+        token = await asyncio.to_thread(publisher.credentials.token, publisher.credential_key)
+    return token
+
+
+def _file_field(form, name, file_path, content_type=None):
+    """Attach a file to a multipart form; aiohttp streams it from a worker thread"""
+    form.add_field(
+        name, open(file_path, 'rb'),
+        filename=os.path.basename(file_path),
+        content_type=content_type or mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+    )
+    return form
+
+
+class AsyncFacebookPublisher:
+    """Async Facebook content publisher / ناشر فيسبوك غير متزامن"""
+    
+    def __init__(self, publisher=None, transport=None, **kwargs):
+        """
+        Initialize async Facebook publisher
+        
+        Args:
+            publisher (FacebookPublisher, optional): Publisher whose page,
+                credentials and upload state are used (built from kwargs
+                when not given)
+            transport (AsyncHttpTransport, optional): Async transport
+                (defaults to the process-wide async transport)
+            **kwargs: FacebookPublisher arguments
+        """
+        if publisher is None:
+            from platforms.facebook_publisher import FacebookPublisher
+            publisher = FacebookPublisher(**kwargs)
+        self.publisher = publisher
+        self.transport = transport or get_async_transport()
+        self.logger = setup_logger(__name__)
+    
+    @property
+    def page_id(self):
+        return self.publisher.page_id
+    
+    @property
+    def graph_url(self):
+        return self.publisher.graph_url
+    
+    @property
+    def rate_key(self):
+        return self.publisher.rate_key
+    
+    @track_publish('facebook')
+    async def post_text(self, message):
+        """
+        Post text message to Facebook page
+        نشر رسالة نصية على صفحة فيسبوك
+        
+        Args:
+            message (str): Text message to post
+        
+        Returns:
+            dict: Response from Facebook API
+        """
+        self.logger.info(f"Posting text to Facebook: {message[:50]}...")
+        
+        payload = {'message': message, 'access_token': await _access_token(self.publisher)}
+        return await self._post(f"{self.graph_url}/{self.page_id}/feed", payload, 'post')
+    
+    @track_publish('facebook')
+    async def post_image(self, message, image_url=None, image_path=None):
+        """
+        Post image with caption to Facebook page
+        نشر صورة مع نص على صفحة فيسبوك
+        
+        Args:
+            message (str): Image caption
+            image_url (str, optional): URL of image to post
+            image_path (str, optional): Local image file to upload instead
+        
+        Returns:
+            dict: Response from Facebook API
+        """
+        self.logger.info(f"Posting image to Facebook: {image_path or image_url}")
+        
+        payload = {'message': message, 'access_token': await _access_token(self.publisher)}
+        if image_path:
+            data = lambda: _file_field(aiohttp.FormData(payload), 'source', image_path)
+        else:
+            data = dict(payload, url=image_url)
+        
+        try:
+            return await self._post(f"{self.graph_url}/{self.page_id}/photos", data, 'image')
+        except FileNotFoundError:
+            self.logger.error(f"✗ Image file not found: {image_path}")
+            return {'success': False, 'error': 'File not found', 'platform': 'Facebook'}
+    
+    async def _post(self, url, data, kind):
+        """Send a single-request post and turn the response into a result dict"""
+        try:
+            response = await self.transport.post(url, data=data, limit=self.rate_key)
+            response.raise_for_status()
+            result = response.json()
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"✗ Facebook API request failed: {e}")
+            return {'success': False, 'error': str(e), 'platform': 'Facebook'}
+        
+        if 'id' in result:
+            post_id = result.get('post_id', result['id'])
+            self.logger.info(f"✓ Facebook {kind} created successfully: {post_id}")
+            return {'success': True, 'post_id': post_id, 'platform': 'Facebook'}
+        self.logger.error(f"✗ Facebook {kind} failed: {result}")
+        return {'success': False, 'error': result, 'platform': 'Facebook'}
+    
+    @track_publish('facebook')
+    async def post_video(self, video_path, description=""):
+        """
+        Post video to Facebook page
+        نشر فيديو على صفحة فيسبوك
+        
+        Args:
+            video_path (str): Path to video file
+            description (str): Video description
+        
+        Returns:
+            dict: Response from Facebook API
+        """
+        self.logger.info(f"Posting video to Facebook: {video_path}")
+        
+        url = f"{self.graph_url}/{self.page_id}/videos"
+        
+        # Same content already uploaded to this page: share it instead of re-uploading
+        video_id = await asyncio.to_thread(self.publisher._cached_video_id, video_path)
+        if video_id:
+            return await self._repost_video(video_id, description)
+        
+        validation = await _validate_video(video_path, 'facebook')
+        if not validation['valid']:
+            self.logger.error(f"✗ Video rejected before upload: {validation['error']}")
+            return {'success': False, 'error': validation['error'], 'platform': 'Facebook'}
+        
+        # Large files go through the resumable upload session
+        try:
+            chunked = os.path.getsize(video_path) >= Config.FACEBOOK_CHUNKED_UPLOAD_MB * 1024 * 1024
+        except OSError:
+            chunked = False
+        if chunked:
+            result = await self._post_video_chunked(url, video_path, description)
+        else:
+            payload = {'description': description, 'access_token': await _access_token(self.publisher)}
+            try:
+                response = await self.transport.post(
+                    url, data=lambda: _file_field(aiohttp.FormData(payload), 'source', video_path),
+                    limit=self.rate_key
+                )
+                response.raise_for_status()
+                data = response.json()
+            except FileNotFoundError:
+                self.logger.error(f"✗ Video file not found: {video_path}")
+                return {'success': False, 'error': 'File not found', 'platform': 'Facebook'}
+            except requests.exceptions.RequestException as e:
+                self.logger.error(f"✗ Facebook API request failed: {e}")
+                return {'success': False, 'error': str(e), 'platform': 'Facebook'}
+            
+            if 'id' not in data:
+                self.logger.error(f"✗ Facebook video upload failed: {data}")
+                return {'success': False, 'error': data, 'platform': 'Facebook'}
+            self.logger.info(f"✓ Facebook video uploaded successfully: {data['id']}")
+            result = {'success': True, 'video_id': data['id'], 'platform': 'Facebook'}
+        
+        return await asyncio.to_thread(self.publisher._remember_video, video_path, result)
+    
+    async def _repost_video(self, video_id, description):
+        """Share an already uploaded video in a new page post"""
+        self.logger.info(f"Reusing uploaded Facebook video {video_id} instead of uploading again")
+        
+        payload = {
+            'message': description,
+            'link': f"https://www.facebook.com/{self.page_id}/videos/{video_id}/",
+            'access_token': await _access_token(self.publisher)
+        }
+        result = await self._post(f"{self.graph_url}/{self.page_id}/feed", payload, 'video repost')
+        if result['success']:
+            result.update(video_id=video_id, reused=True)
+        return result
+    
+    async def _post_video_chunked(self, url, video_path, description):
+        """
+        Upload a video through the Graph API start/transfer/finish session
+        
+        Chunks follow the offsets Graph returns after each transfer and are
+        copied off the mapped file on a worker thread; progress is saved in
+        the same upload state as FacebookPublisher, so either one can resume
+        the other's session.
+        
+        Args:
+            url (str): Page videos endpoint
+            video_path (str): Path to video file
+            description (str): Video description
+        
+        Returns:
+            dict: Response from Facebook API
+        """
+        publisher = self.publisher
+        upload_state = publisher.upload_state
+        state_key = None
+        resumed = False
+        
+        try:
+            state_key = UploadStateStore.key_for('facebook', video_path, self.page_id)
+            state = await asyncio.to_thread(upload_state.load, state_key)
+            
+            with open_media(video_path) as source:
+                if state:
+                    resumed = True
+                    publisher._log_resumed(state, source.size)
+                else:
+                    fields = publisher._upload_fields('start', await _access_token(publisher), file_size=source.size)
+                    response = await self.transport.post(url, data=fields, limit=self.rate_key)
+                    response.raise_for_status()
+                    state = publisher._upload_session_state(response.json(), source.size)
+                    await asyncio.to_thread(upload_state.save, state_key, state)
+                
+                # Graph hands back the next offsets to send after every chunk
+                start, end = state['next']
+                while start < end:
+                    chunk = await read_chunk(source, start, end)
+                    fields = publisher._upload_fields('transfer', await _access_token(publisher), state, start_offset=start)
+                    
+                    def form(fields=fields, chunk=chunk):
+                        form = aiohttp.FormData(fields)
+                        form.add_field('video_file_chunk', chunk, filename='chunk')
+                        return form
+                    
+                    response = await self.transport.post(url, data=form, limit=self.rate_key, idempotent=True)
+                    response.raise_for_status()
+                    start, end = publisher._advance_upload(state, start, end, response.json())
+                    await asyncio.to_thread(upload_state.save, state_key, state)
+            
+            fields = publisher._upload_fields('finish', await _access_token(publisher), state, description=description)
+            response = await self.transport.post(url, data=fields, limit=self.rate_key)
+            response.raise_for_status()
+            return await asyncio.to_thread(publisher._finish_upload, state_key, state, response.json())
+        
+        except FileNotFoundError:
+            self.logger.error(f"✗ Video file not found: {video_path}")
+            return {'success': False, 'error': 'File not found', 'platform': 'Facebook'}
+        except requests.exceptions.RequestException as e:
+            return await asyncio.to_thread(publisher._upload_failed, e, state_key, resumed)
+
+
+class AsyncInstagramPublisher:
+    """Async Instagram content publisher / ناشر إنستجرام غير متزامن"""
+    
+    def __init__(self, publisher=None, transport=None, **kwargs):
+        """
+        Initialize async Instagram publisher
+        
+        Args:
+            publisher (InstagramPublisher, optional): Publisher whose account,
+                credentials and container poller are used (built from kwargs
+                when not given)
+            transport (AsyncHttpTransport, optional): Async transport
+                (defaults to the process-wide async transport)
+            **kwargs: InstagramPublisher arguments
+        """
+        if publisher is None:
+            from platforms.instagram_publisher import InstagramPublisher
+            publisher = InstagramPublisher(**kwargs)
+        self.publisher = publisher
+        self.transport = transport or get_async_transport()
+        self.logger = setup_logger(__name__)
+    
+    @track_publish('instagram')
+    async def post_image(self, image_url, caption=""):
+        """
+        Post image to Instagram
+        نشر صورة على إنستجرام
+        
+        Args:
+            image_url (str): Public URL of the image
+            caption (str): Post caption
+        
+        Returns:
+            dict: Result with success status and media ID
+        """
+        self.logger.info(f"Posting image to Instagram: {image_url}")
+        
+        container = await self._create_container({'image_url': image_url, 'caption': caption})
+        if not container.get('success'):
+            return container
+        return await self.publish_container(container['container_id'])
+    
+    @track_publish('instagram')
+    async def post_video(self, video_url, caption="", media_type="REELS"):
+        """
+        Post video (reel) to Instagram and wait until it is published
+        نشر فيديو على إنستجرام
+        
+        Processing is tracked by the shared container poller; this coroutine
+        only awaits its result.
+        
+        Args:
+            video_url (str): Public URL of the video
+            caption (str): Post caption
+            media_type (str): REELS or VIDEO
+        
+        Returns:
+            dict: Result with success status and media ID
+        """
+        self.logger.info(f"Posting video to Instagram: {video_url}")
+        
+        container = await self._create_container({
+            'media_type': media_type,
+            'video_url': video_url,
+            'caption': caption
+        })
+        if not container.get('success'):
+            return container
+        
+        future = self.publisher.poller.submit(
+            container['container_id'], await _access_token(self.publisher),
+            lambda container_id, status: self.publisher.publish_container(container_id),
+            rate_key=self.publisher.rate_key
+        )
+        return await asyncio.wrap_future(future)
+    
+    async def publish_container(self, container_id):
+        """
+        Publish a finished media container
+        
+        Args:
+            container_id (str): Container (creation) ID
+        
+        Returns:
+            dict: Result with success status and media ID
+        """
+        try:
+            data = await self._graph_post('media_publish', {'creation_id': container_id})
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"✗ Instagram API request failed: {e}")
+            return {'success': False, 'error': str(e), 'platform': 'Instagram'}
+        
+        if 'id' in data:
+            self.logger.info(f"✓ Instagram media published successfully: {data['id']}")
+            return {'success': True, 'media_id': data['id'], 'platform': 'Instagram'}
+        self.logger.error(f"✗ Instagram publish failed: {data}")
+        return {'success': False, 'error': data, 'platform': 'Instagram'}
+    
+    async def _create_container(self, params):
+        """
+        Create a media container
+        
+        Returns:
+            dict: {'success': True, 'container_id'} or a failed result
+        """
+        try:
+            data = await self._graph_post('media', params)
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"✗ Instagram API request failed: {e}")
+            return {'success': False, 'error': str(e), 'platform': 'Instagram'}
+        
+        if 'id' in data:
+            return {'success': True, 'container_id': data['id'], 'platform': 'Instagram'}
+        self.logger.error(f"✗ Instagram container creation failed: {data}")
+        return {'success': False, 'error': data, 'platform': 'Instagram'}
+    
+    async def _graph_post(self, edge, params):
+        """POST to an edge of the Instagram account and return the response body"""
+        url = f"{self.publisher.graph_url}/{self.publisher.account_id}/{edge}"
+        payload = dict(params, access_token=await _access_token(self.publisher))
+        response = await self.transport.post(url, data=payload, limit=self.publisher.rate_key)
+        response.raise_for_status()
+        return response.json()
+
+
+class AsyncTikTokPublisher:
+    """Async TikTok content publisher / ناشر تيك توك غير متزامن"""
+    
+    def __init__(self, publisher=None, transport=None, **kwargs):
+        """
+        Initialize async TikTok publisher
+        
+        Args:
+            publisher (TikTokPublisher, optional): Publisher whose credentials,
+                upload state and status poller are used (built from kwargs
+                when not given)
+            transport (AsyncHttpTransport, optional): Async transport
+                (defaults to the process-wide async transport)
+            **kwargs: TikTokPublisher arguments
+        """
+        if publisher is None:
+            from platforms.tiktok_publisher import TikTokPublisher
+            publisher = TikTokPublisher(**kwargs)
+        self.publisher = publisher
+        self.transport = transport or get_async_transport()
+        self.logger = setup_logger(__name__)
+    
+    @track_publish('tiktok')
+    async def post_video(self, video_path, title, privacy_level="PUBLIC_TO_EVERYONE"):
+        """
+        Post video to TikTok and wait until it is published
+        نشر فيديو على تيك توك
+        
+        Args:
+            video_path (str): Path to video file
+            title (str): Video title (caption)
+            privacy_level (str): Privacy level of the post
+        
+        Returns:
+            dict: Result with success status and publish ID
+        """
+        self.logger.info(f"Posting video to TikTok: {video_path}")
+        
+        upload = await self._upload_video(video_path, title, privacy_level)
+        if not upload.get('success'):
+            return upload
+        
+        publisher = self.publisher
+        future = publisher.poller.submit(
+            upload['publish_id'], await _access_token(publisher), publisher._published,
+            rate_key=publisher.rate_key, platform='tiktok', fetch=publisher.fetch_status
+        )
+        return await asyncio.wrap_future(future)
+    
+    async def _upload_video(self, video_path, title, privacy_level):
+        """
+        Send a video through a resumable FILE_UPLOAD session
+        
+        Up to Config.TIKTOK_UPLOAD_WORKERS chunks are in flight at once;
+        acknowledged ranges are saved in the same upload state as
+        TikTokPublisher.
+        
+        Returns:
+            dict: {'success': True, 'publish_id'} or a failed result
+        """
+        from platforms.tiktok_publisher import chunk_layout
+        
+        validation = await _validate_video(video_path, 'tiktok')
+        if not validation['valid']:
+            self.logger.error(f"✗ Video rejected before upload: {validation['error']}")
+            return {'success': False, 'error': validation['error'], 'platform': 'TikTok'}
+        
+        publisher = self.publisher
+        upload_state = publisher.upload_state
+        state_key = None
+        resumed = False
+        
+        try:
+            state_key = UploadStateStore.key_for('tiktok', video_path, publisher._token_id)
+            state = await asyncio.to_thread(publisher._load_upload, state_key)
+            
+            with open_media(video_path) as source:
+                chunk_size, chunks = chunk_layout(source.size, Config.TIKTOK_UPLOAD_CHUNK_MB * 1024 * 1024)
+                if state:
+                    resumed = True
+                    publisher._log_resumed(state, source.size)
+                else:
+                    state = await self._init_upload(source.size, chunk_size, len(chunks), title, privacy_level)
+                    if not state.get('success'):
+                        return state
+                    del state['success']
+                    await asyncio.to_thread(upload_state.save, state_key, state)
+                
+                content_type = mimetypes.guess_type(video_path)[0] or 'video/mp4'
+                slots = asyncio.Semaphore(max(1, Config.TIKTOK_UPLOAD_WORKERS))
+                
+                async def send_chunk(start, end):
+                    async with slots:
+                        data = await read_chunk(source, start, end)
+                        response = await self.transport.put(
+                            state['upload_url'],
+                            data=data,
+                            headers=publisher._chunk_headers(content_type, start, end, source.size),
+                            limit=publisher.rate_key
+                        )
+                        response.raise_for_status()
+                        state['acked'] = merge_ranges(state['acked'], start, end)
+                        await asyncio.to_thread(upload_state.save, state_key, state)
+                
+                sends = [asyncio.ensure_future(send_chunk(start, end))
+                         for start, end in unacked_chunks(chunks, state['acked'])]
+                try:
+                    await asyncio.gather(*sends)
+                finally:
+                    for send in sends:
+                        send.cancel()
+            
+            return await asyncio.to_thread(publisher._finish_upload, state_key, state)
+        
+        except FileNotFoundError:
+            self.logger.error(f"✗ Video file not found: {video_path}")
+            return {'success': False, 'error': 'File not found', 'platform': 'TikTok'}
+        except requests.exceptions.RequestException as e:
+            return await asyncio.to_thread(publisher._upload_failed, e, state_key, resumed)
+    
+    async def _init_upload(self, video_size, chunk_size, chunk_count, title, privacy_level):
+        """Initialize a FILE_UPLOAD post (see TikTokPublisher._init_upload)"""
+        publisher = self.publisher
+        response = await self.transport.post(
+            f"{publisher.api_url}/v2/post/publish/video/init/",
+            json=publisher._init_payload(video_size, chunk_size, chunk_count, title, privacy_level),
+            headers=publisher._api_headers(await _access_token(publisher)),
+            limit=publisher.rate_key
+        )
+        response.raise_for_status()
+        return publisher._init_state(response.json(), video_size, chunk_count)
+
+
+class AsyncYouTubePublisher:
+    """Async YouTube video publisher / ناشر يوتيوب غير متزامن"""
+    
+    def __init__(self, publisher=None, transport=None, **kwargs):
+        """
+        Initialize async YouTube publisher
+        
+        Args:
+            publisher (YouTubePublisher, optional): Publisher whose credentials
+                and upload state are used (built from kwargs when not given)
+            transport (AsyncHttpTransport, optional): Async transport
+                (defaults to the process-wide async transport)
+            **kwargs: YouTubePublisher arguments
+        """
+        if publisher is None:
+            from platforms.youtube_publisher import YouTubePublisher
+            publisher = YouTubePublisher(**kwargs)
+        self.publisher = publisher
+        self.transport = transport or get_async_transport()
+        self.logger = setup_logger(__name__)
+    
+    @track_publish('youtube')
+    async def upload_video(self, video_path, title, description="", tags=None, privacy="private", on_progress=None):
+        """
+        Upload video to YouTube with a resumable session
+        رفع فيديو على يوتيوب
+        
+        Sessions are saved in the same upload state as YouTubePublisher, so
+        an upload started by either one can be continued by the other.
+        
+        Args:
+            video_path (str): Path to video file
+            title (str): Video title
+            description (str): Video description
+            tags (list, optional): Video tags
+            privacy (str): private, unlisted or public
+            on_progress (callable, optional): Called as on_progress(confirmed, total)
+        
+        Returns:
+            dict: Result with success status and video ID
+        """
+        from platforms.youtube_publisher import SESSION_PARAMS
+        
+        self.logger.info(f"Uploading video to YouTube: {video_path}")
+        
+        validation = await _validate_video(video_path, 'youtube')
+        if not validation['valid']:
+            self.logger.error(f"✗ Video rejected before upload: {validation['error']}")
+            return {'success': False, 'error': validation['error'], 'platform': 'YouTube'}
+        
+        publisher = self.publisher
+        metadata = publisher._metadata(title, description, tags, privacy)
+        chunk_size = publisher._chunk_size()
+        content_type = mimetypes.guess_type(video_path)[0] or 'video/*'
+        
+        try:
+            state_key = publisher._state_key(video_path, metadata)
+            state = await asyncio.to_thread(publisher._load_session, state_key)
+            
+            with open_media(video_path) as source:
+                progress = UploadProgress('youtube', source.size, self.logger, on_progress, label='YouTube')
+                offset = video = None
+                
+                if state:
+                    offset, video = await self._query_offset(state['session_uri'], source.size)
+                    if offset is None and video is None:
+                        self.logger.warning("Discarding expired YouTube upload session")
+                    else:
+                        progress.resumed(source.size if video else offset)
+                if offset is None and video is None:
+                    response = await self.transport.post(
+                        publisher.upload_url,
+                        params=SESSION_PARAMS,
+                        json=metadata,
+                        headers=publisher._session_headers(source.size, content_type, await _access_token(publisher)),
+                        limit=publisher.rate_key
+                    )
+                    response.raise_for_status()
+                    state = publisher._session_state(response, source.size)
+                    await asyncio.to_thread(publisher.upload_state.save, state_key, state)
+                    offset = 0
+                
+                failures = 0
+                while video is None:
+                    end = min(offset + chunk_size, source.size)
+                    data = await read_chunk(source, offset, end)
+                    try:
+                        response = await self.transport.put(
+                            state['session_uri'],
+                            data=data,
+                            headers=publisher._chunk_headers(offset, end, source.size, await _access_token(publisher)),
+                            limit=publisher.rate_key,
+                            idempotent=False
+                        )
+                        if response.status_code != 308:
+                            response.raise_for_status()
+                    except requests.exceptions.RequestException as e:
+                        # Ask the server what it kept, then continue from there
+                        failures += 1
+                        delay = await asyncio.to_thread(publisher._chunk_failed, e, offset, failures)
+                        if delay is None:
+                            raise
+                        await asyncio.sleep(delay)
+                        offset, video = await self._query_offset(state['session_uri'], source.size)
+                        if offset is None and video is None:
+                            raise
+                        continue
+                    
+                    failures = 0
+                    if response.status_code == 308:
+                        offset = await asyncio.to_thread(publisher._confirm_chunk, state_key, state, response)
+                        progress.update(offset)
+                    else:
+                        video = response.json()
+                        progress.update(source.size)
+            
+            return await asyncio.to_thread(publisher._finish_upload, state_key, video)
+        
+        except FileNotFoundError:
+            self.logger.error(f"✗ Video file not found: {video_path}")
+            return {'success': False, 'error': 'File not found', 'platform': 'YouTube'}
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            return publisher._upload_failed(e)
+    
+    async def _query_offset(self, session_uri, file_size):
+        """Ask the server how much of an upload it has received (see YouTubePublisher._query_offset)"""
+        publisher = self.publisher
+        response = await self.transport.put(
+            session_uri,
+            headers=publisher._offset_headers(file_size, await _access_token(publisher)),
+            limit=publisher.rate_key
+        )
+        return publisher._parse_offset(response)
+
+
+# Platform name -> async publisher class / فئات الناشرين غير المتزامنين
+ASYNC_PUBLISHERS = {
+    'facebook': AsyncFacebookPublisher,
+    'instagram': AsyncInstagramPublisher,
+    'tiktok': AsyncTikTokPublisher,
+    'youtube': AsyncYouTubePublisher
+}
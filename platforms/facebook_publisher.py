@@ -5,26 +5,78 @@ Facebook Publisher Module
 Uses Facebook Graph API to post content
 """
 
+import json
+import os
+import time
+from urllib.parse import urlencode
+
 import requests
 from config import Config
 from utils.logger import setup_logger
+from utils.http_client import get_transport
+from utils.media_cache import get_media_index
+from utils.metrics import track_publish
+from utils.validator import validate_video_file
+from utils.video_probe import PLATFORM_VIDEO_LIMITS
+from utils.credentials import get_credential_manager, GraphTokenSource, StaticTokenSource
+from utils.retry import TRANSIENT_GRAPH_CODES
+from utils.rate_limiter import APP_THROTTLE_CODES, TOKEN_THROTTLE_CODES, PAGE_THROTTLE_CODES
+from utils.chunked_upload import (
+    open_media, UploadStateStore, ChunkedUploader, committed_offset, merge_ranges
+)
 
 
 class FacebookPublisher:
     """Facebook content publisher / ناشر محتوى فيسبوك"""
     
-    def __init__(self):
-        """Initialize Facebook publisher"""
+    def __init__(self, transport=None, access_token=None, page_id=None, app_id=None, app_secret=None):
+        """
+        Initialize Facebook publisher
+        
+        Args:
+            transport (HttpTransport, optional): Shared HTTP transport
+                (defaults to the process-wide transport)
+            access_token (str, optional): Page access token
+                (defaults to Config.FACEBOOK_ACCESS_TOKEN)
+            page_id (str, optional): Page to publish to
+                (defaults to Config.FACEBOOK_PAGE_ID)
+            app_id (str, optional): App ID used to renew the token before it
+                expires (defaults to Config.FACEBOOK_APP_ID)
+            app_secret (str, optional): App secret used to renew the token
+                (defaults to Config.FACEBOOK_APP_SECRET)
+        """
         self.logger = setup_logger(__name__)
-        self.access_token = Config.FACEBOOK_ACCESS_TOKEN
-        self.page_id = Config.FACEBOOK_PAGE_ID
-        self.graph_url = "https://graph.facebook.com/v18.0"
+        self.transport = transport or get_transport()
+        self.upload_state = UploadStateStore()
+        self.media_index = get_media_index()
+        access_token = access_token or Config.FACEBOOK_ACCESS_TOKEN
+        self.page_id = page_id or Config.FACEBOOK_PAGE_ID
+        self.graph_url = Config.FACEBOOK_GRAPH_URL.rstrip('/')
         
-        if not self.access_token or not self.page_id:
+        if not access_token or not self.page_id:
             raise ValueError("Facebook credentials are missing in configuration")
         
+        # Tokens come from the shared credential cache, renewed in the background
+        app_id = app_id or Config.FACEBOOK_APP_ID
+        app_secret = app_secret or Config.FACEBOOK_APP_SECRET
+        if app_id and app_secret:
+            source = GraphTokenSource('facebook', access_token, self.graph_url, app_id, app_secret)
+        else:
+            source = StaticTokenSource('facebook', access_token)
+        self.credentials = get_credential_manager()
+        self.credential_key = self.credentials.register(source)
+        
+        # Quota key for the shared rate limiter
+        self.rate_key = ('facebook', access_token, self.page_id)
+        
         self.logger.info("Facebook Publisher initialized successfully")
     
+    @property
+    def access_token(self):
+        """Current page access token"""
+        return self.credentials.token(self.credential_key)
+    
+    @track_publish('facebook')
     def post_text(self, message):
         """
         Post text message to Facebook page
@@ -45,7 +97,7 @@ class FacebookPublisher:
         }
         
         try:
-            response = requests.post(url, data=payload)
+            response = self.transport.post(url, data=payload, limit=self.rate_key)
             response.raise_for_status()
             data = response.json()
             
@@ -60,29 +112,37 @@ class FacebookPublisher:
             self.logger.error(f"✗ Facebook API request failed: {e}")
             return {'success': False, 'error': str(e), 'platform': 'Facebook'}
     
-    def post_image(self, message, image_url):
+    @track_publish('facebook')
+    def post_image(self, message, image_url=None, image_path=None):
         """
         Post image with caption to Facebook page
         نشر صورة مع نص على صفحة فيسبوك
         
         Args:
             message (str): Image caption
-            image_url (str): URL of image to post
+            image_url (str, optional): URL of image to post
+            image_path (str, optional): Local image file to upload instead
         
         Returns:
             dict: Response from Facebook API
         """
-        self.logger.info(f"Posting image to Facebook: {image_url}")
+        self.logger.info(f"Posting image to Facebook: {image_path or image_url}")
         
         url = f"{self.graph_url}/{self.page_id}/photos"
         payload = {
             'message': message,
-            'url': image_url,
             'access_token': self.access_token
         }
         
         try:
-            response = requests.post(url, data=payload)
+            if image_path:
+                with open(image_path, 'rb') as image_file:
+                    response = self.transport.post(
+                        url, data=payload, files={'source': image_file}, limit=self.rate_key
+                    )
+            else:
+                payload['url'] = image_url
+                response = self.transport.post(url, data=payload, limit=self.rate_key)
             response.raise_for_status()
             data = response.json()
             
@@ -94,10 +154,151 @@ class FacebookPublisher:
                 self.logger.error(f"✗ Facebook image post failed: {data}")
                 return {'success': False, 'error': data, 'platform': 'Facebook'}
         
+        except FileNotFoundError:
+            self.logger.error(f"✗ Image file not found: {image_path}")
+            return {'success': False, 'error': 'File not found', 'platform': 'Facebook'}
         except requests.exceptions.RequestException as e:
             self.logger.error(f"✗ Facebook API request failed: {e}")
             return {'success': False, 'error': str(e), 'platform': 'Facebook'}
     
+    @track_publish('facebook')
+    def post_text_batch(self, messages):
+        """
+        Post many text messages using the Graph batch API
+        نشر عدة رسائل نصية دفعة واحدة
+        
+        Args:
+            messages (list): Text messages to post
+        
+        Returns:
+            list: One result dict per message, in the same order
+        """
+        self.logger.info(f"Posting {len(messages)} texts to Facebook in batches...")
+        operations = [self._batch_operation('feed', {'message': message}) for message in messages]
+        return self._run_batch(operations)
+    
+    @track_publish('facebook')
+    def post_image_batch(self, posts):
+        """
+        Post many images using the Graph batch API
+        نشر عدة صور دفعة واحدة
+        
+        Args:
+            posts (list): (message, image_url) tuples
+        
+        Returns:
+            list: One result dict per image, in the same order
+        """
+        self.logger.info(f"Posting {len(posts)} images to Facebook in batches...")
+        operations = [
+            self._batch_operation('photos', {'message': message, 'url': image_url})
+            for message, image_url in posts
+        ]
+        return self._run_batch(operations)
+    
+    def _batch_operation(self, edge, params):
+        """Build one batch sub-request against a page edge"""
+        return {
+            'method': 'POST',
+            'relative_url': f"{self.page_id}/{edge}",
+            'body': urlencode(params)
+        }
+    
+    def _run_batch(self, operations):
+        """
+        Send operations in batches of Config.FACEBOOK_BATCH_SIZE and retry
+        only the sub-requests that failed with a retryable error
+        
+        Args:
+            operations (list): Batch sub-requests
+        
+        Returns:
+            list: Result dicts in operation order
+        """
+        results = [None] * len(operations)
+        pending = list(range(len(operations)))
+        policy = self.transport.retry_policy
+        attempt = 0
+        
+        while pending:
+            attempt += 1
+            retry = []
+            
+            for i in range(0, len(pending), Config.FACEBOOK_BATCH_SIZE):
+                group = pending[i:i + Config.FACEBOOK_BATCH_SIZE]
+                try:
+                    responses = self._send_batch([operations[j] for j in group])
+                except requests.exceptions.RequestException as e:
+                    self.logger.error(f"✗ Facebook batch request failed: {e}")
+                    for j in group:
+                        results[j] = {'success': False, 'error': str(e), 'platform': 'Facebook'}
+                    continue
+                
+                for j, item in zip(group, responses):
+                    results[j], retryable = self._parse_batch_item(item)
+                    if retryable:
+                        retry.append(j)
+            
+            if not retry or attempt >= policy.max_attempts:
+                break
+            
+            delay = policy.delay(attempt)
+            self.logger.warning(
+                f"⚠️  Retrying {len(retry)} failed Facebook batch items in {delay:.1f}s "
+                f"(attempt {attempt + 1}/{policy.max_attempts})"
+            )
+            time.sleep(delay)
+            pending = retry
+        
+        succeeded = sum(1 for result in results if result and result['success'])
+        self.logger.info(f"✓ Facebook batch finished: {succeeded}/{len(results)} posted")
+        return results
+    
+    def _send_batch(self, operations):
+        """
+        Send one Graph batch request
+        
+        Returns:
+            list: Per-operation responses (None for sub-requests Graph did not run)
+        """
+        payload = {
+            'batch': json.dumps(operations),
+            'include_headers': 'false',
+            'access_token': self.access_token
+        }
+        response = self.transport.post(f"{self.graph_url}/", data=payload, limit=self.rate_key)
+        response.raise_for_status()
+        return response.json()
+    
+    def _parse_batch_item(self, item):
+        """
+        Turn one batch sub-response into a result dict
+        
+        Returns:
+            tuple: (result dict, whether the sub-request should be retried)
+        """
+        if item is None:
+            return {'success': False, 'error': 'Batch operation was not processed', 'platform': 'Facebook'}, True
+        
+        try:
+            body = json.loads(item.get('body') or '{}')
+        except ValueError:
+            body = {'error': item.get('body')}
+        
+        if item.get('code') == 200 and 'id' in body:
+            return {'success': True, 'post_id': body.get('post_id', body['id']), 'platform': 'Facebook'}, False
+        
+        error = body.get('error', body) if isinstance(body, dict) else body
+        code = error.get('code') if isinstance(error, dict) else None
+        retryable = (
+            item.get('code') in (429, 503)
+            or (isinstance(error, dict) and bool(error.get('is_transient')))
+            or code in TRANSIENT_GRAPH_CODES
+            or code in APP_THROTTLE_CODES | TOKEN_THROTTLE_CODES | PAGE_THROTTLE_CODES
+        )
+        return {'success': False, 'error': error, 'platform': 'Facebook'}, retryable
+    
+    @track_publish('facebook')
     def post_video(self, video_path, description=""):
         """
         Post video to Facebook page
@@ -114,6 +315,26 @@ class FacebookPublisher:
         
         url = f"{self.graph_url}/{self.page_id}/videos"
         
+        # Same content already uploaded to this page: share it instead of re-uploading
+        video_id = self._cached_video_id(video_path)
+        if video_id:
+            return self._repost_video(video_id, description)
+        
+        # Reject unreadable or out-of-limit files before uploading anything
+        validation = validate_video_file(
+            video_path, max_size_mb=PLATFORM_VIDEO_LIMITS['facebook']['max_size_mb'], platform='facebook'
+        )
+        if not validation['valid']:
+            self.logger.error(f"✗ Video rejected before upload: {validation['error']}")
+            return {'success': False, 'error': validation['error'], 'platform': 'Facebook'}
+        
+        # Large files go through the resumable upload session
+        try:
+            if os.path.getsize(video_path) >= Config.FACEBOOK_CHUNKED_UPLOAD_MB * 1024 * 1024:
+                return self._remember_video(video_path, self._post_video_chunked(url, video_path, description))
+        except OSError:
+            pass
+        
         try:
             with open(video_path, 'rb') as video_file:
                 files = {'source': video_file}
@@ -122,13 +343,15 @@ class FacebookPublisher:
                     'access_token': self.access_token
                 }
                 
-                response = requests.post(url, files=files, data=data)
+                response = self.transport.post(url, files=files, data=data, limit=self.rate_key)
                 response.raise_for_status()
                 result = response.json()
                 
                 if 'id' in result:
                     self.logger.info(f"✓ Facebook video uploaded successfully: {result['id']}")
-                    return {'success': True, 'video_id': result['id'], 'platform': 'Facebook'}
+                    return self._remember_video(
+                        video_path, {'success': True, 'video_id': result['id'], 'platform': 'Facebook'}
+                    )
                 else:
                     self.logger.error(f"✗ Facebook video upload failed: {result}")
                     return {'success': False, 'error': result, 'platform': 'Facebook'}
@@ -139,3 +362,214 @@ class FacebookPublisher:
         except requests.exceptions.RequestException as e:
             self.logger.error(f"✗ Facebook API request failed: {e}")
             return {'success': False, 'error': str(e), 'platform': 'Facebook'}
+    
+    def _cached_video_id(self, video_path):
+        """Look up a video with the same content already uploaded to this page"""
+        if not self.media_index:
+            return None
+        try:
+            return self.media_index.get_asset(video_path, 'facebook', self.page_id)
+        except OSError:
+            return None
+    
+    def _remember_video(self, video_path, result):
+        """Record a successful upload in the media index and pass the result through"""
+        if self.media_index and result.get('success'):
+            try:
+                self.media_index.record_asset(video_path, 'facebook', result['video_id'], self.page_id)
+            except OSError as e:
+                self.logger.warning(f"Could not record uploaded video in media index: {e}")
+        return result
+    
+    def _repost_video(self, video_id, description):
+        """
+        Share an already uploaded video in a new page post
+        إعادة نشر فيديو مرفوع مسبقاً
+        
+        Args:
+            video_id (str): Existing Facebook video ID
+            description (str): Post message
+        
+        Returns:
+            dict: Response from Facebook API
+        """
+        self.logger.info(f"Reusing uploaded Facebook video {video_id} instead of uploading again")
+        
+        url = f"{self.graph_url}/{self.page_id}/feed"
+        payload = {
+            'message': description,
+            'link': f"https://www.facebook.com/{self.page_id}/videos/{video_id}/",
+            'access_token': self.access_token
+        }
+        
+        try:
+            response = self.transport.post(url, data=payload, limit=self.rate_key)
+            response.raise_for_status()
+            data = response.json()
+            
+            if 'id' in data:
+                self.logger.info(f"✓ Facebook video reposted successfully: {data['id']}")
+                return {
+                    'success': True,
+                    'post_id': data['id'],
+                    'video_id': video_id,
+                    'reused': True,
+                    'platform': 'Facebook'
+                }
+            else:
+                self.logger.error(f"✗ Facebook video repost failed: {data}")
+                return {'success': False, 'error': data, 'platform': 'Facebook'}
+        
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"✗ Facebook API request failed: {e}")
+            return {'success': False, 'error': str(e), 'platform': 'Facebook'}
+    
+    def _post_video_chunked(self, url, video_path, description):
+        """
+        Upload a video through the Graph API start/transfer/finish session
+        رفع فيديو مجزأ عبر جلسة رفع قابلة للاستئناف
+        
+        Chunks are read from a memory-mapped file, and the session ID and
+        acknowledged offsets are saved after every chunk, so a restarted
+        process continues where the last one stopped.
+        
+        Args:
+            url (str): Page videos endpoint
+            video_path (str): Path to video file
+            description (str): Video description
+        
+        Returns:
+            dict: Response from Facebook API
+        """
+        state_key = None
+        resumed = False
+        
+        try:
+            state_key = UploadStateStore.key_for('facebook', video_path, self.page_id)
+            state = self.upload_state.load(state_key)
+            
+            with open_media(video_path) as source:
+                if state:
+                    resumed = True
+                    self._log_resumed(state, source.size)
+                else:
+                    state = self._start_upload_session(url, source.size)
+                    self.upload_state.save(state_key, state)
+                
+                def send_chunk(start, end, data):
+                    response = self.transport.post(
+                        url,
+                        data=self._upload_fields('transfer', self.access_token, state, start_offset=start),
+                        files={'video_file_chunk': ('chunk', data)},
+                        limit=self.rate_key,
+                        idempotent=True
+                    )
+                    response.raise_for_status()
+                    return response.json()
+                
+                if Config.FACEBOOK_UPLOAD_WORKERS > 1:
+                    def save_progress(acked):
+                        state['acked'] = acked
+                        self.upload_state.save(state_key, state)
+                    
+                    uploader = ChunkedUploader(
+                        source,
+                        Config.FACEBOOK_UPLOAD_CHUNK_MB * 1024 * 1024,
+                        max_workers=Config.FACEBOOK_UPLOAD_WORKERS,
+                        on_progress=save_progress
+                    )
+                    uploader.upload(send_chunk, acked=state['acked'])
+                else:
+                    # Graph hands back the next offsets to send after every chunk
+                    start, end = state['next']
+                    while start < end:
+                        data = source.read(start, end - start)
+                        try:
+                            result = send_chunk(start, end, data)
+                        finally:
+                            data.release()
+                        start, end = self._advance_upload(state, start, end, result)
+                        self.upload_state.save(state_key, state)
+            
+            response = self.transport.post(
+                url,
+                data=self._upload_fields('finish', self.access_token, state, description=description),
+                limit=self.rate_key
+            )
+            response.raise_for_status()
+            return self._finish_upload(state_key, state, response.json())
+        
+        except FileNotFoundError:
+            self.logger.error(f"✗ Video file not found: {video_path}")
+            return {'success': False, 'error': 'File not found', 'platform': 'Facebook'}
+        except requests.exceptions.RequestException as e:
+            return self._upload_failed(e, state_key, resumed)
+    
+    def _start_upload_session(self, url, file_size):
+        """
+        Open a resumable upload session
+        
+        Args:
+            url (str): Page videos endpoint
+            file_size (int): Video size in bytes
+        
+        Returns:
+            dict: Initial upload state
+        """
+        response = self.transport.post(
+            url, data=self._upload_fields('start', self.access_token, file_size=file_size), limit=self.rate_key
+        )
+        response.raise_for_status()
+        return self._upload_session_state(response.json(), file_size)
+    
+    @staticmethod
+    def _upload_fields(phase, access_token, state=None, **fields):
+        """Form fields of a start, transfer or finish request (also sent by AsyncFacebookPublisher)"""
+        fields.update(upload_phase=phase, access_token=access_token)
+        if state:
+            fields['upload_session_id'] = state['upload_session_id']
+        return {name: str(value) for name, value in fields.items()}
+    
+    def _upload_session_state(self, result, file_size):
+        """Build the initial upload state from a start response"""
+        self.logger.info(f"Facebook upload session started: {result['upload_session_id']}")
+        return {
+            'upload_session_id': result['upload_session_id'],
+            'video_id': result['video_id'],
+            'file_size': file_size,
+            'acked': [],
+            'next': [int(result['start_offset']), int(result['end_offset'])]
+        }
+    
+    def _log_resumed(self, state, file_size):
+        """Log the position a saved upload session continues from"""
+        self.logger.info(
+            f"Resuming Facebook upload session {state['upload_session_id']} "
+            f"at {committed_offset(state['acked'])}/{file_size} bytes"
+        )
+    
+    @staticmethod
+    def _advance_upload(state, start, end, result):
+        """Record a transferred chunk; returns the (start, end) offsets Graph wants next"""
+        state['acked'] = merge_ranges(state['acked'], start, end)
+        state['next'] = [int(result['start_offset']), int(result['end_offset'])]
+        return tuple(state['next'])
+    
+    def _finish_upload(self, state_key, state, result):
+        """Turn a finish response into a result dict, dropping the saved session on success"""
+        if result.get('success'):
+            self.upload_state.delete(state_key)
+            self.logger.info(f"✓ Facebook video uploaded successfully: {state['video_id']}")
+            return {'success': True, 'video_id': state['video_id'], 'platform': 'Facebook'}
+        self.logger.error(f"✗ Facebook video upload failed: {result}")
+        return {'success': False, 'error': result, 'platform': 'Facebook'}
+    
+    def _upload_failed(self, error, state_key, resumed):
+        """Result for a failed upload request"""
+        # A rejected resumed session has most likely expired; start fresh next time
+        response = getattr(error, 'response', None)
+        if resumed and response is not None and 400 <= response.status_code < 500:
+            self.logger.warning("Discarding stale Facebook upload session")
+            self.upload_state.delete(state_key)
+        self.logger.error(f"✗ Facebook API request failed: {error}")
+        return {'success': False, 'error': str(error), 'platform': 'Facebook'}
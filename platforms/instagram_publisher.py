@@ -0,0 +1,220 @@
+"""
+Instagram Publisher Module
+مودول نشر المحتوى على إنستجرام
+
+Uses the Instagram Graph API content publishing flow: create a media
+container, wait for it to finish processing, then publish it
+"""
+
+from concurrent.futures import Future
+
+import requests
+from config import Config
+from utils.logger import setup_logger
+from utils.http_client import get_transport
+from utils.metrics import track_publish
+from utils.container_poller import get_container_poller
+from utils.credentials import get_credential_manager, GraphTokenSource, StaticTokenSource
+
+
+class InstagramPublisher:
+    """Instagram content publisher / ناشر محتوى إنستجرام"""
+    
+    def __init__(self, transport=None, access_token=None, account_id=None, poller=None,
+                 app_id=None, app_secret=None):
+        """
+        Initialize Instagram publisher
+        
+        Args:
+            transport (HttpTransport, optional): Shared HTTP transport
+                (defaults to the process-wide transport)
+            access_token (str, optional): Access token
+                (defaults to Config.INSTAGRAM_ACCESS_TOKEN)
+            account_id (str, optional): Instagram business account ID
+                (defaults to Config.INSTAGRAM_ACCOUNT_ID)
+            poller (ContainerPoller, optional): Container status poller
+                (defaults to the process-wide poller)
+            app_id (str, optional): App ID used to renew the token before it
+                expires (defaults to Config.FACEBOOK_APP_ID)
+            app_secret (str, optional): App secret used to renew the token
+                (defaults to Config.FACEBOOK_APP_SECRET)
+        """
+        self.logger = setup_logger(__name__)
+        self.transport = transport or get_transport()
+        access_token = access_token or Config.INSTAGRAM_ACCESS_TOKEN
+        self.account_id = account_id or Config.INSTAGRAM_ACCOUNT_ID
+        self.graph_url = Config.INSTAGRAM_GRAPH_URL.rstrip('/')
+        self._poller = poller
+        
+        if not access_token or not self.account_id:
+            raise ValueError("Instagram credentials are missing in configuration")
+        
+        # Tokens come from the shared credential cache, renewed in the background
+        app_id = app_id or Config.FACEBOOK_APP_ID
+        app_secret = app_secret or Config.FACEBOOK_APP_SECRET
+        if app_id and app_secret:
+            source = GraphTokenSource('instagram', access_token, self.graph_url, app_id, app_secret)
+        else:
+            source = StaticTokenSource('instagram', access_token)
+        self.credentials = get_credential_manager()
+        self.credential_key = self.credentials.register(source)
+        
+        # Quota key for the shared rate limiter
+        self.rate_key = ('instagram', access_token, self.account_id)
+        
+        self.logger.info("Instagram Publisher initialized successfully")
+    
+    @property
+    def poller(self):
+        """Container poller, created on first video post"""
+        if self._poller is None:
+            self._poller = get_container_poller()
+        return self._poller
+    
+    @property
+    def access_token(self):
+        """Current Instagram access token"""
+        return self.credentials.token(self.credential_key)
+    
+    @track_publish('instagram')
+    def post_image(self, image_url, caption=""):
+        """
+        Post image to Instagram
+        نشر صورة على إنستجرام
+        
+        Image containers are normally ready as soon as they are created, so
+        they are published right away.
+        
+        Args:
+            image_url (str): Public URL of the image
+            caption (str): Post caption
+        
+        Returns:
+            dict: Result with success status and media ID
+        """
+        self.logger.info(f"Posting image to Instagram: {image_url}")
+        
+        container = self._create_container({'image_url': image_url, 'caption': caption})
+        if not container.get('success'):
+            return container
+        return self.publish_container(container['container_id'])
+    
+    @track_publish('instagram')
+    def post_video(self, video_url, caption="", media_type="REELS"):
+        """
+        Post video (reel) to Instagram and wait until it is published
+        نشر فيديو على إنستجرام
+        
+        The wait happens on the shared poller; this thread only blocks on
+        the result. Use post_video_async to keep many videos in flight.
+        
+        Args:
+            video_url (str): Public URL of the video
+            caption (str): Post caption
+            media_type (str): REELS or VIDEO
+        
+        Returns:
+            dict: Result with success status and media ID
+        """
+        return self.post_video_async(video_url, caption, media_type).result()
+    
+    def post_video_async(self, video_url, caption="", media_type="REELS", callback=None):
+        """
+        Start a video post and return at once
+        بدء نشر فيديو دون انتظار
+        
+        The container is created here; the shared poller checks it together
+        with every other pending container and publishes it when ready.
+        
+        Args:
+            video_url (str): Public URL of the video
+            caption (str): Post caption
+            media_type (str): REELS or VIDEO
+            callback (callable, optional): Called with the result dict
+        
+        Returns:
+            Future: Resolves to the result dict
+        """
+        self.logger.info(f"Posting video to Instagram: {video_url}")
+        
+        container = self._create_container({
+            'media_type': media_type,
+            'video_url': video_url,
+            'caption': caption
+        })
+        if container.get('success'):
+            future = self.poller.submit(
+                container['container_id'], self.access_token,
+                lambda container_id, status: self.publish_container(container_id),
+                rate_key=self.rate_key
+            )
+            self.logger.info(
+                f"Container {container['container_id']} processing ({self.poller.pending()} pending)"
+            )
+        else:
+            future = Future()
+            future.set_result(container)
+        
+        if callback:
+            future.add_done_callback(lambda done: callback(done.result()))
+        return future
+    
+    def publish_container(self, container_id):
+        """
+        Publish a finished media container
+        
+        Args:
+            container_id (str): Container (creation) ID
+        
+        Returns:
+            dict: Result with success status and media ID
+        """
+        url = f"{self.graph_url}/{self.account_id}/media_publish"
+        payload = {
+            'creation_id': container_id,
+            'access_token': self.access_token
+        }
+        
+        try:
+            response = self.transport.post(url, data=payload, limit=self.rate_key)
+            response.raise_for_status()
+            data = response.json()
+            
+            if 'id' in data:
+                self.logger.info(f"✓ Instagram media published successfully: {data['id']}")
+                return {'success': True, 'media_id': data['id'], 'platform': 'Instagram'}
+            else:
+                self.logger.error(f"✗ Instagram publish failed: {data}")
+                return {'success': False, 'error': data, 'platform': 'Instagram'}
+        
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"✗ Instagram API request failed: {e}")
+            return {'success': False, 'error': str(e), 'platform': 'Instagram'}
+    
+    def _create_container(self, params):
+        """
+        Create a media container
+        
+        Args:
+            params (dict): Container fields (image_url or video_url, caption, ...)
+        
+        Returns:
+            dict: {'success': True, 'container_id'} or a failed result
+        """
+        url = f"{self.graph_url}/{self.account_id}/media"
+        payload = dict(params, access_token=self.access_token)
+        
+        try:
+            response = self.transport.post(url, data=payload, limit=self.rate_key)
+            response.raise_for_status()
+            data = response.json()
+            
+            if 'id' in data:
+                return {'success': True, 'container_id': data['id'], 'platform': 'Instagram'}
+            else:
+                self.logger.error(f"✗ Instagram container creation failed: {data}")
+                return {'success': False, 'error': data, 'platform': 'Instagram'}
+        
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"✗ Instagram API request failed: {e}")
+            return {'success': False, 'error': str(e), 'platform': 'Instagram'}
@@ -0,0 +1,180 @@
+"""
+Platform Registry Module
+مودول سجل المنصات
+
+Imports and constructs publishers only when a platform is first used
+"""
+
+import importlib
+import inspect
+import threading
+from importlib.metadata import entry_points
+
+from config import Config
+from utils.logger import setup_logger
+
+
+# Entry point group for third-party platforms / مجموعة نقاط الدخول للمنصات الإضافية
+ENTRY_POINT_GROUP = 'social_media_automation.platforms'
+
+# Built-in platforms: name -> (import target, Config attribute that must be set)
+BUILTIN_PLATFORMS = {
+    'facebook': ('platforms.facebook_publisher:FacebookPublisher', 'FACEBOOK_ACCESS_TOKEN'),
+    'youtube': ('platforms.youtube_publisher:YouTubePublisher', None),
+    'tiktok': ('platforms.tiktok_publisher:TikTokPublisher', 'TIKTOK_ACCESS_TOKEN'),
+    'instagram': ('platforms.instagram_publisher:InstagramPublisher', 'INSTAGRAM_ACCESS_TOKEN')
+}
+
+
+class PlatformRegistry:
+    """Lazy registry of publisher classes / سجل كسول لفئات الناشرين"""
+    
+    def __init__(self):
+        """Initialize registry with the built-in platforms"""
+        self.logger = setup_logger(__name__)
+        self._targets = {}
+        self._classes = {}
+        self._entry_points_loaded = False
+        self._lock = threading.Lock()
+        
+        for name, (target, requires) in BUILTIN_PLATFORMS.items():
+            self.register(name, target, requires=requires)
+    
+    def register(self, name, target, requires=None):
+        """
+        Register a platform publisher
+        تسجيل ناشر منصة
+        
+        Args:
+            name (str): Platform name (e.g. 'facebook')
+            target (str or type): Publisher class, or "module:Class" to import lazily
+            requires (str, optional): Config attribute that must be set for the
+                platform to be enabled
+        """
+        with self._lock:
+            self._targets[name] = (target, requires)
+            self._classes.pop(name, None)
+    
+    def names(self):
+        """
+        Get all registered platform names
+        
+        Returns:
+            list: Platform names
+        """
+        self._load_entry_points()
+        return list(self._targets)
+    
+    def is_configured(self, name):
+        """
+        Check whether the configuration required by a platform is present
+        
+        Args:
+            name (str): Platform name
+        
+        Returns:
+            bool: True if the platform can be constructed
+        """
+        if name not in self._targets:
+            self._load_entry_points()
+        if name not in self._targets:
+            return False
+        requires = self._targets[name][1]
+        return not requires or bool(getattr(Config, requires, None))
+    
+    def load(self, name):
+        """
+        Import a platform's publisher class on first use
+        
+        Args:
+            name (str): Platform name
+        
+        Returns:
+            type: Publisher class
+        
+        Raises:
+            KeyError: If the platform is not registered
+        """
+        cls = self._classes.get(name)
+        if cls is not None:
+            return cls
+        
+        if name not in self._targets:
+            self._load_entry_points()
+        with self._lock:
+            target, _ = self._targets[name]
+            if isinstance(target, str):
+                module_name, _, class_name = target.partition(':')
+                target = getattr(importlib.import_module(module_name), class_name)
+            self._classes[name] = target
+        return target
+    
+    def create(self, name, optional=None, **kwargs):
+        """
+        Import and construct a publisher
+        
+        Keyword arguments the publisher's constructor does not accept
+        (e.g. transport) are dropped.
+        
+        Args:
+            name (str): Platform name
+            optional (tuple, optional): When given, only these arguments may be
+                dropped; any other unsupported argument raises TypeError (used
+                for per-account credentials, which must never be ignored)
+            **kwargs: Constructor arguments
+        
+        Returns:
+            object: Publisher instance
+        """
+        cls = self.load(name)
+        params = inspect.signature(cls).parameters
+        if not any(p.kind == p.VAR_KEYWORD for p in params.values()):
+            unsupported = [k for k in kwargs if k not in params]
+            if optional is not None:
+                required = [k for k in unsupported if k not in optional]
+                if required:
+                    raise TypeError(f"{name} publisher does not accept {', '.join(required)}")
+            kwargs = {k: v for k, v in kwargs.items() if k in params}
+        return cls(**kwargs)
+    
+    def _load_entry_points(self):
+        """Register platforms advertised by installed packages"""
+        if self._entry_points_loaded:
+            return
+        self._entry_points_loaded = True
+        
+        try:
+            found = entry_points(group=ENTRY_POINT_GROUP)
+        except TypeError:
+            # Python < 3.10
+            found = entry_points().get(ENTRY_POINT_GROUP, [])
+        
+        for entry_point in found:
+            if entry_point.name not in self._targets:
+                self.register(entry_point.name, entry_point.value)
+                self.logger.info(f"Registered platform plugin: {entry_point.name}")
+
+
+_registry = PlatformRegistry()
+
+
+def get_registry():
+    """
+    Get the shared platform registry
+    
+    Returns:
+        PlatformRegistry: Shared registry
+    """
+    return _registry
+
+
+def register_platform(name, target, requires=None):
+    """
+    Register a platform with the shared registry
+    
+    Args:
+        name (str): Platform name
+        target (str or type): Publisher class, or "module:Class"
+        requires (str, optional): Config attribute that must be set
+    """
+    _registry.register(name, target, requires=requires)
@@ -0,0 +1,412 @@
+"""
+TikTok Publisher Module
+مودول نشر المحتوى على تيك توك
+
+Uses the TikTok Content Posting API: initialize a FILE_UPLOAD post, send the
+video in byte-range chunks, then wait for the publish job to complete
+"""
+
+import mimetypes
+import time
+from concurrent.futures import Future
+
+import requests
+from config import Config
+from utils.logger import setup_logger
+from utils.http_client import get_transport
+from utils.metrics import track_publish
+from utils.validator import validate_video_file
+from utils.video_probe import PLATFORM_VIDEO_LIMITS
+from utils.container_poller import get_container_poller
+from utils.credentials import get_credential_manager, fingerprint, TikTokTokenSource, StaticTokenSource
+from utils.chunked_upload import open_media, UploadStateStore, ChunkedUploader, committed_offset
+
+
+# FILE_UPLOAD chunk rules: 5-64 MB chunks, at most 1000 of them; the last
+# chunk takes the remainder, and files under 5 MB go as a single chunk
+MIN_CHUNK_SIZE = 5 * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+MAX_CHUNK_COUNT = 1000
+
+# Seconds an upload_url stays valid after init
+UPLOAD_URL_TTL = 3600
+
+# Publish job states / حالات مهمة النشر
+COMPLETE_STATES = ('PUBLISH_COMPLETE', 'SEND_TO_USER_INBOX')
+FAILED_STATE = 'FAILED'
+
+
+def chunk_layout(size, chunk_size):
+    """
+    Split a file into chunks the way FILE_UPLOAD expects
+    
+    Args:
+        size (int): File size in bytes
+        chunk_size (int): Preferred chunk size in bytes
+    
+    Returns:
+        tuple: (chunk_size, [(start, end), ...]) with the remainder folded
+            into the last chunk
+    """
+    if size < MIN_CHUNK_SIZE or size <= chunk_size:
+        return size, [(0, size)]
+    
+    chunk_size = min(max(chunk_size, MIN_CHUNK_SIZE, -(-size // MAX_CHUNK_COUNT)), MAX_CHUNK_SIZE)
+    count = size // chunk_size
+    chunks = [(i * chunk_size, (i + 1) * chunk_size) for i in range(count - 1)]
+    chunks.append(((count - 1) * chunk_size, size))
+    return chunk_size, chunks
+
+
+class TikTokPublisher:
+    """TikTok content publisher / ناشر محتوى تيك توك"""
+    
+    def __init__(self, transport=None, access_token=None, poller=None, refresh_token=None,
+                 client_key=None, client_secret=None):
+        """
+        Initialize TikTok publisher
+        
+        Args:
+            transport (HttpTransport, optional): Shared HTTP transport
+                (defaults to the process-wide transport)
+            access_token (str, optional): User access token
+                (defaults to Config.TIKTOK_ACCESS_TOKEN)
+            poller (ContainerPoller, optional): Publish status poller
+                (defaults to the process-wide poller)
+            refresh_token (str, optional): Refresh token used to renew the
+                access token (defaults to Config.TIKTOK_REFRESH_TOKEN)
+            client_key (str, optional): App client key
+                (defaults to Config.TIKTOK_CLIENT_KEY)
+            client_secret (str, optional): App client secret
+                (defaults to Config.TIKTOK_CLIENT_SECRET)
+        """
+        self.logger = setup_logger(__name__)
+        self.transport = transport or get_transport()
+        self.upload_state = UploadStateStore()
+        access_token = access_token or Config.TIKTOK_ACCESS_TOKEN
+        self.api_url = Config.TIKTOK_API_URL.rstrip('/')
+        self._poller = poller
+        
+        if not access_token:
+            raise ValueError("TikTok access token is missing in configuration")
+        
+        # Tokens come from the shared credential cache, renewed in the background
+        refresh_token = refresh_token or Config.TIKTOK_REFRESH_TOKEN
+        client_key = client_key or Config.TIKTOK_CLIENT_KEY
+        client_secret = client_secret or Config.TIKTOK_CLIENT_SECRET
+        if refresh_token and client_key and client_secret:
+            source = TikTokTokenSource(access_token, refresh_token, client_key, client_secret, self.api_url)
+        else:
+            source = StaticTokenSource('tiktok', access_token)
+        self.credentials = get_credential_manager()
+        self.credential_key = self.credentials.register(source)
+        
+        # Quota key for the shared rate limiter
+        self.rate_key = ('tiktok', access_token, None)
+        self._token_id = fingerprint(access_token)
+        
+        self.logger.info("TikTok Publisher initialized successfully")
+    
+    @property
+    def poller(self):
+        """Status poller, created on first video post"""
+        if self._poller is None:
+            self._poller = get_container_poller()
+        return self._poller
+    
+    @property
+    def access_token(self):
+        """Current TikTok access token"""
+        return self.credentials.token(self.credential_key)
+    
+    @property
+    def headers(self):
+        """Headers for Content Posting API calls"""
+        return self._api_headers(self.access_token)
+    
+    @staticmethod
+    def _api_headers(access_token):
+        """Headers for Content Posting API calls made with a given token"""
+        return {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json; charset=UTF-8'
+        }
+    
+    @track_publish('tiktok')
+    def post_video(self, video_path, title, privacy_level="PUBLIC_TO_EVERYONE"):
+        """
+        Post video to TikTok and wait until it is published
+        نشر فيديو على تيك توك
+        
+        Args:
+            video_path (str): Path to video file
+            title (str): Video title (caption)
+            privacy_level (str): PUBLIC_TO_EVERYONE, MUTUAL_FOLLOW_FRIENDS,
+                FOLLOWER_OF_CREATOR or SELF_ONLY
+        
+        Returns:
+            dict: Result with success status and publish ID
+        """
+        return self.post_video_async(video_path, title, privacy_level).result()
+    
+    def post_video_async(self, video_path, title, privacy_level="PUBLIC_TO_EVERYONE", callback=None):
+        """
+        Upload a video and return without waiting for TikTok to process it
+        رفع فيديو دون انتظار المعالجة
+        
+        The upload happens on this thread; the publish status is then checked
+        on the shared poller together with every other pending post.
+        
+        Args:
+            video_path (str): Path to video file
+            title (str): Video title (caption)
+            privacy_level (str): Privacy level of the post
+            callback (callable, optional): Called with the result dict
+        
+        Returns:
+            Future: Resolves to the result dict
+        """
+        self.logger.info(f"Posting video to TikTok: {video_path}")
+        
+        upload = self._upload_video(video_path, title, privacy_level)
+        if upload.get('success'):
+            future = self.poller.submit(
+                upload['publish_id'], self.access_token, self._published,
+                rate_key=self.rate_key, platform='tiktok', fetch=self.fetch_status
+            )
+            self.logger.info(
+                f"TikTok post {upload['publish_id']} processing ({self.poller.pending()} pending)"
+            )
+        else:
+            future = Future()
+            future.set_result(upload)
+        
+        if callback:
+            future.add_done_callback(lambda done: callback(done.result()))
+        return future
+    
+    def fetch_status(self, access_token, rate_key, publish_ids):
+        """
+        Look up the status of publish jobs for the poller
+        
+        Args:
+            access_token (str): Token that created the posts
+            rate_key (tuple): Rate limiter key
+            publish_ids (list): Publish IDs
+        
+        Returns:
+            dict: publish ID -> {'status_code', 'status', 'post_ids'}, with
+                TikTok states mapped to container status codes
+        """
+        statuses = {}
+        for publish_id in publish_ids:
+            try:
+                response = self.transport.post(
+                    f"{self.api_url}/v2/post/publish/status/fetch/",
+                    json={'publish_id': publish_id},
+                    headers=self.headers,
+                    limit=rate_key,
+                    idempotent=True
+                )
+                response.raise_for_status()
+                data = response.json().get('data') or {}
+            except (requests.exceptions.RequestException, ValueError) as e:
+                self.logger.warning(f"⚠️ TikTok status check failed for {publish_id}: {e}")
+                continue
+            
+            state = data.get('status')
+            if state in COMPLETE_STATES:
+                code = 'FINISHED'
+            elif state == FAILED_STATE:
+                code = 'ERROR'
+            else:
+                code = 'IN_PROGRESS'
+            statuses[publish_id] = {
+                'status_code': code,
+                'status': data.get('fail_reason') or state,
+                'post_ids': data.get('publicaly_available_post_id') or []
+            }
+        return statuses
+    
+    def _published(self, publish_id, status):
+        """Build the result for a completed publish job"""
+        self.logger.info(f"✓ TikTok video published successfully: {publish_id}")
+        result = {'success': True, 'publish_id': publish_id, 'platform': 'TikTok'}
+        if status.get('post_ids'):
+            result['post_id'] = str(status['post_ids'][0])
+        return result
+    
+    def _upload_video(self, video_path, title, privacy_level):
+        """
+        Send a video through a resumable FILE_UPLOAD session
+        رفع فيديو مجزأ قابل للاستئناف
+        
+        Chunks are read from a memory-mapped file, at most
+        Config.TIKTOK_UPLOAD_WORKERS at a time, and acknowledged ranges are
+        saved after every chunk so a restarted process continues the same
+        upload while its upload_url is still valid.
+        
+        Args:
+            video_path (str): Path to video file
+            title (str): Video title
+            privacy_level (str): Privacy level of the post
+        
+        Returns:
+            dict: {'success': True, 'publish_id'} or a failed result
+        """
+        # Reject unreadable or out-of-limit files before uploading anything
+        validation = validate_video_file(
+            video_path, max_size_mb=PLATFORM_VIDEO_LIMITS['tiktok']['max_size_mb'], platform='tiktok'
+        )
+        if not validation['valid']:
+            self.logger.error(f"✗ Video rejected before upload: {validation['error']}")
+            return {'success': False, 'error': validation['error'], 'platform': 'TikTok'}
+        
+        state_key = None
+        resumed = False
+        
+        try:
+            state_key = UploadStateStore.key_for('tiktok', video_path, self._token_id)
+            state = self._load_upload(state_key)
+            
+            with open_media(video_path) as source:
+                chunk_size, chunks = chunk_layout(
+                    source.size, Config.TIKTOK_UPLOAD_CHUNK_MB * 1024 * 1024
+                )
+                if state:
+                    resumed = True
+                    self._log_resumed(state, source.size)
+                else:
+                    state = self._init_upload(source.size, chunk_size, len(chunks), title, privacy_level)
+                    if not state.get('success'):
+                        return state
+                    del state['success']
+                    self.upload_state.save(state_key, state)
+                
+                content_type = mimetypes.guess_type(video_path)[0] or 'video/mp4'
+                
+                def send_chunk(start, end, data):
+                    response = self.transport.put(
+                        state['upload_url'],
+                        data=data,
+                        headers=self._chunk_headers(content_type, start, end, source.size),
+                        limit=self.rate_key
+                    )
+                    response.raise_for_status()
+                
+                def save_progress(acked):
+                    state['acked'] = acked
+                    self.upload_state.save(state_key, state)
+                
+                uploader = ChunkedUploader(
+                    source,
+                    chunk_size,
+                    max_workers=Config.TIKTOK_UPLOAD_WORKERS,
+                    on_progress=save_progress
+                )
+                uploader.upload(send_chunk, acked=state['acked'], chunks=chunks)
+            
+            return self._finish_upload(state_key, state)
+        
+        except FileNotFoundError:
+            self.logger.error(f"✗ Video file not found: {video_path}")
+            return {'success': False, 'error': 'File not found', 'platform': 'TikTok'}
+        except requests.exceptions.RequestException as e:
+            return self._upload_failed(e, state_key, resumed)
+    
+    def _init_upload(self, video_size, chunk_size, chunk_count, title, privacy_level):
+        """
+        Initialize a FILE_UPLOAD post
+        
+        Args:
+            video_size (int): Video size in bytes
+            chunk_size (int): Chunk size in bytes
+            chunk_count (int): Number of chunks
+            title (str): Video title
+            privacy_level (str): Privacy level of the post
+        
+        Returns:
+            dict: Initial upload state with 'success', or a failed result
+        """
+        response = self.transport.post(
+            f"{self.api_url}/v2/post/publish/video/init/",
+            json=self._init_payload(video_size, chunk_size, chunk_count, title, privacy_level),
+            headers=self.headers,
+            limit=self.rate_key
+        )
+        response.raise_for_status()
+        return self._init_state(response.json(), video_size, chunk_count)
+    
+    @staticmethod
+    def _init_payload(video_size, chunk_size, chunk_count, title, privacy_level):
+        """Body of a FILE_UPLOAD init request (also sent by AsyncTikTokPublisher)"""
+        return {
+            'post_info': {
+                'title': title,
+                'privacy_level': privacy_level
+            },
+            'source_info': {
+                'source': 'FILE_UPLOAD',
+                'video_size': video_size,
+                'chunk_size': chunk_size,
+                'total_chunk_count': chunk_count
+            }
+        }
+    
+    def _init_state(self, result, video_size, chunk_count):
+        """Build the initial upload state (with 'success') from an init response, or a failed result"""
+        error = result.get('error') or {}
+        data = result.get('data') or {}
+        if error.get('code', 'ok') != 'ok' or 'upload_url' not in data:
+            self.logger.error(f"✗ TikTok upload init failed: {result}")
+            return {'success': False, 'error': error.get('message') or result, 'platform': 'TikTok'}
+        
+        self.logger.info(f"TikTok upload started: {data['publish_id']} ({chunk_count} chunks)")
+        return {
+            'success': True,
+            'publish_id': data['publish_id'],
+            'upload_url': data['upload_url'],
+            'file_size': video_size,
+            'acked': [],
+            'created': time.time()
+        }
+    
+    def _load_upload(self, state_key):
+        """Read a saved upload whose upload_url is still valid"""
+        state = self.upload_state.load(state_key)
+        if state and time.time() - state['created'] >= UPLOAD_URL_TTL:
+            self.logger.info(f"TikTok upload URL for {state['publish_id']} expired; starting over")
+            return None
+        return state
+    
+    def _log_resumed(self, state, file_size):
+        """Log the position a saved upload continues from"""
+        self.logger.info(
+            f"Resuming TikTok upload {state['publish_id']} "
+            f"at {committed_offset(state['acked'])}/{file_size} bytes"
+        )
+    
+    @staticmethod
+    def _chunk_headers(content_type, start, end, file_size):
+        """Headers of a chunk PUT to the upload_url"""
+        return {
+            'Content-Type': content_type,
+            'Content-Length': str(end - start),
+            'Content-Range': f'bytes {start}-{end - 1}/{file_size}'
+        }
+    
+    def _finish_upload(self, state_key, state):
+        """Drop the saved upload once every chunk is in and build the result"""
+        self.upload_state.delete(state_key)
+        self.logger.info(f"TikTok video uploaded: {state['publish_id']}")
+        return {'success': True, 'publish_id': state['publish_id'], 'platform': 'TikTok'}
+    
+    def _upload_failed(self, error, state_key, resumed):
+        """Result for a failed upload request"""
+        # A rejected resumed upload has most likely expired; start fresh next time
+        response = getattr(error, 'response', None)
+        if resumed and response is not None and 400 <= response.status_code < 500:
+            self.logger.warning("Discarding stale TikTok upload session")
+            self.upload_state.delete(state_key)
+        self.logger.error(f"✗ TikTok API request failed: {error}")
+        return {'success': False, 'error': str(error), 'platform': 'TikTok'}
@@ -0,0 +1,335 @@
+"""
+YouTube Publisher Module
+مودول رفع الفيديوهات على يوتيوب
+
+Uses the YouTube Data API resumable upload protocol: open an upload
+session, send the video in chunks and continue an interrupted session from
+the offset the server has confirmed
+"""
+
+import hashlib
+import json
+import mimetypes
+import re
+import time
+
+import requests
+from config import Config
+from utils.logger import setup_logger
+from utils.http_client import get_transport
+from utils.metrics import track_publish
+from utils.validator import validate_video_file
+from utils.video_probe import PLATFORM_VIDEO_LIMITS
+from utils.chunked_upload import open_media, UploadStateStore, UploadProgress
+from utils.credentials import get_credential_manager, GoogleTokenSource
+
+
+# OAuth scope needed to upload videos
+SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
+
+# Resumable chunks must be a multiple of 256 KiB (except the last one)
+CHUNK_GRANULARITY = 256 * 1024
+
+# Seconds an upload session URI stays valid
+SESSION_TTL = 7 * 24 * 3600
+
+# Query string that opens a resumable session
+SESSION_PARAMS = {'uploadType': 'resumable', 'part': 'snippet,status'}
+
+# "bytes=0-<last byte>" header of a 308 Resume Incomplete response
+RANGE_HEADER = re.compile(r'bytes=(\d+)-(\d+)')
+
+
+class YouTubePublisher:
+    """YouTube video publisher / ناشر فيديوهات يوتيوب"""
+    
+    def __init__(self, transport=None, credentials_file=None, client_secrets_file=None, credentials=None):
+        """
+        Initialize YouTube publisher
+        
+        Args:
+            transport (HttpTransport, optional): Shared HTTP transport
+                (defaults to the process-wide transport)
+            credentials_file (str, optional): Saved OAuth credentials
+                (defaults to Config.YOUTUBE_CREDENTIALS_PICKLE)
+            client_secrets_file (str, optional): OAuth client secrets used to
+                authorize when there are no saved credentials
+                (defaults to Config.YOUTUBE_CLIENT_SECRETS_FILE)
+            credentials (google.auth.credentials.Credentials, optional):
+                Ready-made credentials, used while the credentials file does not exist
+        """
+        self.logger = setup_logger(__name__)
+        self.transport = transport or get_transport()
+        self.upload_state = UploadStateStore()
+        self.credentials_file = credentials_file or Config.YOUTUBE_CREDENTIALS_PICKLE
+        self.client_secrets_file = client_secrets_file or Config.YOUTUBE_CLIENT_SECRETS_FILE
+        self.upload_url = Config.YOUTUBE_UPLOAD_URL
+        
+        # Tokens come from the shared credential cache, refreshed in the background
+        self.credentials = get_credential_manager()
+        self.credential_key = self.credentials.register(GoogleTokenSource(
+            self.credentials_file, self.client_secrets_file, SCOPES, credentials
+        ))
+        
+        # Quota key for the shared rate limiter
+        self.rate_key = ('youtube', self.credentials_file, None)
+        
+        self.logger.info("YouTube Publisher initialized successfully")
+    
+    @property
+    def access_token(self):
+        """Current OAuth access token"""
+        return self.credentials.token(self.credential_key)
+    
+    @track_publish('youtube')
+    def upload_video(self, video_path, title, description="", tags=None, privacy="private", on_progress=None):
+        """
+        Upload video to YouTube
+        رفع فيديو على يوتيوب
+        
+        The session URI and confirmed offset are saved after every chunk, so
+        a restarted process asks the server how much it holds and continues
+        from there instead of starting over.
+        
+        Args:
+            video_path (str): Path to video file
+            title (str): Video title
+            description (str): Video description
+            tags (list, optional): Video tags
+            privacy (str): private, unlisted or public
+            on_progress (callable, optional): Called as on_progress(confirmed, total)
+                after every confirmed chunk
+        
+        Returns:
+            dict: Result with success status and video ID
+        """
+        self.logger.info(f"Uploading video to YouTube: {video_path}")
+        
+        # Reject unreadable or out-of-limit files before uploading anything
+        validation = validate_video_file(
+            video_path, max_size_mb=PLATFORM_VIDEO_LIMITS['youtube']['max_size_mb'], platform='youtube'
+        )
+        if not validation['valid']:
+            self.logger.error(f"✗ Video rejected before upload: {validation['error']}")
+            return {'success': False, 'error': validation['error'], 'platform': 'YouTube'}
+        
+        metadata = self._metadata(title, description, tags, privacy)
+        chunk_size = self._chunk_size()
+        content_type = mimetypes.guess_type(video_path)[0] or 'video/*'
+        
+        try:
+            state_key = self._state_key(video_path, metadata)
+            state = self._load_session(state_key)
+            
+            with open_media(video_path) as source:
+                progress = UploadProgress('youtube', source.size, self.logger, on_progress, label='YouTube')
+                offset = video = None
+                
+                if state:
+                    offset, video = self._query_offset(state['session_uri'], source.size)
+                    if offset is None and video is None:
+                        self.logger.warning("Discarding expired YouTube upload session")
+                    else:
+                        progress.resumed(source.size if video else offset)
+                if offset is None and video is None:
+                    state = self._start_session(metadata, source.size, content_type)
+                    self.upload_state.save(state_key, state)
+                    offset = 0
+                
+                failures = 0
+                while video is None:
+                    end = min(offset + chunk_size, source.size)
+                    data = source.read(offset, end - offset)
+                    try:
+                        response = self.transport.put(
+                            state['session_uri'],
+                            data=data,
+                            headers=self._chunk_headers(offset, end, source.size, self.access_token),
+                            limit=self.rate_key,
+                            idempotent=False
+                        )
+                        if response.status_code != 308:
+                            response.raise_for_status()
+                    except requests.exceptions.RequestException as e:
+                        # Ask the server what it kept, then continue from there
+                        failures += 1
+                        delay = self._chunk_failed(e, offset, failures)
+                        if delay is None:
+                            raise
+                        time.sleep(delay)
+                        offset, video = self._query_offset(state['session_uri'], source.size)
+                        if offset is None and video is None:
+                            raise
+                        continue
+                    finally:
+                        data.release()
+                    
+                    failures = 0
+                    if response.status_code == 308:
+                        offset = self._confirm_chunk(state_key, state, response)
+                        progress.update(offset)
+                    else:
+                        video = response.json()
+                        progress.update(source.size)
+            
+            return self._finish_upload(state_key, video)
+        
+        except FileNotFoundError:
+            self.logger.error(f"✗ Video file not found: {video_path}")
+            return {'success': False, 'error': 'File not found', 'platform': 'YouTube'}
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            return self._upload_failed(e)
+    
+    def _state_key(self, video_path, metadata):
+        """Upload state key; only the same video (file, channel and metadata) continues a saved session"""
+        channel_id = hashlib.sha1(self.credentials_file.encode('utf-8')).hexdigest()[:16]
+        metadata_id = hashlib.sha1(json.dumps(metadata, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        return UploadStateStore.key_for('youtube', video_path, channel_id, metadata_id)
+    
+    def _start_session(self, metadata, file_size, content_type):
+        """
+        Open a resumable upload session
+        
+        Args:
+            metadata (dict): Video resource (snippet and status)
+            file_size (int): Video size in bytes
+            content_type (str): Video MIME type
+        
+        Returns:
+            dict: Initial upload state
+        """
+        response = self.transport.post(
+            self.upload_url,
+            params=SESSION_PARAMS,
+            json=metadata,
+            headers=self._session_headers(file_size, content_type, self.access_token),
+            limit=self.rate_key
+        )
+        response.raise_for_status()
+        return self._session_state(response, file_size)
+    
+    def _query_offset(self, session_uri, file_size):
+        """
+        Ask the server how much of an upload it has received
+        
+        Args:
+            session_uri (str): Upload session URI
+            file_size (int): Video size in bytes
+        
+        Returns:
+            tuple: (offset, None) while incomplete, (None, video resource) if
+                the upload already finished, or (None, None) if the session
+                is gone
+        """
+        response = self.transport.put(
+            session_uri, headers=self._offset_headers(file_size, self.access_token), limit=self.rate_key
+        )
+        return self._parse_offset(response)
+    
+    @staticmethod
+    def _metadata(title, description, tags, privacy):
+        """Video resource sent when a session is opened"""
+        return {
+            'snippet': {
+                'title': title,
+                'description': description,
+                'tags': list(tags or []),
+                'categoryId': Config.YOUTUBE_CATEGORY_ID
+            },
+            'status': {'privacyStatus': privacy}
+        }
+    
+    @staticmethod
+    def _chunk_size():
+        """Configured chunk size, rounded down to the required granularity"""
+        chunk_size = Config.YOUTUBE_UPLOAD_CHUNK_MB * 1024 * 1024
+        return max(CHUNK_GRANULARITY, chunk_size - chunk_size % CHUNK_GRANULARITY)
+    
+    def _load_session(self, state_key):
+        """Read a saved session whose URI has not expired"""
+        state = self.upload_state.load(state_key)
+        if state and time.time() - state['created'] < SESSION_TTL:
+            return state
+        return None
+    
+    @staticmethod
+    def _session_headers(file_size, content_type, access_token):
+        """Headers of the request that opens a session"""
+        return {
+            'Authorization': f'Bearer {access_token}',
+            'X-Upload-Content-Length': str(file_size),
+            'X-Upload-Content-Type': content_type
+        }
+    
+    def _session_state(self, response, file_size):
+        """Build the initial upload state from the session response"""
+        self.logger.info("YouTube upload session started")
+        return {'session_uri': response.headers['Location'], 'file_size': file_size,
+                'offset': 0, 'created': time.time()}
+    
+    @staticmethod
+    def _offset_headers(file_size, access_token):
+        """Headers of an offset query"""
+        return {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Length': '0',
+            'Content-Range': f'bytes */{file_size}'
+        }
+    
+    def _parse_offset(self, response):
+        """Read an offset query response (see _query_offset)"""
+        if response.status_code == 308:
+            return self._confirmed_offset(response), None
+        if response.status_code in (200, 201):
+            return None, response.json()
+        if response.status_code in (404, 410):
+            return None, None
+        response.raise_for_status()
+        return None, None
+    
+    @staticmethod
+    def _chunk_headers(offset, end, file_size, access_token):
+        """Headers of a chunk PUT to the session URI"""
+        return {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Length': str(end - offset),
+            'Content-Range': f'bytes {offset}-{end - 1}/{file_size}'
+        }
+    
+    def _chunk_failed(self, error, offset, failures):
+        """
+        Handle a failed chunk
+        
+        Returns:
+            float: Seconds to wait before asking the server for its offset,
+                or None once Config.UPLOAD_CHUNK_RETRIES is used up
+        """
+        if getattr(error.response, 'status_code', None) == 401:
+            self.credentials.invalidate(self.credential_key)
+        if failures >= Config.UPLOAD_CHUNK_RETRIES:
+            return None
+        self.logger.warning(f"⚠️ YouTube chunk at {offset} failed ({error}); resuming")
+        return min(2 ** failures, 30)
+    
+    def _confirm_chunk(self, state_key, state, response):
+        """Save the offset confirmed by a 308 response and return it"""
+        state['offset'] = self._confirmed_offset(response)
+        self.upload_state.save(state_key, state)
+        return state['offset']
+    
+    def _finish_upload(self, state_key, video):
+        """Drop the saved session once the video resource is back and build the result"""
+        self.upload_state.delete(state_key)
+        self.logger.info(f"✓ YouTube video uploaded successfully: {video['id']}")
+        return {'success': True, 'video_id': video['id'], 'platform': 'YouTube'}
+    
+    def _upload_failed(self, error):
+        """Result for a failed upload"""
+        self.logger.error(f"✗ YouTube upload failed: {error}")
+        return {'success': False, 'error': str(error), 'platform': 'YouTube'}
+    
+    @staticmethod
+    def _confirmed_offset(response):
+        """Read the next byte to send from a 308 Resume Incomplete response"""
+        match = RANGE_HEADER.match(response.headers.get('Range', ''))
+        return int(match.group(2)) + 1 if match else 0
@@ -5,5 +5,6 @@ Utilities Module
 
 from .logger import setup_logger
 from .validator import validate_url, validate_file_path
+from .http_client import HttpTransport, get_transport
 
-__all__ = ['setup_logger', 'validate_url', 'validate_file_path']
+__all__ = ['setup_logger', 'validate_url', 'validate_file_path', 'HttpTransport', 'get_transport']
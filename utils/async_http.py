@@ -0,0 +1,397 @@
+"""
+Async HTTP Transport Utility
+أداة النقل غير المتزامن عبر HTTP
+
+aiohttp counterpart of HttpTransport for asyncio code: one pooled client
+session per event loop, with the same rate limiting, circuit breakers,
+retries and metrics as the threaded transport
+"""
+
+import asyncio
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+import requests
+from requests.structures import CaseInsensitiveDict
+from urllib3.exceptions import NewConnectionError
+
+from config import Config
+from utils.logger import setup_logger
+from utils.metrics import get_metrics
+from utils.concurrency import classify, get_concurrency_limiter
+from utils.http_client import _outcome
+from utils.rate_limiter import get_rate_limiter, RateLimitExceeded
+from utils.retry import RetryPolicy, CircuitOpenError, get_circuit_breaker
+
+
+# Raised by aiohttp >= 3.10 when the connection itself times out
+_CONNECT_TIMEOUT_ERRORS = tuple(
+    error for error in (getattr(aiohttp, 'ConnectionTimeoutError', None),) if error is not None
+)
+
+
+class AsyncResponse:
+    """Buffered aiohttp response with the parts of requests.Response publishers use"""
+    
+    def __init__(self, url, status_code, reason, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.request = None
+    
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+    
+    def json(self):
+        return json.loads(self.content)
+    
+    def raise_for_status(self):
+        """Raise requests.exceptions.HTTPError for 4xx/5xx responses, like requests does"""
+        if self.status_code >= 400:
+            kind = 'Client' if self.status_code < 500 else 'Server'
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} {kind} Error: {self.reason} for url: {self.url}", response=self
+            )
+
+
+def _request_error(error):
+    """Map an aiohttp/asyncio failure onto the requests exception the retry policy understands"""
+    if isinstance(error, _CONNECT_TIMEOUT_ERRORS):
+        return requests.exceptions.ConnectTimeout(str(error) or 'Connection timed out')
+    if isinstance(error, asyncio.TimeoutError):
+        return requests.exceptions.ReadTimeout(str(error) or 'Read timed out')
+    if isinstance(error, aiohttp.ClientConnectorError) and not isinstance(error, aiohttp.ClientSSLError):
+        # Never connected: shaped like requests' own refused/DNS errors
+        return requests.exceptions.ConnectionError(NewConnectionError(None, str(error)))
+    if isinstance(error, aiohttp.ClientConnectionError):
+        return requests.exceptions.ConnectionError(str(error))
+    return requests.exceptions.RequestException(str(error))
+
+
+class AsyncHttpTransport:
+    """Pooled non-blocking HTTP transport / ناقل HTTP غير متزامن مشترك"""
+    
+    def __init__(self, pool_limit=None, pool_limit_per_host=None, timeout=None,
+                 rate_limiter=None, retry_policy=None, metrics=None, concurrency=None):
+        """
+        Initialize async HTTP transport
+        
+        Args:
+            pool_limit (int, optional): Connections open at once across all hosts
+                (defaults to Config.HTTP_ASYNC_POOL_LIMIT); further requests
+                wait for a free connection instead of a thread
+            pool_limit_per_host (int, optional): Connections per host, 0 for no
+                limit (defaults to Config.HTTP_ASYNC_POOL_PER_HOST)
+            timeout (tuple, optional): (connect, read) timeout in seconds
+            rate_limiter (RateLimiter, optional): Quota tracker applied to calls
+                that pass a limit key (defaults to the shared limiter when
+                Config.RATE_LIMIT_ENABLED)
+            retry_policy (RetryPolicy, optional): Retry policy for failed calls
+                (defaults to the Config.RETRY_* settings)
+            metrics (MetricsRegistry, optional): Where request metrics are
+                recorded (defaults to the shared registry)
+            concurrency (ConcurrencyLimiter, optional): Adaptive limits on the
+                requests in flight per platform and endpoint, shared with
+                HttpTransport (defaults to the shared limiter when
+                Config.ADAPTIVE_CONCURRENCY_ENABLED)
+        """
+        self.logger = setup_logger(__name__)
+        self.pool_limit = pool_limit or Config.HTTP_ASYNC_POOL_LIMIT
+        self.pool_limit_per_host = (
+            Config.HTTP_ASYNC_POOL_PER_HOST if pool_limit_per_host is None else pool_limit_per_host
+        )
+        self.timeout = timeout or (Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT)
+        if rate_limiter is None and Config.RATE_LIMIT_ENABLED:
+            rate_limiter = get_rate_limiter()
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        if concurrency is None and Config.ADAPTIVE_CONCURRENCY_ENABLED:
+            concurrency = get_concurrency_limiter()
+        self.concurrency = concurrency
+        self._init_metrics(metrics or get_metrics())
+        
+        # aiohttp sessions belong to the loop that created them
+        self._sessions = {}
+        self._lock = threading.Lock()
+    
+    def _init_metrics(self, metrics):
+        """Create the request metrics (shared with HttpTransport)"""
+        self.metrics = metrics
+        self._requests = metrics.counter(
+            'sma_http_requests_total', 'HTTP requests by platform, method and outcome',
+            ('platform', 'method', 'outcome')
+        )
+        self._phases = metrics.histogram(
+            'sma_http_request_seconds',
+            'HTTP request time by phase: connect, upload (request preparation and body), '
+            'processing (until response headers) and total',
+            ('platform', 'phase')
+        )
+        self._uploaded = metrics.counter(
+            'sma_http_uploaded_bytes_total', 'Request body bytes sent', ('platform',)
+        )
+        self._retries = metrics.counter(
+            'sma_http_retries_total', 'Requests retried after a retryable failure', ('platform',)
+        )
+        self._throttled = metrics.counter(
+            'sma_http_throttled_total', 'Throttled requests (client = local rate limiter, server = platform)',
+            ('platform', 'source')
+        )
+        self._throttle_wait = metrics.counter(
+            'sma_rate_limit_wait_seconds_total', 'Seconds spent waiting for the rate limiter', ('platform',)
+        )
+        self._concurrency_wait = metrics.counter(
+            'sma_concurrency_wait_seconds_total', 'Seconds spent waiting for a concurrency slot', ('platform',)
+        )
+        self._in_flight = metrics.gauge(
+            'sma_http_in_flight', 'Requests currently in progress', ('platform',)
+        )
+    
+    def session(self):
+        """
+        Get the pooled client session of the running event loop
+        الحصول على جلسة الاتصال المشتركة للحلقة الحالية
+        
+        Returns:
+            aiohttp.ClientSession: Keep-alive session shared by every host
+        """
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            with self._lock:
+                # Drop sessions of loops that have since been closed
+                for other in [other for other in self._sessions if other.is_closed()]:
+                    del self._sessions[other]
+                connector = aiohttp.TCPConnector(limit=self.pool_limit, limit_per_host=self.pool_limit_per_host)
+                session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1])
+                )
+                self._sessions[loop] = session
+        return session
+    
+    async def request(self, method, url, limit=None, idempotent=None, **kwargs):
+        """
+        Send a request through the pooled session
+        
+        Same contract as HttpTransport.request: calls that pass a limit key
+        wait for the rate limiter (without blocking the event loop), go
+        through the platform circuit breaker and are retried with backoff
+        when the failure is retryable.
+        
+        Args:
+            method (str): HTTP method
+            url (str): Request URL
+            limit (tuple, optional): (platform, access_token, page_id) quota key
+            idempotent (bool, optional): Whether repeating the call is safe
+                (defaults to True for GET, HEAD, PUT and DELETE)
+            **kwargs: Passed to aiohttp.ClientSession.request; data may be a
+                callable that builds a fresh body for every attempt, which
+                streamed files and multipart forms need to be retried
+        
+        Returns:
+            AsyncResponse: Last response received, already read
+        
+        Raises:
+            RateLimitExceeded: If the quota would delay the call too long
+            CircuitOpenError: If the platform circuit is open
+            requests.exceptions.RequestException: If the request failed
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in ('GET', 'HEAD', 'PUT', 'DELETE')
+        
+        breaker = get_circuit_breaker(limit[0]) if limit else None
+        platform = limit[0] if limit else 'other'
+        
+        self._in_flight.inc(platform=platform)
+        try:
+            return await self._request_loop(method, url, limit, idempotent, breaker, platform, kwargs)
+        finally:
+            self._in_flight.dec(platform=platform)
+    
+    async def _request_loop(self, method, url, limit, idempotent, breaker, platform, kwargs):
+        """Attempt a request until it succeeds or is not worth retrying"""
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            if breaker:
+                try:
+                    breaker.before_call()
+                except CircuitOpenError:
+                    self._requests.inc(platform=platform, method=method, outcome='circuit_open')
+                    raise
+            
+            attempt_kwargs = dict(kwargs)
+            if callable(attempt_kwargs.get('data')):
+                try:
+                    attempt_kwargs['data'] = attempt_kwargs['data']()
+                except Exception:
+                    # e.g. the file to stream is gone; nothing reached the platform
+                    if breaker:
+                        breaker.release()
+                    raise
+            
+            response = None
+            error = None
+            try:
+                response = await self._send(method, url, limit, attempt_kwargs)
+            except RateLimitExceeded:
+                if breaker:
+                    breaker.release()
+                self._requests.inc(platform=platform, method=method, outcome='throttled')
+                self._throttled.inc(platform=platform, source='client')
+                raise
+            except requests.exceptions.RequestException as e:
+                error = e
+            except BaseException:
+                # Cancelled (e.g. by asyncio.wait_for) or failed outside the
+                # request: a half-open probe must not stay claimed
+                if breaker:
+                    breaker.release()
+                raise
+            
+            self._requests.inc(platform=platform, method=method, outcome=_outcome(response, error))
+            
+            if breaker:
+                if error is not None or response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            
+            retryable = self.retry_policy.is_retryable(response, error, idempotent)
+            if not retryable or attempt >= self.retry_policy.max_attempts:
+                if error is not None:
+                    raise error
+                return response
+            
+            delay = self.retry_policy.delay(attempt)
+            self._retries.inc(platform=platform)
+            if breaker:
+                breaker.record_retry()
+            reason = error if error is not None else f"HTTP {response.status_code}"
+            self.logger.warning(
+                f"⚠️  {method} {urlparse(url).netloc} failed ({reason}); "
+                f"retrying in {delay:.1f}s (attempt {attempt + 1}/{self.retry_policy.max_attempts})"
+            )
+            await asyncio.sleep(delay)
+    
+    async def _send(self, method, url, limit, kwargs):
+        """Send one attempt, honoring the rate limiter and concurrency limit and recording its duration"""
+        platform = limit[0] if limit else 'other'
+        reserved = bool(limit and self.rate_limiter)
+        slot = self.concurrency.limit_for(platform, url) if self.concurrency else None
+        try:
+            if reserved:
+                waited = self.rate_limiter.reserve(*limit)
+                if waited:
+                    self._throttle_wait.inc(waited, platform=platform)
+                    await asyncio.sleep(waited)
+            
+            if slot:
+                waited = await slot.acquire_async()
+                if waited > 0.001:
+                    self._concurrency_wait.inc(waited, platform=platform)
+        except asyncio.CancelledError:
+            # Cancelled before the call was sent: its quota was not used
+            if reserved:
+                self.rate_limiter.refund(*limit)
+            raise
+        
+        started = time.perf_counter()
+        response = None
+        error = None
+        try:
+            async with self.session().request(method, url, **kwargs) as raw:
+                content = await raw.read()
+                body_size = raw.request_info.headers.get('Content-Length')
+                response = AsyncResponse(str(raw.url), raw.status, raw.reason, raw.headers, content)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = _request_error(e)
+            raise error from e
+        finally:
+            elapsed = time.perf_counter() - started
+            self._phases.observe(elapsed, platform=platform, phase='total')
+            if slot:
+                slot.release(elapsed, classify(response, error))
+        
+        if body_size:
+            self._uploaded.inc(int(body_size), platform=platform)
+        
+        throttled = response.status_code == 429
+        if limit and self.rate_limiter:
+            throttled = self.rate_limiter.observe(limit[0], response, *limit[1:])
+        if throttled:
+            self._throttled.inc(platform=platform, source='server')
+        return response
+    
+    async def get(self, url, **kwargs):
+        """Send a GET request"""
+        return await self.request('GET', url, **kwargs)
+    
+    async def post(self, url, **kwargs):
+        """Send a POST request"""
+        return await self.request('POST', url, **kwargs)
+    
+    async def put(self, url, **kwargs):
+        """Send a PUT request"""
+        return await self.request('PUT', url, **kwargs)
+    
+    async def close(self):
+        """Close the session of the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._sessions.pop(loop, None)
+        if session is not None:
+            await session.close()
+
+
+async def read_chunk(source, start, end):
+    """
+    Copy a byte range of an upload source on a worker thread
+    
+    Page faults on the mapped file happen off the event loop.
+    
+    Args:
+        source (MappedFile): Chunk source (see utils.chunked_upload.open_media)
+        start (int): Start offset in bytes
+        end (int): End offset in bytes (exclusive)
+    
+    Returns:
+        bytes: Chunk data
+    """
+    def copy():
+        view = source.read(start, end - start)
+        try:
+            return bytes(view)
+        finally:
+            view.release()
+    return await asyncio.to_thread(copy)
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def get_async_transport():
+    """
+    Get the process-wide shared async transport
+    الحصول على الناقل غير المتزامن المشترك
+    
+    Returns:
+        AsyncHttpTransport: Shared transport instance
+    """
+    global _default_transport
+    
+    if _default_transport is None:
+        with _default_lock:
+            if _default_transport is None:
+                _default_transport = AsyncHttpTransport()
+    return _default_transport
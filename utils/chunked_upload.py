@@ -0,0 +1,625 @@
+"""
+Chunked Upload Utility
+أداة الرفع المجزأ للملفات
+
+Reads upload chunks straight from memory-mapped files, transfers them with
+bounded parallelism and persists progress so uploads can resume
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from pathlib import Path
+
+from config import Config
+from utils.logger import setup_logger
+from utils.metrics import get_metrics
+
+
+class MappedFile:
+    """Read-only memory-mapped file that hands out zero-copy chunks / ملف معيّن في الذاكرة"""
+    
+    def __init__(self, file_path):
+        """
+        Open and map a file
+        
+        Args:
+            file_path (str): Path to the file
+        """
+        self.path = str(file_path)
+        self._file = open(self.path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+    
+    def read(self, offset, length):
+        """
+        Get a chunk of the file without copying it
+        
+        Args:
+            offset (int): Start offset in bytes
+            length (int): Chunk length in bytes
+        
+        Returns:
+            memoryview: View over the mapped bytes (release it when done)
+        """
+        if self._map is None:
+            return memoryview(b'')
+        end = min(offset + length, self.size)
+        return memoryview(self._map)[offset:end]
+    
+    def evict(self, start, end):
+        """
+        Let the kernel drop the mapped pages of a range this process is done with
+        
+        The data stays in the file; later reads of the range fault it back in.
+        
+        Args:
+            start (int): Range start (rounded down to a page boundary)
+            end (int): Range end
+        """
+        start -= start % mmap.PAGESIZE
+        if self._map is not None and end > start and hasattr(mmap, 'MADV_DONTNEED'):
+            self._map.madvise(mmap.MADV_DONTNEED, start, min(end, self.size) - start)
+    
+    def close(self):
+        """Unmap and close the file"""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# Handle of the shared reader slot held by the current thread, if any
+_local = threading.local()
+
+
+class SharedMediaReader:
+    """One mapping of a file read by several uploads in step / قارئ وسائط مشترك بين عدة منصات"""
+    
+    def __init__(self, file_path, window=None, stall_timeout=None):
+        """
+        Map a file for several destinations
+        
+        Each destination reads through its own handle. A destination more
+        than `window` bytes ahead of the slowest one waits for it, and pages
+        every destination has passed are dropped, so the file is read from
+        disk once and resident memory stays around two windows however large
+        the file is or however many platforms it goes to.
+        
+        A destination that stops reading (hung request, past its deadline)
+        is detached instead of holding up the rest: it keeps reading the
+        mapping at its own pace, but nobody waits for it any more.
+        
+        Args:
+            file_path (str): Path to the file
+            window (int, optional): Bytes the fastest destination may run ahead
+                (defaults to Config.SHARED_READ_WINDOW_MB)
+            stall_timeout (float, optional): Seconds a destination may wait on
+                the slowest one without it moving before the slowest is
+                detached (defaults to Config.SHARED_READ_STALL_TIMEOUT)
+        """
+        self.logger = setup_logger(__name__)
+        self.source = MappedFile(file_path)
+        self.path = str(Path(file_path).resolve())
+        self.size = self.source.size
+        self.window = window or int(Config.SHARED_READ_WINDOW_MB * 1024 * 1024)
+        self.stall_timeout = Config.SHARED_READ_STALL_TIMEOUT if stall_timeout is None else stall_timeout
+        self._positions = {}
+        self._deadlines = {}
+        self._detached = set()
+        self._evicted = 0
+        self._closing = False
+        self._condition = threading.Condition()
+    
+    @contextmanager
+    def consumer(self, timeout=None):
+        """
+        Reserve a destination slot for the calling thread
+        
+        While the block runs, open_media() of this file in the thread returns
+        the slot's handle. The slot counts as the slowest destination until
+        it reads, so others do not run away from it before it starts.
+        
+        Args:
+            timeout (float, optional): Seconds after which the others stop
+                waiting for this slot (e.g. the caller's deadline)
+        
+        Yields:
+            SharedMediaHandle: Handle of the slot
+        """
+        handle = SharedMediaHandle(self)
+        with self._condition:
+            self._positions[handle] = 0
+            if timeout:
+                self._deadlines[handle] = time.monotonic() + timeout
+        previous = getattr(_local, 'handle', None)
+        _local.handle = handle
+        try:
+            yield handle
+        finally:
+            _local.handle = previous
+            handle.close()
+    
+    def wrap(self, call, timeout=None):
+        """
+        Run a callable inside a destination slot
+        
+        Args:
+            call (callable): Upload call taking no arguments
+            timeout (float, optional): Seconds after which the others stop
+                waiting for this call
+        
+        Returns:
+            callable: Wrapped call
+        """
+        def run():
+            with self.consumer(timeout):
+                return call()
+        return run
+    
+    def close(self):
+        """Unmap the file once every destination has finished with it"""
+        with self._condition:
+            self._closing = True
+            self._close_if_idle()
+    
+    def _read(self, handle, offset, length):
+        """Read for a destination, waiting while it is too far ahead of the others"""
+        with self._condition:
+            stalled_at = None
+            # Detached destinations read without waiting
+            while handle in self._positions:
+                now = time.monotonic()
+                for other, deadline in list(self._deadlines.items()):
+                    if now >= deadline:
+                        self._detach(other, 'passed its deadline')
+                
+                others = {other: position for other, position in self._positions.items() if other is not handle}
+                if not others:
+                    break
+                slowest = min(others, key=others.get)
+                if offset <= others[slowest] + self.window:
+                    break
+                
+                # The slowest destination has not moved for stall_timeout: stop waiting for it
+                if stalled_at is None or stalled_at[0] != others[slowest]:
+                    stalled_at = (others[slowest], now)
+                elif now - stalled_at[1] >= self.stall_timeout:
+                    self._detach(slowest, f'stalled for {self.stall_timeout:.0f}s')
+                    continue
+                
+                wait_for = stalled_at[1] + self.stall_timeout - now
+                if self._deadlines:
+                    wait_for = min(wait_for, min(self._deadlines.values()) - now)
+                self._condition.wait(max(wait_for, 0.01))
+            if offset > self._positions.get(handle, offset):
+                self._positions[handle] = offset
+                self._evict()
+                self._condition.notify_all()
+        return self.source.read(offset, length)
+    
+    def _leave(self, handle):
+        """Remove a finished destination"""
+        with self._condition:
+            self._positions.pop(handle, None)
+            self._deadlines.pop(handle, None)
+            self._detached.discard(handle)
+            self._evict()
+            self._condition.notify_all()
+            self._close_if_idle()
+    
+    def _detach(self, handle, reason):
+        """Stop pacing the others on a destination that is not keeping up (with the lock held)"""
+        if self._positions.pop(handle, None) is None:
+            return
+        self._deadlines.pop(handle, None)
+        self._detached.add(handle)
+        self.logger.warning(f"⚠️ Shared read of {Path(self.path).name}: a destination {reason}; not waiting for it")
+        self._evict()
+        self._condition.notify_all()
+    
+    def _evict(self):
+        """Drop pages more than a window behind the slowest destination"""
+        if not self._positions:
+            return
+        end = min(self._positions.values()) - self.window
+        if end > self._evicted:
+            self.source.evict(self._evicted, end)
+            self._evicted = end - end % mmap.PAGESIZE
+    
+    def _close_if_idle(self):
+        # Detached destinations may still be reading the mapping
+        if self._closing and not self._positions and not self._detached:
+            try:
+                self.source.close()
+            except BufferError:
+                # A chunk view is still alive; the mapping goes away with it
+                pass
+
+
+class SharedMediaHandle:
+    """One destination's view of a shared file (MappedFile interface) / منفذ قراءة لمنصة واحدة"""
+    
+    def __init__(self, reader):
+        self.reader = reader
+        self.path = reader.path
+        self.size = reader.size
+        self.closed = False
+    
+    def read(self, offset, length):
+        """
+        Get a chunk of the file without copying it
+        
+        Args:
+            offset (int): Start offset in bytes
+            length (int): Chunk length in bytes
+        
+        Returns:
+            memoryview: View over the mapped bytes (release it when done)
+        """
+        return self.reader._read(self, offset, length)
+    
+    def close(self):
+        """Finish reading; the other destinations no longer wait for this one"""
+        if not self.closed:
+            self.closed = True
+            self.reader._leave(self)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_media(file_path):
+    """
+    Open a file for upload
+    
+    Inside a SharedMediaReader slot for the same file this returns the
+    slot's shared handle; otherwise the file gets its own mapping.
+    
+    Args:
+        file_path (str): Path to the file
+    
+    Returns:
+        MappedFile or SharedMediaHandle: Chunk source
+    """
+    handle = getattr(_local, 'handle', None)
+    if handle is not None and not handle.closed and handle.path == str(Path(file_path).resolve()):
+        return handle
+    return MappedFile(file_path)
+
+
+class UploadStateStore:
+    """Persisted resume state for in-progress uploads / حالة الرفع المحفوظة للاستئناف"""
+    
+    def __init__(self, directory=None):
+        """
+        Initialize state store
+        
+        Args:
+            directory (str, optional): Directory for state files
+                (defaults to Config.UPLOAD_STATE_DIR)
+        """
+        self.directory = Path(directory or Config.UPLOAD_STATE_DIR)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key_for(platform, file_path, *extra):
+        """
+        Build the state key for an upload of a file to a platform
+        
+        The key includes the file size and modification time so a changed
+        file never resumes against a stale session.
+        
+        Args:
+            platform (str): Platform name
+            file_path (str): Path to the uploaded file
+            *extra: Extra values that identify the destination (e.g. page ID)
+        
+        Returns:
+            str: State key
+        """
+        path = Path(file_path).resolve()
+        stat = path.stat()
+        raw = ':'.join(str(part) for part in (platform, path, stat.st_size, stat.st_mtime_ns) + extra)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+    
+    def load(self, key):
+        """
+        Load saved state
+        
+        Args:
+            key (str): State key
+        
+        Returns:
+            dict: Saved state, or None if there is none
+        """
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def save(self, key, state):
+        """
+        Atomically save state
+        
+        Args:
+            key (str): State key
+            state (dict): JSON-serializable state
+        """
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            tmp_path = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+    
+    def delete(self, key):
+        """
+        Remove saved state once an upload has finished
+        
+        Args:
+            key (str): State key
+        """
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+def committed_offset(acked):
+    """
+    Get the end of the contiguous acknowledged prefix of an upload
+    
+    Args:
+        acked (list): Acknowledged [start, end) ranges
+    
+    Returns:
+        int: Number of bytes confirmed from the start of the file
+    """
+    offset = 0
+    for start, end in sorted(acked):
+        if start > offset:
+            break
+        offset = max(offset, end)
+    return offset
+
+
+def merge_ranges(acked, start, end):
+    """
+    Add a [start, end) range to a list of acknowledged ranges
+    
+    Args:
+        acked (list): Acknowledged ranges
+        start (int): Range start
+        end (int): Range end
+    
+    Returns:
+        list: Sorted, merged ranges
+    """
+    merged = []
+    for s, e in sorted(acked + [[start, end]]):
+        if merged and s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    return merged
+
+
+def pending_chunks(size, chunk_size, acked):
+    """
+    List the chunks of a file that still have to be transferred
+    
+    Args:
+        size (int): File size in bytes
+        chunk_size (int): Chunk size in bytes
+        acked (list): Acknowledged [start, end) ranges
+    
+    Returns:
+        list: (start, end) tuples not yet acknowledged
+    """
+    layout = [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+    return unacked_chunks(layout, acked)
+
+
+def unacked_chunks(chunks, acked):
+    """
+    Filter a chunk layout down to the chunks not acknowledged yet
+    
+    Args:
+        chunks (list): (start, end) tuples covering the file
+        acked (list): Acknowledged [start, end) ranges
+    
+    Returns:
+        list: (start, end) tuples not yet acknowledged
+    """
+    return [(start, end) for start, end in chunks
+            if not any(s <= start and end <= e for s, e in acked)]
+
+
+class UploadProgress:
+    """Reports confirmed upload bytes to logs, metrics and a callback / متابعة تقدم الرفع"""
+    
+    def __init__(self, platform, total, logger, callback=None, log_step=10, label=None):
+        """
+        Initialize progress reporter
+        
+        Args:
+            platform (str): Platform name used in logs and metrics
+            total (int): Upload size in bytes
+            logger (logging.Logger): Logger for progress lines
+            callback (callable, optional): Called as callback(confirmed, total)
+            log_step (int): Log every time progress crosses this many percent
+            label (str, optional): Platform name shown in logs (defaults to platform)
+        """
+        self.platform = platform
+        self.label = label or platform
+        self.total = total
+        self.logger = logger
+        self.callback = callback
+        self.log_step = log_step
+        self.confirmed = 0
+        self._logged = 0
+        
+        metrics = get_metrics()
+        self._bytes = metrics.counter(
+            'sma_upload_confirmed_bytes_total', 'Upload bytes confirmed by the platform', ('platform',)
+        )
+        self._resumes = metrics.counter(
+            'sma_upload_resumes_total', 'Uploads continued from saved state', ('platform',)
+        )
+    
+    def resumed(self, offset):
+        """
+        Record an upload continuing from saved state
+        
+        Args:
+            offset (int): Bytes the platform already holds
+        """
+        self._resumes.inc(platform=self.platform)
+        self.confirmed = offset
+        self._logged = self._percent(offset) // self.log_step * self.log_step
+        self.logger.info(f"Resuming {self.label} upload at {offset}/{self.total} bytes")
+        if self.callback:
+            self.callback(offset, self.total)
+    
+    def update(self, confirmed):
+        """
+        Record the bytes confirmed so far
+        
+        Args:
+            confirmed (int): Bytes the platform has confirmed
+        """
+        if confirmed > self.confirmed:
+            self._bytes.inc(confirmed - self.confirmed, platform=self.platform)
+        self.confirmed = confirmed
+        
+        percent = self._percent(confirmed)
+        if percent >= self._logged + self.log_step:
+            self._logged = percent // self.log_step * self.log_step
+            self.logger.info(f"{self.label} upload {percent}% ({confirmed}/{self.total} bytes)")
+        if self.callback:
+            self.callback(confirmed, self.total)
+    
+    def _percent(self, confirmed):
+        return 100 if not self.total else int(confirmed * 100 / self.total)
+
+
+class ChunkedUploader:
+    """Bounded-parallel chunk transfer engine / محرك نقل الأجزاء المتوازي"""
+    
+    def __init__(self, source, chunk_size, max_workers=1, retries=None, on_progress=None):
+        """
+        Initialize chunked uploader
+        
+        Args:
+            source (MappedFile): Chunk source
+            chunk_size (int): Chunk size in bytes
+            max_workers (int): Maximum chunks in flight at once
+            retries (int, optional): Attempts per chunk
+                (defaults to Config.UPLOAD_CHUNK_RETRIES)
+            on_progress (callable, optional): Called as on_progress(acked_ranges)
+                after every acknowledged chunk, e.g. to persist resume state
+        """
+        self.source = source
+        self.chunk_size = chunk_size
+        self.max_workers = max(1, max_workers)
+        self.retries = Config.UPLOAD_CHUNK_RETRIES if retries is None else retries
+        self.on_progress = on_progress
+        self._lock = threading.Lock()
+    
+    def upload(self, send_chunk, acked=None, chunks=None):
+        """
+        Transfer every chunk that is not acknowledged yet
+        
+        At most max_workers chunks are read and in flight at any time, so
+        memory stays bounded regardless of file size.
+        
+        Args:
+            send_chunk (callable): send_chunk(start, end, data) uploads one chunk
+                and raises on failure
+            acked (list, optional): Ranges already acknowledged by the server
+            chunks (list, optional): Explicit (start, end) layout for APIs that
+                fix chunk boundaries (defaults to uniform chunk_size chunks)
+        
+        Returns:
+            list: Acknowledged ranges (covers the whole file on success)
+        """
+        acked = [list(r) for r in (acked or [])]
+        if chunks is None:
+            chunks = pending_chunks(self.source.size, self.chunk_size, acked)
+        else:
+            chunks = unacked_chunks(chunks, acked)
+        
+        if self.max_workers == 1:
+            for start, end in chunks:
+                self._send(send_chunk, start, end)
+                acked = self._ack(acked, start, end)
+            return acked
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='chunk') as executor:
+            pending = {}
+            chunk_iter = iter(chunks)
+            try:
+                while True:
+                    # Keep at most max_workers chunks in flight
+                    while len(pending) < self.max_workers:
+                        chunk = next(chunk_iter, None)
+                        if chunk is None:
+                            break
+                        pending[executor.submit(self._send, send_chunk, *chunk)] = chunk
+                    if not pending:
+                        break
+                    
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        start, end = pending.pop(future)
+                        future.result()
+                        acked = self._ack(acked, start, end)
+            finally:
+                for future in pending:
+                    future.cancel()
+        
+        return acked
+    
+    def _send(self, send_chunk, start, end):
+        """Send one chunk, retrying it on its own before giving up"""
+        attempt = 0
+        while True:
+            attempt += 1
+            data = self.source.read(start, end - start)
+            try:
+                send_chunk(start, end, data)
+                return
+            except Exception:
+                if attempt >= self.retries:
+                    raise
+                time.sleep(min(2 ** attempt, 30))
+            finally:
+                data.release()
+    
+    def _ack(self, acked, start, end):
+        """Record an acknowledged chunk and report progress"""
+        with self._lock:
+            acked = merge_ranges(acked, start, end)
+            if self.on_progress:
+                self.on_progress(acked)
+        return acked
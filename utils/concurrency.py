@@ -0,0 +1,400 @@
+"""
+Adaptive Concurrency Utility
+أداة التحكم التكيفي في التزامن
+
+AIMD limits on the requests in flight per platform and endpoint: raised
+while calls succeed, cut on throttling, server errors, timeouts and rising
+latency, so each endpoint settles near the most it can sustain
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import requests
+
+from config import Config
+from utils.metrics import get_metrics
+from utils.rate_limiter import APP_THROTTLE_CODES, TOKEN_THROTTLE_CODES, PAGE_THROTTLE_CODES
+from utils.retry import _graph_error
+
+
+# Graph API codes that mean the caller is sending too much
+THROTTLE_CODES = APP_THROTTLE_CODES | TOKEN_THROTTLE_CODES | PAGE_THROTTLE_CODES
+
+# Call outcomes / نتائج الطلبات
+SUCCESS = 'success'
+DROPPED = 'dropped'
+IGNORED = 'ignored'
+
+# Recent latency is an average of the last calls; the baseline it is compared
+# to is the fastest call of the last two windows of BASELINE_WINDOW seconds
+# (the no-load round trip)
+SHORT_WEIGHT = 0.2
+BASELINE_WINDOW = 60
+# Round trips at the initial limit ignored by the latency check (connection setup)
+WARMUP_ROUND_TRIPS = 2
+
+
+def endpoint_of(url):
+    """
+    Endpoint name of a URL: its path without versions and IDs
+    
+    Args:
+        url (str): Request URL
+    
+    Returns:
+        str: e.g. 'feed' for https://graph.facebook.com/v18.0/123/feed
+    """
+    words = [segment for segment in urlparse(url).path.split('/')
+             if segment and not any(char.isdigit() for char in segment)]
+    return '/'.join(words[:4]) or '/'
+
+
+def classify(response=None, error=None):
+    """
+    Decide what a call says about the load on its endpoint
+    
+    Args:
+        response (requests.Response, optional): Response received
+        error (Exception, optional): Exception raised instead of a response
+    
+    Returns:
+        str: DROPPED for throttling, 5xx, timeouts and dropped connections;
+            SUCCESS for other responses below 400; IGNORED otherwise
+    """
+    if error is not None:
+        if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+            return DROPPED
+        return IGNORED
+    if response is None:
+        return IGNORED
+    if response.status_code == 429 or response.status_code >= 500:
+        return DROPPED
+    if response.status_code >= 400:
+        graph_error = _graph_error(response)
+        if graph_error and graph_error.get('code') in THROTTLE_CODES:
+            return DROPPED
+        return IGNORED
+    return SUCCESS
+
+
+def _expire(waiter):
+    if not waiter.done():
+        waiter.set_result(False)
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit of one endpoint / حد تزامن تكيفي لنقطة واحدة"""
+    
+    def __init__(self, name, initial=None, min_limit=None, max_limit=None, backoff=None,
+                 latency_tolerance=None, max_wait=None):
+        """
+        Initialize adaptive limit
+        
+        The limit grows by one per successful call until the first sign of
+        congestion (slow start), then by one per limit's worth of successful
+        calls. Congestion - a dropped call, or recent latency above
+        latency_tolerance times the fastest recent call - multiplies it by
+        backoff, at most once per round trip. Growth and the latency check
+        only apply while at least half of the limit is in use.
+        
+        Args:
+            name (str): "platform:endpoint" label
+            initial (int, optional): Starting limit (defaults to Config.ADAPTIVE_INITIAL_LIMIT)
+            min_limit (int, optional): Lowest limit (defaults to Config.ADAPTIVE_MIN_LIMIT)
+            max_limit (int, optional): Highest limit (defaults to Config.ADAPTIVE_MAX_LIMIT)
+            backoff (float, optional): Factor applied on congestion
+                (defaults to Config.ADAPTIVE_BACKOFF)
+            latency_tolerance (float, optional): Latency increase over the
+                fastest recent call treated as congestion
+                (defaults to Config.ADAPTIVE_LATENCY_TOLERANCE)
+            max_wait (float, optional): Longest a call waits for a slot before
+                going ahead anyway, so calls that depend on each other cannot
+                deadlock on the limit (defaults to Config.ADAPTIVE_MAX_WAIT)
+        """
+        self.name = name
+        self.min_limit = min_limit or Config.ADAPTIVE_MIN_LIMIT
+        self.max_limit = max(self.min_limit, max_limit or Config.ADAPTIVE_MAX_LIMIT)
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial or Config.ADAPTIVE_INITIAL_LIMIT)))
+        self.warmup = int(self.limit) * WARMUP_ROUND_TRIPS
+        self.threshold = float(self.max_limit)
+        self.backoff = backoff or Config.ADAPTIVE_BACKOFF
+        self.latency_tolerance = latency_tolerance or Config.ADAPTIVE_LATENCY_TOLERANCE
+        self.max_wait = Config.ADAPTIVE_MAX_WAIT if max_wait is None else max_wait
+        
+        self.in_flight = 0
+        self.short_latency = None
+        self.baseline = None
+        self._window_min = None
+        self._previous_min = None
+        self._window_started = time.monotonic()
+        self.samples = 0
+        self.drops = 0
+        self.overflows = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self._waiters = deque()
+    
+    def _try_acquire(self):
+        """Take a slot if one is free (with the lock held)"""
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+    
+    def acquire(self):
+        """
+        Wait for a free slot
+        
+        Returns:
+            float: Seconds waited
+        """
+        started = time.monotonic()
+        deadline = started + self.max_wait
+        with self._condition:
+            while not self._try_acquire():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.in_flight += 1
+                    self.overflows += 1
+                    break
+                self._condition.wait(remaining)
+        return time.monotonic() - started
+    
+    async def acquire_async(self):
+        """
+        Wait for a free slot without blocking the event loop
+        
+        Returns:
+            float: Seconds waited
+        """
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        with self._condition:
+            if self._try_acquire():
+                return 0.0
+            # Released slots are handed to waiting coroutines in order
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        
+        timer = loop.call_later(self.max_wait, _expire, waiter)
+        try:
+            granted = await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                self._return_slot()
+            raise
+        finally:
+            timer.cancel()
+        
+        if not granted:
+            with self._condition:
+                self.in_flight += 1
+                self.overflows += 1
+        return time.monotonic() - started
+    
+    def release(self, latency, outcome):
+        """
+        Free a slot and adjust the limit to the call's outcome
+        
+        Args:
+            latency (float): Seconds the call took
+            outcome (str): SUCCESS, DROPPED or IGNORED (see classify)
+        """
+        with self._condition:
+            used = self.in_flight
+            self.in_flight -= 1
+            
+            # Slow calls only count against the limit while it is in use;
+            # with few calls in flight the delay is not ours to fix
+            busy = used * 2 >= self.limit
+            congested = outcome == DROPPED
+            if outcome == SUCCESS:
+                congested = self._observe_latency(latency) and busy
+            
+            if congested:
+                self._decrease()
+            elif outcome == SUCCESS and busy:
+                self._increase()
+            self._notify()
+    
+    def _observe_latency(self, latency):
+        """Update the latency averages; True if recent calls are much slower than the baseline"""
+        if self.short_latency is None:
+            self.short_latency = latency
+        else:
+            self.short_latency += (latency - self.short_latency) * SHORT_WEIGHT
+        
+        # Windowed minimum, so the baseline follows a lasting change in the endpoint
+        self._window_min = latency if self._window_min is None else min(self._window_min, latency)
+        self.baseline = self._window_min if self._previous_min is None else min(self._window_min, self._previous_min)
+        self.samples += 1
+        now = time.monotonic()
+        if now - self._window_started >= BASELINE_WINDOW:
+            self._previous_min, self._window_min = self._window_min, None
+            self._window_started = now
+        
+        return self.samples > self.warmup and self.short_latency > self.baseline * self.latency_tolerance
+    
+    def _increase(self):
+        if self.limit < self.threshold:
+            self.limit += 1
+        else:
+            self.limit += 1 / self.limit
+        self.limit = min(float(self.max_limit), self.limit)
+    
+    def _decrease(self):
+        now = time.monotonic()
+        # One cut per round trip: calls already in flight saw the same congestion
+        if now - self._last_decrease < (self.short_latency or 0):
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        self.threshold = self.limit
+        self.drops += 1
+    
+    def _notify(self):
+        """Hand free slots to waiting coroutines, then wake waiting threads (with the lock held)"""
+        free = int(self.limit) - self.in_flight
+        if free <= 0:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        while free > 0 and self._waiters:
+            loop, waiter = self._waiters.popleft()
+            if waiter.done():
+                # Gave up waiting
+                continue
+            if loop is running:
+                waiter.set_result(True)
+            else:
+                try:
+                    loop.call_soon_threadsafe(self._deliver, waiter)
+                except RuntimeError:
+                    # The waiter's loop is closed
+                    continue
+            self.in_flight += 1
+            free -= 1
+        if free > 0:
+            self._condition.notify(free)
+    
+    def _deliver(self, waiter):
+        """Give a slot reserved by another thread to a coroutine (on its event loop)"""
+        if waiter.done():
+            self._return_slot()
+        else:
+            waiter.set_result(True)
+    
+    def _return_slot(self):
+        """Give back a slot handed to a coroutine that stopped waiting"""
+        with self._condition:
+            self.in_flight -= 1
+            self._notify()
+    
+    def status(self):
+        """
+        Current limit state
+        
+        Returns:
+            dict: limit, in_flight, latency_ms, baseline_ms, drops and overflows
+        """
+        with self._condition:
+            return {
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'latency_ms': round(self.short_latency * 1000, 1) if self.short_latency is not None else None,
+                'baseline_ms': round(self.baseline * 1000, 1) if self.baseline is not None else None,
+                'drops': self.drops,
+                'overflows': self.overflows
+            }
+
+
+class ConcurrencyLimiter:
+    """Adaptive concurrency limits per platform and endpoint / حدود التزامن لكل منصة ونقطة"""
+    
+    def __init__(self, metrics=None, **limit_options):
+        """
+        Initialize concurrency limiter
+        
+        Args:
+            metrics (MetricsRegistry, optional): Where the current limits are
+                exported (defaults to the shared registry)
+            **limit_options: AdaptiveLimit options (initial, min_limit,
+                max_limit, backoff, latency_tolerance, max_wait)
+        """
+        self.limit_options = limit_options
+        self._limits = {}
+        self._lock = threading.Lock()
+        (metrics or get_metrics()).add_collector(self._collect_metrics)
+    
+    def limit_for(self, platform, url):
+        """
+        Get the limit of a request's platform and endpoint
+        
+        Args:
+            platform (str): Platform name
+            url (str): Request URL
+        
+        Returns:
+            AdaptiveLimit: Limit to acquire before the request
+        """
+        key = (platform, endpoint_of(url))
+        limit = self._limits.get(key)
+        if limit is None:
+            with self._lock:
+                limit = self._limits.get(key)
+                if limit is None:
+                    limit = AdaptiveLimit(':'.join(key), **self.limit_options)
+                    self._limits[key] = limit
+        return limit
+    
+    def _collect_metrics(self, registry):
+        """Refresh the limit gauges before metrics are exported"""
+        limit_gauge = registry.gauge(
+            'sma_concurrency_limit', 'Adaptive concurrency limit by platform and endpoint', ('platform', 'endpoint')
+        )
+        in_flight_gauge = registry.gauge(
+            'sma_concurrency_in_flight', 'Requests holding a concurrency slot', ('platform', 'endpoint')
+        )
+        with self._lock:
+            limits = list(self._limits.items())
+        for (platform, endpoint), limit in limits:
+            status = limit.status()
+            limit_gauge.set(status['limit'], platform=platform, endpoint=endpoint)
+            in_flight_gauge.set(status['in_flight'], platform=platform, endpoint=endpoint)
+    
+    def status(self):
+        """
+        Snapshot of every endpoint's limit
+        
+        Returns:
+            dict: {"platform:endpoint": AdaptiveLimit.status()}
+        """
+        with self._lock:
+            limits = list(self._limits.values())
+        return {limit.name: limit.status() for limit in limits}
+
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_concurrency_limiter():
+    """
+    Get the process-wide concurrency limiter
+    
+    Returns:
+        ConcurrencyLimiter: Shared limiter
+    """
+    global _default_limiter
+    
+    if _default_limiter is None:
+        with _default_lock:
+            if _default_limiter is None:
+                _default_limiter = ConcurrencyLimiter()
+    return _default_limiter
@@ -0,0 +1,368 @@
+"""
+Container Poller Utility
+أداة متابعة حاويات الوسائط
+
+Tracks media that is still processing on the platform (Instagram
+containers, TikTok publish jobs), checks its status in batched requests
+with backoff, and finishes each item as soon as it is ready
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from config import Config
+from utils.http_client import get_transport
+from utils.logger import setup_logger
+from utils.metrics import get_metrics
+from utils.retry import _graph_error
+
+
+# Container status codes / حالات الحاوية
+READY_STATES = ('FINISHED', 'PUBLISHED')
+FAILED_STATES = ('ERROR', 'EXPIRED')
+
+# Containers due within this many seconds (and within a quarter of their own
+# interval) are checked early, in the same request as the containers due now
+COALESCE_WINDOW = 1.0
+
+# Graph API limit on IDs per ?ids= lookup
+MAX_BATCH_SIZE = 50
+
+# Graph error code for an ID that is invalid or no longer exists
+MISSING_OBJECT_CODE = 100
+
+# Display names used in result dicts
+PLATFORM_NAMES = {'instagram': 'Instagram', 'tiktok': 'TikTok'}
+
+
+class _Pending:
+    """A container waiting to finish processing"""
+    
+    def __init__(self, container_id, access_token, on_ready, rate_key, interval, deadline, platform, fetch):
+        self.container_id = container_id
+        self.access_token = access_token
+        self.on_ready = on_ready
+        self.rate_key = rate_key
+        self.fetch = fetch
+        self.interval = interval
+        self.deadline = deadline
+        self.platform = platform
+        self.polls = 0
+        self.status = {}
+        self.future = Future()
+
+
+class ContainerPoller:
+    """Shared non-blocking container status poller / متابع حالة الحاويات"""
+    
+    def __init__(self, transport=None, graph_url=None, interval=None, max_interval=None,
+                 backoff=None, timeout=None, batch_size=None, publish_workers=None):
+        """
+        Initialize poller
+        
+        Args:
+            transport (HttpTransport, optional): HTTP transport
+                (defaults to the process-wide transport)
+            graph_url (str, optional): Graph API base URL
+                (defaults to Config.INSTAGRAM_GRAPH_URL)
+            interval (float, optional): Seconds before a container's first check
+                (defaults to Config.POLL_INTERVAL)
+            max_interval (float, optional): Longest wait between checks
+                (defaults to Config.POLL_MAX_INTERVAL)
+            backoff (float, optional): Factor applied to the wait after each
+                unfinished check (defaults to Config.POLL_BACKOFF)
+            timeout (float, optional): Seconds before a container is given up on
+                (defaults to Config.POLL_TIMEOUT)
+            batch_size (int, optional): Containers per status request
+                (defaults to Config.POLL_BATCH, at most 50)
+            publish_workers (int, optional): Threads running the on-ready callbacks
+                (defaults to Config.POLL_PUBLISH_WORKERS)
+        """
+        self.logger = setup_logger(__name__)
+        self.transport = transport or get_transport()
+        self.graph_url = (graph_url or Config.INSTAGRAM_GRAPH_URL).rstrip('/')
+        self.interval = Config.POLL_INTERVAL if interval is None else interval
+        self.max_interval = max_interval or Config.POLL_MAX_INTERVAL
+        self.backoff = backoff or Config.POLL_BACKOFF
+        self.timeout = timeout or Config.POLL_TIMEOUT
+        self.batch_size = min(batch_size or Config.POLL_BATCH, MAX_BATCH_SIZE)
+        self.publish_workers = publish_workers or Config.POLL_PUBLISH_WORKERS
+        
+        self._heap = []
+        self._order = itertools.count()
+        self._count = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._executor = None
+        
+        metrics = get_metrics()
+        self._pending_gauge = metrics.gauge(
+            'sma_containers_pending', 'Media containers waiting to finish processing', ('platform',)
+        )
+        self._outcomes = metrics.counter(
+            'sma_containers_total', 'Media containers by final outcome', ('platform', 'outcome')
+        )
+        self._checks = metrics.counter(
+            'sma_container_status_requests_total', 'Batched container status requests', ('platform',)
+        )
+    
+    def submit(self, container_id, access_token, on_ready, rate_key=None, delay=None,
+               platform='instagram', fetch=None):
+        """
+        Track a container and publish it once it has finished processing
+        متابعة حاوية ونشرها عند جاهزيتها
+        
+        Args:
+            container_id (str): Container (creation) ID
+            access_token (str): Token allowed to read the container
+            on_ready (callable): Called as on_ready(container_id, status) when
+                it is ready; its return value becomes the future's result
+            rate_key (tuple, optional): Rate limiter key for status checks
+                (defaults to (platform, access_token, None))
+            delay (float, optional): Seconds before the first check
+                (defaults to the poller's interval)
+            platform (str): Platform name used in results and metrics
+            fetch (callable, optional): fetch(access_token, rate_key, ids)
+                returning {id: {'status_code', 'status'}} with Graph status
+                codes (defaults to a batched Graph ?ids= lookup)
+        
+        Returns:
+            Future: Resolves to on_ready's result, or to a failed result dict
+                if the container errors, expires or times out
+        """
+        now = time.monotonic()
+        item = _Pending(
+            container_id, access_token, on_ready, rate_key or (platform, access_token, None),
+            max(self.interval, 0.01), now + self.timeout, platform, fetch or self.fetch_graph
+        )
+        
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Container poller is closed")
+            self._schedule(item, now + (self.interval if delay is None else delay))
+            self._count += 1
+            self._pending_gauge.set(self._count, platform=platform)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='container-poller', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        
+        return item.future
+    
+    def pending(self):
+        """
+        Count containers still being tracked
+        
+        Returns:
+            int: Pending containers
+        """
+        with self._condition:
+            return self._count
+    
+    def close(self, wait=True):
+        """
+        Stop polling; containers still pending are failed
+        
+        Args:
+            wait (bool): Wait for running publish callbacks to finish
+        """
+        with self._condition:
+            self._closed = True
+            items = [entry[2] for entry in self._heap]
+            self._heap = []
+            self._condition.notify()
+        for item in items:
+            self._fail(item, 'Poller closed before the container was ready')
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+    
+    def _schedule(self, item, due):
+        """Queue an item for its next check (caller holds the condition)"""
+        heapq.heappush(self._heap, (due, next(self._order), item))
+    
+    def _take_due(self):
+        """
+        Wait until at least one container is due, then take every container
+        due within COALESCE_WINDOW
+        
+        Returns:
+            list: Due items, or None once the poller is closed
+        """
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+                if self._heap:
+                    wait_for = self._heap[0][0] - time.monotonic()
+                    if wait_for <= 0:
+                        break
+                    self._condition.wait(wait_for)
+                else:
+                    self._condition.wait()
+            
+            now = time.monotonic()
+            due = []
+            while self._heap:
+                due_at, _, item = self._heap[0]
+                if due_at > now + min(COALESCE_WINDOW, item.interval / 4):
+                    break
+                due.append(heapq.heappop(self._heap)[2])
+            return due
+    
+    def _run(self):
+        """Poller loop"""
+        while True:
+            due = self._take_due()
+            if due is None:
+                return
+            
+            # One status request per fetcher, token and rate key, up to batch_size items each
+            groups = {}
+            for item in due:
+                groups.setdefault((item.fetch, item.access_token, item.rate_key), []).append(item)
+            for (fetch, access_token, rate_key), items in groups.items():
+                for i in range(0, len(items), self.batch_size):
+                    self._check(fetch, access_token, rate_key, items[i:i + self.batch_size])
+    
+    def fetch_graph(self, access_token, rate_key, container_ids):
+        """
+        Look up the status of many Graph containers in one request
+        
+        Args:
+            access_token (str): Token allowed to read the containers
+            rate_key (tuple): Rate limiter key
+            container_ids (list): Container IDs
+        
+        Returns:
+            dict: container ID -> {'status_code', 'status'}
+        """
+        params = {
+            'ids': ','.join(container_ids),
+            'fields': 'status_code,status'
+        }
+        # The token goes in a header: request errors quote the URL, and get logged
+        headers = {'Authorization': f'Bearer {access_token}'}
+        response = self.transport.get(f"{self.graph_url}/", params=params, headers=headers, limit=rate_key)
+        response.raise_for_status()
+        return response.json()
+    
+    def _fetch(self, fetch, access_token, rate_key, container_ids):
+        """
+        Fetch container statuses, splitting the batch if Graph rejects it
+        
+        Graph fails a whole ?ids= lookup when one ID is invalid or deleted,
+        so a batch rejected for a bad ID is halved until the bad IDs are
+        isolated, and those get an ERROR status. Any other error (throttling,
+        an expired token) applies to the whole batch and is raised.
+        """
+        try:
+            return fetch(access_token, rate_key, container_ids)
+        except requests.exceptions.HTTPError as e:
+            graph_error = _graph_error(e.response) if e.response is not None else None
+            if not graph_error or graph_error.get('code') != MISSING_OBJECT_CODE:
+                raise
+            if len(container_ids) == 1:
+                return {container_ids[0]: {'status_code': 'ERROR', 'status': graph_error.get('message', 'Invalid container')}}
+            
+            middle = len(container_ids) // 2
+            statuses = self._fetch(fetch, access_token, rate_key, container_ids[:middle])
+            statuses.update(self._fetch(fetch, access_token, rate_key, container_ids[middle:]))
+            return statuses
+    
+    def _check(self, fetch, access_token, rate_key, items):
+        """Fetch the status of a batch of containers and act on each"""
+        self._checks.inc(platform=rate_key[0])
+        
+        try:
+            statuses = self._fetch(fetch, access_token, rate_key, [item.container_id for item in items])
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.logger.warning(f"⚠️ Container status check failed for {len(items)} containers: {e}")
+            statuses = {}
+        
+        now = time.monotonic()
+        for item in items:
+            item.polls += 1
+            status = statuses.get(item.container_id) or {}
+            code = status.get('status_code')
+            item.status = status
+            
+            if code in READY_STATES:
+                self._publish(item)
+            elif code in FAILED_STATES:
+                self.logger.error(f"✗ Container {item.container_id} {code}: {status.get('status', '')}")
+                self._fail(item, status.get('status') or f'Container {code}', outcome=code.lower())
+            elif now >= item.deadline:
+                self._fail(item, f'Container not ready after {self.timeout:.0f}s', outcome='timeout')
+            else:
+                # Still processing: wait longer before the next check
+                item.interval = min(item.interval * self.backoff, self.max_interval)
+                with self._condition:
+                    closed = self._closed
+                    if not closed:
+                        self._schedule(item, min(now + item.interval, item.deadline))
+                if closed:
+                    self._fail(item, 'Poller closed before the container was ready')
+    
+    def _publish(self, item):
+        """Run the on-ready callback on the publish executor"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.publish_workers, thread_name_prefix='container-publish'
+            )
+        try:
+            self._executor.submit(self._finish, item)
+        except RuntimeError:
+            # Executor shut down by close()
+            self._fail(item, 'Poller closed before the container was published')
+    
+    def _finish(self, item):
+        try:
+            result = item.on_ready(item.container_id, item.status)
+        except Exception as e:
+            self.logger.error(f"✗ Publishing container {item.container_id} raised an error: {e}")
+            self._fail(item, str(e))
+            return
+        
+        success = isinstance(result, dict) and result.get('success')
+        self._done(item, 'published' if success else 'publish_failed')
+        item.future.set_result(result)
+    
+    def _fail(self, item, error, outcome='failed'):
+        self._done(item, outcome)
+        item.future.set_result({
+            'success': False,
+            'error': error,
+            'container_id': item.container_id,
+            'platform': PLATFORM_NAMES.get(item.platform, item.platform.capitalize())
+        })
+    
+    def _done(self, item, outcome):
+        with self._condition:
+            self._count -= 1
+            self._pending_gauge.set(self._count, platform=item.platform)
+        self._outcomes.inc(platform=item.platform, outcome=outcome)
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def get_container_poller():
+    """
+    Get the process-wide container poller
+    
+    Returns:
+        ContainerPoller: Shared poller
+    """
+    global _poller
+    
+    if _poller is None:
+        with _poller_lock:
+            if _poller is None:
+                _poller = ContainerPoller()
+    return _poller
@@ -0,0 +1,599 @@
+"""
+Credential Manager Utility
+أداة إدارة بيانات الاعتماد
+
+Keeps platform access tokens in memory, refreshes them in the background
+before they expire and coordinates refreshes between processes with a file
+lock, so only one process refreshes a token and the others pick up its result
+"""
+
+import calendar
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import pickle
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import requests
+from config import Config
+from utils.http_client import get_transport
+from utils.logger import setup_logger
+from utils.metrics import get_metrics
+
+
+# Tokens this close to expiry are refreshed in the caller's thread instead of
+# waiting for the background refresh
+EXPIRY_SKEW = 30
+
+# Seconds before a failed background refresh is tried again
+RETRY_DELAY = 60
+
+
+def fingerprint(secret):
+    """Short stable ID for a secret, safe to use in keys and logs"""
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()[:16]
+
+
+def _describe(error):
+    """Describe a refresh error without the request URL or body, which hold secrets"""
+    if isinstance(error, requests.exceptions.RequestException):
+        response = getattr(error, 'response', None)
+        if response is not None:
+            return f"HTTP {response.status_code}"
+        return type(error).__name__
+    return str(error)
+
+
+class Token:
+    """Access token with its expiry / رمز وصول مع وقت انتهائه"""
+    
+    __slots__ = ('value', 'expires_at', 'data')
+    
+    def __init__(self, value, expires_at=None, data=None):
+        """
+        Initialize token
+        
+        Args:
+            value (str): Access token
+            expires_at (float, optional): Expiry as a Unix timestamp (None = never)
+            data (dict, optional): Extra values needed to refresh it (e.g. refresh_token)
+        """
+        self.value = value
+        self.expires_at = expires_at
+        self.data = data or {}
+    
+    @classmethod
+    def from_response(cls, data, extra=None):
+        """Build a token from an OAuth response with access_token and expires_in"""
+        expires_in = data.get('expires_in')
+        expires_at = time.time() + float(expires_in) if expires_in else None
+        return cls(data['access_token'], expires_at, extra)
+    
+    def to_dict(self):
+        return {'access_token': self.value, 'expires_at': self.expires_at, 'data': self.data}
+    
+    @classmethod
+    def from_dict(cls, entry):
+        return cls(entry['access_token'], entry.get('expires_at'), entry.get('data'))
+
+
+class FileLock:
+    """Exclusive lock on a file, shared between processes / قفل ملف بين العمليات"""
+    
+    def __init__(self, path):
+        """
+        Initialize lock
+        
+        Args:
+            path (str): Lock file path (created if missing)
+        """
+        self.path = Path(path)
+        self._file = None
+    
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a+')
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+def _write_private(path, payload):
+    """Atomically write a file readable only by its owner"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+class CredentialStore:
+    """JSON file of refreshed tokens shared by every process / مخزن الرموز المشترك"""
+    
+    def __init__(self, path=None):
+        """
+        Initialize store
+        
+        Args:
+            path (str, optional): Store file (defaults to Config.CREDENTIAL_STORE)
+        """
+        self.path = Path(path or Config.CREDENTIAL_STORE)
+        self.lock_path = f'{self.path}.lock'
+    
+    def load(self, key):
+        """
+        Read a token
+        
+        Args:
+            key (str): Credential key
+        
+        Returns:
+            Token: Stored token, or None
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entry = json.load(f).get(key)
+        except (FileNotFoundError, ValueError):
+            return None
+        return Token.from_dict(entry) if entry else None
+    
+    def save(self, key, token):
+        """
+        Write a token (call with the store's lock held)
+        
+        Args:
+            key (str): Credential key
+            token (Token): Token to store
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            entries = {}
+        entries[key] = token.to_dict()
+        _write_private(self.path, json.dumps(entries, indent=2).encode('utf-8'))
+
+
+class StaticTokenSource:
+    """Token that is never refreshed / رمز ثابت"""
+    
+    lock_path = None
+    
+    def __init__(self, platform, access_token):
+        """
+        Initialize source
+        
+        Args:
+            platform (str): Platform name
+            access_token (str): Access token
+        """
+        self.platform = platform
+        self.key = f'{platform}:{fingerprint(access_token)}'
+        self._token = Token(access_token)
+    
+    def load(self):
+        return self._token
+    
+    def refresh(self, token):
+        return self._token
+    
+    def save(self, token):
+        pass
+
+
+class GraphTokenSource:
+    """Long-lived Facebook/Instagram token renewed with fb_exchange_token / رمز جراف طويل الأمد"""
+    
+    def __init__(self, platform, access_token, graph_url, app_id, app_secret, store=None):
+        """
+        Initialize source
+        
+        Args:
+            platform (str): 'facebook' or 'instagram'
+            access_token (str): Configured long-lived token
+            graph_url (str): Graph API base URL
+            app_id (str): App ID used for the exchange
+            app_secret (str): App secret used for the exchange
+            store (CredentialStore, optional): Shared token store
+        """
+        self.platform = platform
+        self.key = f'{platform}:{fingerprint(access_token)}'
+        self.graph_url = graph_url.rstrip('/')
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.store = store or CredentialStore()
+        self.lock_path = self.store.lock_path
+        self._seed = access_token
+    
+    def load(self):
+        """Read the latest exchanged token; None until the first exchange"""
+        return self.store.load(self.key)
+    
+    def fallback(self):
+        """The configured token, used while the first exchange keeps failing"""
+        return Token(self._seed)
+    
+    def refresh(self, token):
+        """Exchange the current token for a fresh long-lived one"""
+        # Sent as a form body: query strings end up in error messages and logs
+        response = get_transport().post(
+            f"{self.graph_url}/oauth/access_token",
+            data={
+                'grant_type': 'fb_exchange_token',
+                'client_id': self.app_id,
+                'client_secret': self.app_secret,
+                'fb_exchange_token': token.value if token else self._seed
+            },
+            idempotent=True
+        )
+        response.raise_for_status()
+        return Token.from_response(response.json())
+    
+    def save(self, token):
+        self.store.save(self.key, token)
+
+
+class TikTokTokenSource:
+    """TikTok access token renewed with its refresh token / رمز تيك توك المتجدد"""
+    
+    def __init__(self, access_token, refresh_token, client_key, client_secret, api_url=None, store=None):
+        """
+        Initialize source
+        
+        Args:
+            access_token (str): Configured access token
+            refresh_token (str): Configured refresh token
+            client_key (str): App client key
+            client_secret (str): App client secret
+            api_url (str, optional): API base URL (defaults to Config.TIKTOK_API_URL)
+            store (CredentialStore, optional): Shared token store
+        """
+        self.platform = 'tiktok'
+        self.key = f'tiktok:{fingerprint(refresh_token)}'
+        self.client_key = client_key
+        self.client_secret = client_secret
+        self.api_url = (api_url or Config.TIKTOK_API_URL).rstrip('/')
+        self.store = store or CredentialStore()
+        self.lock_path = self.store.lock_path
+        self._seed = Token(access_token, None, {'refresh_token': refresh_token})
+    
+    def load(self):
+        """
+        Read the latest token; the configured one has an unknown expiry, so it
+        is refreshed once before the first refresh is on record
+        """
+        return self.store.load(self.key)
+    
+    def refresh(self, token):
+        """Redeem the refresh token; TikTok rotates it, so the new one is kept"""
+        refresh_token = (token or self._seed).data.get('refresh_token') or self._seed.data['refresh_token']
+        response = get_transport().post(
+            f"{self.api_url}/v2/oauth/token/",
+            data={
+                'client_key': self.client_key,
+                'client_secret': self.client_secret,
+                'grant_type': 'refresh_token',
+                'refresh_token': refresh_token
+            }
+        )
+        response.raise_for_status()
+        data = response.json()
+        if 'access_token' not in data:
+            raise ValueError(f"TikTok token refresh failed: {data.get('error_description') or data}")
+        return Token.from_response(data, {'refresh_token': data.get('refresh_token') or refresh_token})
+    
+    def save(self, token):
+        self.store.save(self.key, token)
+
+
+class GoogleTokenSource:
+    """Google OAuth credentials kept in a pickle file / بيانات اعتماد جوجل"""
+    
+    def __init__(self, credentials_file, client_secrets_file=None, scopes=None, credentials=None):
+        """
+        Initialize source
+        
+        Args:
+            credentials_file (str): Pickled credentials shared by every process
+            client_secrets_file (str, optional): Client secrets for the
+                first authorization when there are no saved credentials
+            scopes (list, optional): OAuth scopes requested on authorization
+            credentials (google.auth.credentials.Credentials, optional):
+                Credentials to use while the file does not exist
+        """
+        self.platform = 'youtube'
+        self.credentials_file = str(Path(credentials_file).resolve())
+        self.key = f'youtube:{self.credentials_file}'
+        self.lock_path = f'{self.credentials_file}.lock'
+        self.client_secrets_file = client_secrets_file
+        self.scopes = scopes or []
+        self.credentials = credentials
+    
+    def _token(self):
+        expiry = getattr(self.credentials, 'expiry', None)
+        # google-auth keeps expiry as a naive UTC datetime
+        expires_at = calendar.timegm(expiry.timetuple()) if expiry else None
+        return Token(self.credentials.token, expires_at)
+    
+    def load(self):
+        """Read the credentials file (written by whichever process refreshed last)"""
+        if os.path.exists(self.credentials_file):
+            with open(self.credentials_file, 'rb') as f:
+                self.credentials = pickle.load(f)
+        if self.credentials is None or not self.credentials.token:
+            return None
+        return self._token()
+    
+    def refresh(self, token):
+        """Refresh the credentials, or run the authorization flow if there are none"""
+        # Imported here so platforms without Google accounts do not need google-auth
+        from google.auth.transport.requests import Request
+        
+        if self.credentials is not None and getattr(self.credentials, 'refresh_token', None):
+            self.credentials.refresh(Request())
+        elif self.client_secrets_file and os.path.exists(self.client_secrets_file):
+            from google_auth_oauthlib.flow import InstalledAppFlow
+            flow = InstalledAppFlow.from_client_secrets_file(self.client_secrets_file, self.scopes)
+            self.credentials = flow.run_local_server(port=0)
+        else:
+            raise ValueError("YouTube credentials are missing in configuration")
+        return self._token()
+    
+    def save(self, token):
+        _write_private(self.credentials_file, pickle.dumps(self.credentials))
+
+
+class CredentialManager:
+    """In-memory token cache with background refresh / مدير بيانات الاعتماد"""
+    
+    def __init__(self, refresh_margin=None):
+        """
+        Initialize manager
+        
+        Args:
+            refresh_margin (float, optional): Seconds before expiry at which tokens
+                are refreshed in the background (defaults to Config.CREDENTIAL_REFRESH_MARGIN)
+        """
+        self.logger = setup_logger(__name__)
+        self.refresh_margin = Config.CREDENTIAL_REFRESH_MARGIN if refresh_margin is None else refresh_margin
+        
+        self._sources = {}
+        self._tokens = {}
+        # Keys serving a fallback token until their first refresh succeeds
+        self._stale = set()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._heap = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        
+        self._refreshes = get_metrics().counter(
+            'sma_credential_refreshes_total', 'Token refreshes by platform and outcome',
+            ('platform', 'outcome')
+        )
+    
+    def register(self, source):
+        """
+        Add a token source and load its token
+        تسجيل مصدر رمز
+        
+        Registering the same key again reuses the cached token.
+        
+        Args:
+            source: Token source (StaticTokenSource, GraphTokenSource, ...)
+        
+        Returns:
+            str: Credential key to pass to token()
+        """
+        with self._lock:
+            if source.key in self._sources:
+                return source.key
+            self._sources[source.key] = source
+            self._key_locks[source.key] = threading.Lock()
+        
+        try:
+            token = source.load()
+            if token is None or self._expiring(token):
+                self._refresh(source.key)
+            else:
+                self._set(source.key, token)
+        except Exception:
+            with self._lock:
+                self._sources.pop(source.key, None)
+                self._key_locks.pop(source.key, None)
+            raise
+        return source.key
+    
+    def token(self, key):
+        """
+        Get a usable access token
+        الحصول على رمز وصول صالح
+        
+        Normally a dictionary lookup; the token is only refreshed in this
+        thread if the background refresh has not kept up.
+        
+        Args:
+            key (str): Credential key returned by register()
+        
+        Returns:
+            str: Access token
+        """
+        value = self.cached(key)
+        return value if value is not None else self._refresh(key).value
+    
+    def cached(self, key):
+        """
+        Get an access token only if no refresh is needed
+        
+        Never blocks, so asyncio code can call it on the event loop and fall
+        back to token() on a worker thread when it returns None.
+        
+        Args:
+            key (str): Credential key returned by register()
+        
+        Returns:
+            str: Access token, or None if it is about to expire
+        """
+        token = self._tokens[key]
+        if token.expires_at is not None and time.time() >= token.expires_at - EXPIRY_SKEW:
+            return None
+        return token.value
+    
+    def invalidate(self, key):
+        """
+        Refresh a token the platform has rejected
+        
+        Args:
+            key (str): Credential key
+        
+        Returns:
+            str: New access token
+        """
+        return self._refresh(key, rejected=self._tokens.get(key)).value
+    
+    def close(self):
+        """Stop the background refresh thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+    
+    def _expiring(self, token, margin=None):
+        margin = self.refresh_margin if margin is None else margin
+        return token.expires_at is not None and time.time() >= token.expires_at - margin
+    
+    def _refresh(self, key, rejected=None):
+        """
+        Refresh a token once across threads and processes
+        
+        Holding the source's file lock, the shared copy is read first: if
+        another process has already refreshed it, that token is used as is.
+        """
+        source = self._sources[key]
+        
+        with self._key_locks[key]:
+            current = self._tokens.get(key)
+            fresh = current is not None and key not in self._stale and not self._expiring(current)
+            if fresh and current is not rejected:
+                return current
+            
+            lock = FileLock(source.lock_path) if source.lock_path else nullcontext()
+            with lock:
+                stored = source.load()
+                usable = stored is not None and not self._expiring(stored)
+                if usable and (rejected is None or stored.value != rejected.value):
+                    token = stored
+                else:
+                    try:
+                        token = source.refresh(stored or current)
+                        source.save(token)
+                    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                        self._refreshes.inc(platform=source.platform, outcome='failed')
+                        self.logger.error(f"✗ {source.platform} token refresh failed: {_describe(e)}")
+                        if current is None and hasattr(source, 'fallback'):
+                            # Keep the configured token and retry in the background
+                            current = source.fallback()
+                            self._stale.add(key)
+                        if current is None or self._expiring(current, EXPIRY_SKEW):
+                            raise
+                        self._set(key, current, retry=True)
+                        return current
+                    else:
+                        self._refreshes.inc(platform=source.platform, outcome='refreshed')
+                        self.logger.info(f"✓ {source.platform} token refreshed")
+            
+            self._stale.discard(key)
+            self._set(key, token)
+            return token
+    
+    def _set(self, key, token, retry=False):
+        """Cache a token and schedule its background refresh"""
+        self._tokens[key] = token
+        if retry:
+            # Kept a token after a failed refresh: try again later
+            due = time.time() + RETRY_DELAY
+        elif token.expires_at is None:
+            return
+        else:
+            due = token.expires_at - self.refresh_margin
+            if due <= time.time():
+                due = time.time() + RETRY_DELAY
+        with self._condition:
+            if self._closed:
+                return
+            heapq.heappush(self._heap, (due, next(self._order), key))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='credential-refresh', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+    
+    def _run(self):
+        """Background refresh loop"""
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        return
+                    if self._heap and self._heap[0][0] <= time.time():
+                        break
+                    self._condition.wait(self._heap[0][0] - time.time() if self._heap else None)
+                _, _, key = heapq.heappop(self._heap)
+            
+            token = self._tokens.get(key)
+            if token is None or (key not in self._stale and not self._expiring(token)):
+                # Already refreshed since this entry was scheduled
+                continue
+            try:
+                self._refresh(key)
+            except Exception as e:
+                self.logger.warning(f"⚠️ Background token refresh failed, retrying in {RETRY_DELAY}s: {_describe(e)}")
+                with self._condition:
+                    heapq.heappush(self._heap, (time.time() + RETRY_DELAY, next(self._order), key))
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_credential_manager():
+    """
+    Get the process-wide credential manager
+    
+    Returns:
+        CredentialManager: Shared manager
+    """
+    global _manager
+    
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = CredentialManager()
+    return _manager
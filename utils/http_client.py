@@ -0,0 +1,399 @@
+"""
+HTTP Transport Utility
+أداة النقل عبر HTTP
+
+Shares pooled keep-alive sessions between all publishers
+"""
+
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from config import Config
+from utils.logger import setup_logger
+from utils.metrics import get_metrics
+from utils.concurrency import classify, get_concurrency_limiter
+from utils.rate_limiter import get_rate_limiter, RateLimitExceeded
+from utils.retry import RetryPolicy, CircuitOpenError, get_circuit_breaker
+
+
+# Phase timestamps of the request running on this thread / توقيت مراحل الطلب الحالي
+_timing = threading.local()
+
+
+class _TimedConnectionMixin:
+    """Records connect time and when the request body finished sending"""
+    
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            timing = getattr(_timing, 'current', None)
+            if timing is not None:
+                timing['connect'] += time.perf_counter() - started
+    
+    def getresponse(self, *args, **kwargs):
+        timing = getattr(_timing, 'current', None)
+        if timing is not None:
+            timing['sent'] = time.perf_counter()
+        response = super().getresponse(*args, **kwargs)
+        if timing is not None:
+            timing['received'] = time.perf_counter()
+        return response
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = type('TimedHTTPConnection', (_TimedConnectionMixin, HTTPConnection), {})
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = type('TimedHTTPSConnection', (_TimedConnectionMixin, HTTPSConnection), {})
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTP adapter whose connections report connect/upload/response timings"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool
+        }
+
+
+class HttpTransport:
+    """Pooled HTTP transport shared by publishers / ناقل HTTP مشترك بين الناشرين"""
+    
+    def __init__(self, pool_connections=None, pool_maxsize=None, pool_block=None,
+                 max_retries=None, timeout=None, rate_limiter=None, retry_policy=None, metrics=None,
+                 concurrency=None):
+        """
+        Initialize HTTP transport
+        
+        Args:
+            pool_connections (int, optional): Connection pools cached per session
+            pool_maxsize (int, optional): Keep-alive connections kept per host
+            pool_block (bool, optional): Block when the pool is exhausted instead
+                of opening throwaway connections
+            max_retries (int, optional): Low-level connection retries
+            timeout (tuple, optional): (connect, read) timeout in seconds
+            rate_limiter (RateLimiter, optional): Quota tracker applied to calls
+                that pass a limit key (defaults to the shared limiter when
+                Config.RATE_LIMIT_ENABLED)
+            retry_policy (RetryPolicy, optional): Retry policy for failed calls
+                (defaults to the Config.RETRY_* settings)
+            metrics (MetricsRegistry, optional): Where request metrics are
+                recorded (defaults to the shared registry)
+            concurrency (ConcurrencyLimiter, optional): Adaptive limits on the
+                requests in flight per platform and endpoint (defaults to the
+                shared limiter when Config.ADAPTIVE_CONCURRENCY_ENABLED)
+        """
+        self.logger = setup_logger(__name__)
+        self.pool_connections = pool_connections or Config.HTTP_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or Config.HTTP_POOL_MAXSIZE
+        self.pool_block = Config.HTTP_POOL_BLOCK if pool_block is None else pool_block
+        self.max_retries = Config.HTTP_MAX_RETRIES if max_retries is None else max_retries
+        self.timeout = timeout or (Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT)
+        if rate_limiter is None and Config.RATE_LIMIT_ENABLED:
+            rate_limiter = get_rate_limiter()
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        if concurrency is None and Config.ADAPTIVE_CONCURRENCY_ENABLED:
+            concurrency = get_concurrency_limiter()
+        self.concurrency = concurrency
+        self._init_metrics(metrics or get_metrics())
+        
+        self._sessions = {}
+        self._lock = threading.Lock()
+    
+    def session_for(self, url):
+        """
+        Get the shared session for the host of a URL
+        الحصول على الجلسة المشتركة لمضيف الرابط
+        
+        Args:
+            url (str): Request URL
+        
+        Returns:
+            requests.Session: Keep-alive session for that host
+        """
+        parsed = urlparse(url)
+        host = f"{parsed.scheme}://{parsed.netloc}"
+        
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = self._create_session()
+                    self._sessions[host] = session
+        return session
+    
+    def _init_metrics(self, metrics):
+        """Create the request metrics"""
+        self.metrics = metrics
+        self._requests = metrics.counter(
+            'sma_http_requests_total', 'HTTP requests by platform, method and outcome',
+            ('platform', 'method', 'outcome')
+        )
+        self._phases = metrics.histogram(
+            'sma_http_request_seconds',
+            'HTTP request time by phase: connect, upload (request preparation and body), '
+            'processing (until response headers) and total',
+            ('platform', 'phase')
+        )
+        self._uploaded = metrics.counter(
+            'sma_http_uploaded_bytes_total', 'Request body bytes sent', ('platform',)
+        )
+        self._retries = metrics.counter(
+            'sma_http_retries_total', 'Requests retried after a retryable failure', ('platform',)
+        )
+        self._throttled = metrics.counter(
+            'sma_http_throttled_total', 'Throttled requests (client = local rate limiter, server = platform)',
+            ('platform', 'source')
+        )
+        self._throttle_wait = metrics.counter(
+            'sma_rate_limit_wait_seconds_total', 'Seconds spent waiting for the rate limiter', ('platform',)
+        )
+        self._concurrency_wait = metrics.counter(
+            'sma_concurrency_wait_seconds_total', 'Seconds spent waiting for a concurrency slot', ('platform',)
+        )
+        self._in_flight = metrics.gauge(
+            'sma_http_in_flight', 'Requests currently in progress', ('platform',)
+        )
+    
+    def _create_session(self):
+        """Create a session with a pooled HTTP adapter"""
+        session = requests.Session()
+        adapter = TimedHTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=self.max_retries
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def request(self, method, url, limit=None, idempotent=None, **kwargs):
+        """
+        Send a request through the shared session for its host
+        
+        Calls that pass a limit key wait for the rate limiter, go through the
+        platform circuit breaker and are retried with backoff when the
+        failure is retryable. Every attempt holds a slot of its platform and
+        endpoint's adaptive concurrency limit.
+        
+        Args:
+            method (str): HTTP method
+            url (str): Request URL
+            limit (tuple, optional): (platform, access_token, page_id) quota key;
+                the call waits for the rate limiter and its response feeds
+                the limiter's usage tracking
+            idempotent (bool, optional): Whether repeating the call is safe
+                (defaults to True for GET, HEAD, PUT and DELETE)
+            **kwargs: Passed to requests.Session.request
+        
+        Returns:
+            requests.Response: Last response received
+        
+        Raises:
+            RateLimitExceeded: If the quota would delay the call too long
+            CircuitOpenError: If the platform circuit is open
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        if idempotent is None:
+            idempotent = method.upper() in ('GET', 'HEAD', 'PUT', 'DELETE')
+        
+        method = method.upper()
+        breaker = get_circuit_breaker(limit[0]) if limit else None
+        platform = limit[0] if limit else 'other'
+        streams = _stream_positions(kwargs)
+        
+        self._in_flight.inc(platform=platform)
+        try:
+            return self._request_loop(method, url, limit, idempotent, breaker, platform, streams, kwargs)
+        finally:
+            self._in_flight.dec(platform=platform)
+    
+    def _request_loop(self, method, url, limit, idempotent, breaker, platform, streams, kwargs):
+        """Attempt a request until it succeeds or is not worth retrying"""
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            if breaker:
+                try:
+                    breaker.before_call()
+                except CircuitOpenError:
+                    self._requests.inc(platform=platform, method=method, outcome='circuit_open')
+                    raise
+            
+            response = None
+            error = None
+            try:
+                for stream, position in streams:
+                    stream.seek(position)
+                response = self._send(method, url, limit, **kwargs)
+            except RateLimitExceeded:
+                if breaker:
+                    breaker.release()
+                self._requests.inc(platform=platform, method=method, outcome='throttled')
+                self._throttled.inc(platform=platform, source='client')
+                raise
+            except requests.exceptions.RequestException as e:
+                error = e
+            except BaseException:
+                # e.g. the upload stream was closed: a half-open probe must not stay claimed
+                if breaker:
+                    breaker.release()
+                raise
+            
+            self._requests.inc(platform=platform, method=method, outcome=_outcome(response, error))
+            
+            if breaker:
+                if error is not None or response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            
+            retryable = self.retry_policy.is_retryable(response, error, idempotent)
+            if not retryable or attempt >= self.retry_policy.max_attempts:
+                if error is not None:
+                    raise error
+                return response
+            
+            delay = self.retry_policy.delay(attempt)
+            self._retries.inc(platform=platform)
+            if breaker:
+                breaker.record_retry()
+            reason = error if error is not None else f"HTTP {response.status_code}"
+            self.logger.warning(
+                f"⚠️  {method} {urlparse(url).netloc} failed ({reason}); "
+                f"retrying in {delay:.1f}s (attempt {attempt + 1}/{self.retry_policy.max_attempts})"
+            )
+            time.sleep(delay)
+    
+    def _send(self, method, url, limit, **kwargs):
+        """Send one attempt, honoring the rate limiter and concurrency limit and recording phase timings"""
+        platform = limit[0] if limit else 'other'
+        if limit and self.rate_limiter:
+            waited = self.rate_limiter.acquire(*limit)
+            if waited:
+                self._throttle_wait.inc(waited, platform=platform)
+        
+        slot = self.concurrency.limit_for(platform, url) if self.concurrency else None
+        if slot:
+            waited = slot.acquire()
+            if waited > 0.001:
+                self._concurrency_wait.inc(waited, platform=platform)
+        
+        timing = {'connect': 0.0, 'sent': None, 'received': None}
+        _timing.current = timing
+        started = time.perf_counter()
+        response = None
+        error = None
+        try:
+            response = self.session_for(url).request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            error = e
+            raise
+        finally:
+            _timing.current = None
+            self._record_timing(platform, started, timing)
+            if slot:
+                slot.release(time.perf_counter() - started, classify(response, error))
+        
+        body_size = response.request.headers.get('Content-Length') if response.request is not None else None
+        if body_size:
+            self._uploaded.inc(int(body_size), platform=platform)
+        
+        throttled = response.status_code == 429
+        if limit and self.rate_limiter:
+            throttled = self.rate_limiter.observe(limit[0], response, *limit[1:])
+        if throttled:
+            self._throttled.inc(platform=platform, source='server')
+        return response
+    
+    def _record_timing(self, platform, started, timing):
+        """Split a request's duration into connect, upload and processing time"""
+        finished = time.perf_counter()
+        self._phases.observe(finished - started, platform=platform, phase='total')
+        if timing['connect']:
+            self._phases.observe(timing['connect'], platform=platform, phase='connect')
+        if timing['sent'] is not None:
+            self._phases.observe(timing['sent'] - started - timing['connect'], platform=platform, phase='upload')
+            if timing['received'] is not None:
+                self._phases.observe(timing['received'] - timing['sent'], platform=platform, phase='processing')
+    
+    def get(self, url, **kwargs):
+        """Send a GET request"""
+        return self.request('GET', url, **kwargs)
+    
+    def post(self, url, **kwargs):
+        """Send a POST request"""
+        return self.request('POST', url, **kwargs)
+    
+    def put(self, url, **kwargs):
+        """Send a PUT request"""
+        return self.request('PUT', url, **kwargs)
+    
+    def close(self):
+        """Close all pooled sessions"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+def _outcome(response, error):
+    """Metric outcome label for one attempt"""
+    if error is not None:
+        return 'error'
+    if response.status_code >= 500:
+        return 'server_error'
+    if response.status_code >= 400:
+        return 'client_error'
+    return 'success'
+
+
+def _stream_positions(kwargs):
+    """Remember where file-like request bodies start so retries can rewind them"""
+    candidates = [kwargs.get('data')]
+    files = kwargs.get('files')
+    if isinstance(files, dict):
+        for value in files.values():
+            candidates.append(value[1] if isinstance(value, (tuple, list)) else value)
+    
+    positions = []
+    for candidate in candidates:
+        if hasattr(candidate, 'seek') and hasattr(candidate, 'tell'):
+            positions.append((candidate, candidate.tell()))
+    return positions
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    Get the process-wide shared transport
+    الحصول على الناقل المشترك للعملية
+    
+    Returns:
+        HttpTransport: Shared transport instance
+    """
+    global _default_transport
+    
+    if _default_transport is None:
+        with _default_lock:
+            if _default_transport is None:
+                _default_transport = HttpTransport()
+    return _default_transport
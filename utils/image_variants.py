@@ -0,0 +1,334 @@
+"""
+Image Variant Utility
+أداة تجهيز نسخ الصور لكل منصة
+
+Produces each platform's image variant (aspect ratio, dimensions, format and
+file size) from one source image in a process pool, caching the results on
+disk by source hash and target spec
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from config import Config
+from utils.logger import setup_logger
+from utils.media_cache import get_media_index, hash_file
+from utils.validator import _pool_context
+
+
+# Bump when render_variant's output changes, so cached variants are rebuilt
+VARIANT_VERSION = 1
+
+# Per-platform image specs / مواصفات الصور لكل منصة
+IMAGE_SPECS = {
+    'facebook': {
+        'max_width': 2048,
+        'max_height': 2048,
+        'format': 'JPEG',
+        'quality': 85,
+        'max_bytes': 4 * 1024 * 1024
+    },
+    'instagram': {
+        'min_width': 320,
+        'max_width': 1440,
+        'max_height': 1800,
+        'min_aspect': 4 / 5,
+        'max_aspect': 1.91,
+        'format': 'JPEG',
+        'quality': 85,
+        'max_bytes': 8 * 1024 * 1024
+    }
+}
+
+# Lowest JPEG quality tried before dimensions are reduced instead
+MIN_QUALITY = 40
+
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+
+def spec_key(spec):
+    """Short stable hash of a spec, used in variant file names"""
+    payload = json.dumps([VARIANT_VERSION, spec], sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+
+
+def _crop_to_aspect(image, min_aspect=None, max_aspect=None):
+    """Center-crop an image into an aspect ratio range"""
+    width, height = image.size
+    aspect = width / height
+    if min_aspect and aspect < min_aspect:
+        new_height = int(width / min_aspect)
+        top = (height - new_height) // 2
+        return image.crop((0, top, width, top + new_height))
+    if max_aspect and aspect > max_aspect:
+        new_width = int(height * max_aspect)
+        left = (width - new_width) // 2
+        return image.crop((left, 0, left + new_width, height))
+    return image
+
+
+def _encode(image, spec):
+    """
+    Encode an image, lowering quality (then size) until it fits max_bytes
+    
+    Returns:
+        tuple: (encoded bytes, quality used, final image)
+    """
+    image_format = spec.get('format', 'JPEG')
+    quality = spec.get('quality', 85)
+    max_bytes = spec.get('max_bytes')
+    
+    def save(img, q):
+        buffer = io.BytesIO()
+        options = {'optimize': True}
+        if image_format in ('JPEG', 'WEBP'):
+            options['quality'] = q
+        if image_format == 'JPEG':
+            options['progressive'] = True
+        img.save(buffer, image_format, **options)
+        return buffer.getvalue()
+    
+    while True:
+        data = save(image, quality)
+        if not max_bytes or len(data) <= max_bytes or image_format == 'PNG':
+            return data, quality, image
+        
+        # Binary search for the highest quality that fits
+        low, high, best = MIN_QUALITY, quality - 1, None
+        while low <= high:
+            mid = (low + high) // 2
+            candidate = save(image, mid)
+            if len(candidate) <= max_bytes:
+                best, low = (candidate, mid), mid + 1
+            else:
+                high = mid - 1
+        if best:
+            return best[0], best[1], image
+        
+        # Still too large at the lowest quality: shrink and retry
+        width, height = image.size
+        image = image.resize((max(1, int(width * 0.85)), max(1, int(height * 0.85))), Image.LANCZOS)
+
+
+def render_variant(source_path, spec, output_path):
+    """
+    Render one image variant to disk
+    إنشاء نسخة صورة مطابقة لمواصفات المنصة
+    
+    Runs in worker processes, so it only takes picklable arguments.
+    
+    Args:
+        source_path (str): Source image path
+        spec (dict): Target spec (see IMAGE_SPECS)
+        output_path (str): Where to write the variant
+    
+    Returns:
+        dict: path, width, height, bytes and quality of the variant
+    """
+    max_width = spec.get('max_width')
+    max_height = spec.get('max_height')
+    
+    with Image.open(source_path) as source:
+        # JPEG fast path: decode at a reduced DCT scale when the target is smaller
+        if max_width and max_height:
+            source.draft('RGB', (max_width, max_height))
+        image = ImageOps.exif_transpose(source)
+        
+        image = _crop_to_aspect(image, spec.get('min_aspect'), spec.get('max_aspect'))
+        
+        if max_width or max_height:
+            image.thumbnail(
+                (max_width or image.width, max_height or image.height),
+                Image.LANCZOS,
+                reducing_gap=3.0
+            )
+        
+        min_width = spec.get('min_width')
+        if min_width and image.width < min_width:
+            scale = min_width / image.width
+            image = image.resize((min_width, round(image.height * scale)), Image.LANCZOS)
+        
+        if spec.get('format', 'JPEG') == 'JPEG' and image.mode != 'RGB':
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            else:
+                image = image.convert('RGB')
+        
+        data, quality, image = _encode(image, spec)
+    
+    output = Path(output_path)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output.with_name(f"{output.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, output)
+    
+    return {
+        'path': str(output),
+        'width': image.width,
+        'height': image.height,
+        'bytes': len(data),
+        'quality': quality
+    }
+
+
+class ImagePipeline:
+    """Per-platform image variant pipeline / خط تجهيز نسخ الصور"""
+    
+    def __init__(self, cache_dir=None, workers=None, specs=None):
+        """
+        Initialize image pipeline
+        
+        Args:
+            cache_dir (str, optional): Variant cache directory
+                (defaults to Config.IMAGE_VARIANT_DIR)
+            workers (int, optional): Worker processes
+                (defaults to Config.IMAGE_WORKERS, 0 = CPU count)
+            specs (dict, optional): Platform specs (defaults to IMAGE_SPECS)
+        """
+        self.logger = setup_logger(__name__)
+        self.cache_dir = Path(cache_dir or Config.IMAGE_VARIANT_DIR)
+        self.workers = workers or Config.IMAGE_WORKERS or os.cpu_count() or 1
+        self.specs = specs or IMAGE_SPECS
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+            return self._executor
+    
+    def close(self):
+        """Shut down the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+    
+    def _source_hash(self, source_path):
+        index = get_media_index()
+        return index.content_hash(source_path) if index else hash_file(source_path)
+    
+    def variant_path(self, source_hash, platform):
+        """
+        Get the cache path of a platform variant
+        
+        Args:
+            source_hash (str): SHA-256 of the source image
+            platform (str): Platform name
+        
+        Returns:
+            Path: Variant file path
+        """
+        spec = self.specs[platform]
+        extension = EXTENSIONS.get(spec.get('format', 'JPEG'), '.img')
+        return self.cache_dir / source_hash[:2] / f"{source_hash}-{platform}-{spec_key(spec)}{extension}"
+    
+    def public_url(self, variant_path):
+        """
+        Get the public URL of a variant (requires Config.IMAGE_VARIANT_BASE_URL)
+        
+        Args:
+            variant_path (str): Variant file path
+        
+        Returns:
+            str: URL, or None if no base URL is configured
+        """
+        base_url = Config.IMAGE_VARIANT_BASE_URL
+        if not base_url:
+            return None
+        relative = Path(variant_path).resolve().relative_to(self.cache_dir.resolve())
+        return f"{base_url.rstrip('/')}/{relative.as_posix()}"
+    
+    def prepare(self, source_path, platforms):
+        """
+        Get each platform's variant of an image, rendering missing ones
+        تجهيز نسخة الصورة لكل منصة
+        
+        Args:
+            source_path (str): Source image path
+            platforms (list): Platform names (platforms without a spec are skipped)
+        
+        Returns:
+            dict: platform -> variant path
+        """
+        return self.prepare_many([source_path], platforms)[source_path]
+    
+    def prepare_many(self, source_paths, platforms):
+        """
+        Prepare variants for many images in parallel
+        تجهيز نسخ عدة صور بالتوازي
+        
+        Args:
+            source_paths (list): Source image paths
+            platforms (list): Platform names
+        
+        Returns:
+            dict: source path -> {platform: variant path}; a platform whose
+                variant failed to render is left out
+        """
+        platforms = [platform for platform in platforms if platform in self.specs]
+        results = {source_path: {} for source_path in source_paths}
+        futures = []
+        
+        for source_path in source_paths:
+            try:
+                source_hash = self._source_hash(source_path)
+            except OSError as e:
+                self.logger.error(f"✗ Cannot read image {source_path}: {e}")
+                continue
+            
+            for platform in platforms:
+                path = self.variant_path(source_hash, platform)
+                if path.exists():
+                    results[source_path][platform] = str(path)
+                else:
+                    future = self._pool().submit(render_variant, source_path, self.specs[platform], str(path))
+                    futures.append((source_path, platform, future))
+        
+        for source_path, platform, future in futures:
+            try:
+                variant = future.result()
+            except Exception as e:
+                self.logger.error(f"✗ {platform} variant of {source_path} failed: {e}")
+                continue
+            results[source_path][platform] = variant['path']
+            self.logger.info(
+                f"✓ {platform} variant: {variant['width']}x{variant['height']}, "
+                f"{variant['bytes'] / 1024:.0f}KB (q={variant['quality']})"
+            )
+        
+        return results
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_image_pipeline():
+    """
+    Get the process-wide image pipeline, or None when variants are disabled
+    
+    Returns:
+        ImagePipeline: Shared pipeline
+    """
+    global _pipeline
+    
+    if not Config.IMAGE_VARIANTS_ENABLED:
+        return None
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = ImagePipeline()
+    return _pipeline
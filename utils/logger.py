@@ -2,28 +2,169 @@
 Logging Utility
 أداة التسجيل والسجلات
 
-Provides colored logging for the automation system
+Provides non-blocking logging for the automation system: loggers only put
+records on a queue, and a single background listener writes them to the
+console and to a rotating log file
 """
 
+import atexit
+import copy
+import json
 import logging
-import os
-from datetime import datetime
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 from pathlib import Path
 
+from config import Config
 
-def setup_logger(name, log_file=None, level=logging.INFO):
+
+_listeners = {}
+_listeners_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Structured JSON log lines / سجلات بصيغة JSON"""
+    
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Formatted by _RecordQueueHandler before the record was queued
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _RecordQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the listener's handlers"""
+    
+    def prepare(self, record):
+        """
+        Make a record safe to queue without formatting it
+        
+        QueueHandler.prepare folds the traceback into the message and drops
+        it, so JSON output lost its 'exception' field; here the traceback is
+        rendered into exc_text, which every formatter knows how to print.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _build_formatters():
+    """Create the (console, file) formatters for the configured output mode"""
+    if Config.LOG_FORMAT.lower() == 'json':
+        formatter = JsonFormatter()
+        return formatter, formatter
+    
+    detailed_formatter = logging.Formatter(
+        '[%(asctime)s] %(levelname)-8s [%(name)s] %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    
+    simple_formatter = logging.Formatter(
+        '%(levelname)-8s %(message)s'
+    )
+    return simple_formatter, detailed_formatter
+
+
+def _build_file_handler(log_file):
+    """Create a size- or time-rotating file handler"""
+    log_dir = Path(log_file).parent
+    log_dir.mkdir(parents=True, exist_ok=True)
+    
+    if Config.LOG_ROTATION.lower() == 'time':
+        return TimedRotatingFileHandler(
+            log_file,
+            when=Config.LOG_ROTATION_WHEN,
+            backupCount=Config.LOG_BACKUP_COUNT,
+            encoding='utf-8'
+        )
+    return RotatingFileHandler(
+        log_file,
+        maxBytes=Config.LOG_MAX_BYTES,
+        backupCount=Config.LOG_BACKUP_COUNT,
+        encoding='utf-8'
+    )
+
+
+def _get_queue_handler(log_file):
+    """
+    Get the queue handler feeding the background listener for a log file
+    
+    One listener thread (with one console and one file handler) is started
+    per log file and shared by every logger writing to it.
+    """
+    with _listeners_lock:
+        if log_file in _listeners:
+            return _listeners[log_file][0]
+        
+        console_formatter, file_formatter = _build_formatters()
+        
+        # Console handler
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(console_formatter)
+        
+        # File handler
+        file_handler = _build_file_handler(log_file)
+        file_handler.setFormatter(file_formatter)
+        
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+        listener.start()
+        
+        queue_handler = _RecordQueueHandler(log_queue)
+        _listeners[log_file] = (queue_handler, listener)
+        return queue_handler
+
+
+def shutdown_logging():
+    """
+    Flush queued records and stop the background listeners
+    إيقاف خيوط التسجيل بعد تفريغ السجلات
+    """
+    with _listeners_lock:
+        for _, listener in _listeners.values():
+            listener.stop()
+        _listeners.clear()
+
+
+atexit.register(shutdown_logging)
+
+
+def setup_logger(name, log_file=None, level=None):
     """
     Setup logger with file and console handlers
     إعداد نظام السجلات مع معالجات الملف والكونسول
     
+    Records are handed to a shared background thread, so logging never
+    blocks the caller on console or disk writes.
+    
     Args:
         name (str): Logger name
-        log_file (str): Path to log file (optional)
-        level: Logging level
+        log_file (str): Path to log file (defaults to Config.LOG_FILE)
+        level: Logging level (defaults to Config.LOG_LEVEL)
     
     Returns:
         logging.Logger: Configured logger
     """
+    if level is None:
+        level = getattr(logging, str(Config.LOG_LEVEL).upper(), logging.INFO)
+    
     # Create logger
     logger = logging.getLogger(name)
     logger.setLevel(level)
@@ -32,41 +173,6 @@ def setup_logger(name, log_file=None, level=logging.INFO):
     if logger.handlers:
         return logger
     
-    # Create formatters
-    detailed_formatter = logging.Formatter(
-        '[%(asctime)s] %(levelname)-8s [%(name)s] %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    simple_formatter = logging.Formatter(
-        '%(levelname)-8s %(message)s'
-    )
-    
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(level)
-    console_handler.setFormatter(simple_formatter)
-    logger.addHandler(console_handler)
-    
-    # File handler
-    if log_file:
-        # Create logs directory if it doesn't exist
-        log_dir = Path(log_file).parent
-        log_dir.mkdir(parents=True, exist_ok=True)
-        
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setLevel(level)
-        file_handler.setFormatter(detailed_formatter)
-        logger.addHandler(file_handler)
-    else:
-        # Default log file
-        log_dir = Path('logs')
-        log_dir.mkdir(exist_ok=True)
-        
-        log_file = log_dir / f'automation_{datetime.now().strftime("%Y%m%d")}.log'
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setLevel(level)
-        file_handler.setFormatter(detailed_formatter)
-        logger.addHandler(file_handler)
+    logger.addHandler(_get_queue_handler(str(log_file or Config.LOG_FILE)))
     
     return logger
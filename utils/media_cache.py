@@ -0,0 +1,291 @@
+"""
+Media Cache Utility
+أداة فهرسة الوسائط المرفوعة
+
+Content-addressed index of local media files that remembers which platform
+asset IDs and validation results belong to each file
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from config import Config
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS assets (
+    sha256 TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    asset_id TEXT NOT NULL,
+    uploaded_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (sha256, platform, destination)
+);
+CREATE TABLE IF NOT EXISTS validations (
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    result TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (path, kind)
+);
+CREATE INDEX IF NOT EXISTS idx_files_last_used ON files (last_used);
+CREATE INDEX IF NOT EXISTS idx_assets_last_used ON assets (last_used);
+CREATE INDEX IF NOT EXISTS idx_validations_last_used ON validations (last_used);
+"""
+
+# Run eviction after this many writes / تشغيل الإخلاء بعد عدد من عمليات الكتابة
+EVICT_EVERY = 200
+
+
+def hash_file(file_path, block_size=1024 * 1024):
+    """
+    Compute the SHA-256 of a file
+    
+    Args:
+        file_path (str): Path to file
+        block_size (int): Read size in bytes
+    
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MediaIndex:
+    """Persistent content-addressed media index / فهرس وسائط دائم حسب المحتوى"""
+    
+    def __init__(self, db_path=None, max_entries=None, ttl_days=None):
+        """
+        Initialize media index
+        
+        Args:
+            db_path (str, optional): SQLite database path
+                (defaults to Config.MEDIA_CACHE_DB)
+            max_entries (int, optional): Entries kept per table before the least
+                recently used are evicted (defaults to Config.MEDIA_CACHE_MAX_ENTRIES)
+            ttl_days (float, optional): Age after which uploaded asset IDs are no
+                longer reused (defaults to Config.MEDIA_CACHE_TTL_DAYS)
+        """
+        self.db_path = db_path or Config.MEDIA_CACHE_DB
+        self.max_entries = max_entries or Config.MEDIA_CACHE_MAX_ENTRIES
+        self.ttl = (ttl_days or Config.MEDIA_CACHE_TTL_DAYS) * 86400
+        self._local = threading.local()
+        self._memory = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._writes = 0
+        
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+        self.evict()
+    
+    def _connection(self):
+        """Get this thread's SQLite connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    @staticmethod
+    def _identity(file_path):
+        """(resolved path, size, mtime_ns) of a file"""
+        path = str(Path(file_path).resolve())
+        stat = os.stat(path)
+        return path, stat.st_size, stat.st_mtime_ns
+    
+    def content_hash(self, file_path):
+        """
+        Get the SHA-256 of a file, rehashing only when it has changed
+        الحصول على بصمة الملف دون إعادة الحساب إن لم يتغير
+        
+        Args:
+            file_path (str): Path to file
+        
+        Returns:
+            str: Hex digest
+        """
+        identity = self._identity(file_path)
+        path = identity[0]
+        now = time.time()
+        
+        # In-process fast path
+        with self._memory_lock:
+            cached = self._memory.get(path)
+            if cached and cached[0] == identity:
+                self._memory.move_to_end(path)
+                return cached[1]
+        
+        # Persistent fast path
+        row = self._connection().execute(
+            "SELECT sha256 FROM files WHERE path = ? AND size = ? AND mtime_ns = ?", identity
+        ).fetchone()
+        if row:
+            sha256 = row[0]
+            self._connection().execute("UPDATE files SET last_used = ? WHERE path = ?", (now, path))
+        else:
+            sha256 = hash_file(path)
+            self._connection().execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256, last_used) VALUES (?, ?, ?, ?, ?)",
+                identity + (sha256, now)
+            )
+            self._after_write()
+        
+        with self._memory_lock:
+            self._memory[path] = (identity, sha256)
+            self._memory.move_to_end(path)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+        return sha256
+    
+    def get_asset(self, file_path, platform, destination=''):
+        """
+        Look up an asset already uploaded with the same content
+        
+        Args:
+            file_path (str): Path to file
+            platform (str): Platform name
+            destination (str): Page/account the asset belongs to
+        
+        Returns:
+            str: Asset ID, or None if the content has not been uploaded there
+        """
+        sha256 = self.content_hash(file_path)
+        now = time.time()
+        row = self._connection().execute(
+            "SELECT asset_id FROM assets WHERE sha256 = ? AND platform = ? AND destination = ? "
+            "AND uploaded_at >= ?",
+            (sha256, platform, str(destination), now - self.ttl)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        self._connection().execute(
+            "UPDATE assets SET last_used = ? WHERE sha256 = ? AND platform = ? AND destination = ?",
+            (now, sha256, platform, str(destination))
+        )
+        return row[0]
+    
+    def record_asset(self, file_path, platform, asset_id, destination=''):
+        """
+        Remember the asset ID a platform returned for a file's content
+        
+        Args:
+            file_path (str): Path to file
+            platform (str): Platform name
+            asset_id (str): Uploaded media/video ID
+            destination (str): Page/account the asset belongs to
+        """
+        sha256 = self.content_hash(file_path)
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO assets (sha256, platform, destination, asset_id, uploaded_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (sha256, platform, str(destination), str(asset_id), now, now)
+        )
+        self._after_write()
+    
+    def get_validation(self, file_path, kind):
+        """
+        Get a cached validation result for an unchanged file
+        
+        Only the (path, size, mtime) fast path is used, so this never hashes.
+        
+        Args:
+            file_path (str): Path to file
+            kind (str): Validation kind (e.g. 'video:100')
+        
+        Returns:
+            dict: Cached result, or None
+        """
+        identity = self._identity(file_path)
+        row = self._connection().execute(
+            "SELECT result FROM validations WHERE path = ? AND size = ? AND mtime_ns = ? AND kind = ?",
+            identity + (kind,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._connection().execute(
+            "UPDATE validations SET last_used = ? WHERE path = ? AND kind = ?",
+            (time.time(), identity[0], kind)
+        )
+        return json.loads(row[0])
+    
+    def record_validation(self, file_path, kind, result):
+        """
+        Cache a validation result
+        
+        Args:
+            file_path (str): Path to file
+            kind (str): Validation kind
+            result (dict): Validation result
+        """
+        identity = self._identity(file_path)
+        self._connection().execute(
+            "INSERT OR REPLACE INTO validations (path, size, mtime_ns, kind, result, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            identity + (kind, json.dumps(result), time.time())
+        )
+        self._after_write()
+    
+    def _after_write(self):
+        self._writes += 1
+        if self._writes % EVICT_EVERY == 0:
+            self.evict()
+    
+    def evict(self):
+        """
+        Drop expired asset IDs and trim every table to max_entries (LRU)
+        حذف الإدخالات المنتهية أو الأقل استخداماً
+        """
+        conn = self._connection()
+        conn.execute("DELETE FROM assets WHERE uploaded_at < ?", (time.time() - self.ttl,))
+        for table in ('files', 'assets', 'validations'):
+            conn.execute(
+                f"DELETE FROM {table} WHERE rowid IN ("
+                f"SELECT rowid FROM {table} ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_media_index():
+    """
+    Get the process-wide media index, or None when caching is disabled
+    
+    Returns:
+        MediaIndex: Shared index
+    """
+    global _default_index
+    
+    if not Config.MEDIA_CACHE_ENABLED:
+        return None
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                _default_index = MediaIndex()
+    return _default_index
@@ -0,0 +1,390 @@
+"""
+Metrics Utility
+أداة المقاييس
+
+In-process counters, gauges and histograms for the publishing path, with a
+snapshot API and an optional Prometheus text-format HTTP endpoint
+"""
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import Config
+from utils.logger import setup_logger
+
+
+# Latency buckets in seconds / حدود مدد الاستجابة بالثواني
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base class for labelled metrics"""
+    
+    kind = 'untyped'
+    
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def _key(self, labels):
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+    
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """Monotonically increasing count / عداد تصاعدي"""
+    
+    kind = 'counter'
+    
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, key, None, value) for key, value in items]
+    
+    def snapshot(self):
+        with self._lock:
+            return {key: value for key, value in self._values.items()}
+
+
+class Gauge(Counter):
+    """Value that can go up and down / قيمة متغيرة"""
+    
+    kind = 'gauge'
+    
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations / توزيع القيم على فئات"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (non-cumulative, plus +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+    
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        
+        samples = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                samples.append((f'{self.name}_bucket', key, f'le="{_format_value(bound)}"', cumulative))
+            samples.append((f'{self.name}_sum', key, None, total))
+            samples.append((f'{self.name}_count', key, None, count))
+        return samples
+    
+    def snapshot(self):
+        with self._lock:
+            items = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        
+        result = {}
+        for key, counts, total, count in items:
+            cumulative = 0
+            buckets = {}
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                buckets[bound] = cumulative
+            result[key] = {'count': count, 'sum': total, 'buckets': buckets}
+        return result
+
+
+class _NullMetric:
+    """Stand-in used when metrics are disabled"""
+    
+    def inc(self, *args, **kwargs):
+        pass
+    
+    dec = set = observe = inc
+
+
+class MetricsRegistry:
+    """Collection of named metrics / سجل المقاييس"""
+    
+    def __init__(self, enabled=True):
+        """
+        Initialize registry
+        
+        Args:
+            enabled (bool): When False, metrics are no-ops and nothing is exported
+        """
+        self.enabled = enabled
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+    
+    def _get_or_create(self, cls, name, documentation, labels, **kwargs):
+        if not self.enabled:
+            return _NullMetric()
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labels, **kwargs)
+            elif not isinstance(metric, cls) or metric.label_names != tuple(labels):
+                raise ValueError(f"Metric {name} already registered with a different type or labels")
+            return metric
+    
+    def counter(self, name, documentation, labels=()):
+        """
+        Get or create a counter
+        
+        Args:
+            name (str): Metric name
+            documentation (str): Help text
+            labels (tuple): Label names
+        
+        Returns:
+            Counter: Metric
+        """
+        return self._get_or_create(Counter, name, documentation, labels)
+    
+    def gauge(self, name, documentation, labels=()):
+        """Get or create a gauge"""
+        return self._get_or_create(Gauge, name, documentation, labels)
+    
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        """Get or create a histogram"""
+        return self._get_or_create(Histogram, name, documentation, labels, buckets=buckets)
+    
+    def add_collector(self, collector):
+        """
+        Register a callable run before every export/snapshot (e.g. to refresh gauges)
+        
+        Args:
+            collector (callable): Function taking the registry
+        """
+        with self._lock:
+            self._collectors.append(collector)
+    
+    def remove_collector(self, collector):
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+    
+    def _collect(self):
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                collector(self)
+            except Exception:
+                pass
+        with self._lock:
+            return list(self._metrics.values())
+    
+    def snapshot(self):
+        """
+        Get the current value of every metric
+        الحصول على لقطة من المقاييس الحالية
+        
+        Returns:
+            dict: name -> {label values tuple: value}; histogram values are
+                {'count', 'sum', 'buckets'}
+        """
+        return {metric.name: metric.snapshot() for metric in self._collect()}
+    
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format
+        
+        Returns:
+            str: Exposition text
+        """
+        lines = []
+        for metric in sorted(self._collect(), key=lambda m: m.name):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(metric.label_names, key, extra)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics():
+    """
+    Get the process-wide metrics registry
+    
+    Returns:
+        MetricsRegistry: Shared registry (disabled when Config.METRICS_ENABLED is off)
+    """
+    global _registry
+    
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry(enabled=Config.METRICS_ENABLED)
+    return _registry
+
+
+def track_publish(platform):
+    """
+    Decorator counting and timing a publisher method by outcome
+    
+    Methods returning a list of results (batch calls) count each item.
+    Coroutine methods are timed until they finish.
+    
+    Args:
+        platform (str): Platform name used as label
+    """
+    def decorator(method):
+        operation = method.__name__
+        
+        def instruments():
+            metrics = get_metrics()
+            publishes = metrics.counter(
+                'sma_publish_total', 'Publisher calls by platform, operation and outcome',
+                ('platform', 'operation', 'outcome')
+            )
+            durations = metrics.histogram(
+                'sma_publish_seconds', 'Publisher call duration in seconds', ('platform', 'operation')
+            )
+            return publishes, durations
+        
+        def record(publishes, result):
+            for item in result if isinstance(result, list) else [result]:
+                outcome = 'success' if isinstance(item, dict) and item.get('success') else 'failure'
+                publishes.inc(platform=platform, operation=operation, outcome=outcome)
+            return result
+        
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(*args, **kwargs):
+                publishes, durations = instruments()
+                started = time.perf_counter()
+                try:
+                    result = await method(*args, **kwargs)
+                except Exception:
+                    publishes.inc(platform=platform, operation=operation, outcome='error')
+                    raise
+                finally:
+                    durations.observe(time.perf_counter() - started, platform=platform, operation=operation)
+                return record(publishes, result)
+            return async_wrapper
+        
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            publishes, durations = instruments()
+            started = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except Exception:
+                publishes.inc(platform=platform, operation=operation, outcome='error')
+                raise
+            finally:
+                durations.observe(time.perf_counter() - started, platform=platform, operation=operation)
+            return record(publishes, result)
+        return wrapper
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves /metrics in Prometheus text format"""
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host=None, registry=None):
+    """
+    Serve metrics over HTTP in a background thread
+    تشغيل خادم المقاييس
+    
+    Args:
+        port (int, optional): Port (defaults to Config.METRICS_PORT)
+        host (str, optional): Bind address (defaults to Config.METRICS_HOST)
+        registry (MetricsRegistry, optional): Registry to serve
+    
+    Returns:
+        ThreadingHTTPServer: Running server (the same one on repeated calls)
+    """
+    global _server
+    
+    registry = registry or get_metrics()
+    with _server_lock:
+        if _server is not None:
+            return _server
+        server = ThreadingHTTPServer((host or Config.METRICS_HOST, Config.METRICS_PORT if port is None else port),
+                                     _MetricsHandler)
+        server.daemon_threads = True
+        server.registry = registry
+        threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+        _server = server
+    
+    address, bound_port = server.server_address[:2]
+    setup_logger(__name__).info(f"✓ Metrics available at http://{address}:{bound_port}/metrics")
+    return server
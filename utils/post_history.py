@@ -0,0 +1,432 @@
+"""
+Post History Utility
+أداة سجل المنشورات
+
+Append-only SQLite record of every publishing call (platform, account,
+content hash, returned IDs, timing) with idempotency keys that stop a
+retried call from posting the same content twice
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+from config import Config
+from utils.logger import setup_logger
+from utils.media_cache import get_media_index, hash_file
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    platform TEXT NOT NULL,
+    account TEXT NOT NULL DEFAULT '',
+    content_type TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    idempotency_key TEXT,
+    success INTEGER NOT NULL,
+    remote_id TEXT,
+    result TEXT,
+    error TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    latency_ms REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS post_keys (
+    idempotency_key TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    post_id INTEGER,
+    owner TEXT,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_posts_finished ON posts (finished_at);
+CREATE INDEX IF NOT EXISTS idx_posts_platform ON posts (platform, finished_at);
+CREATE INDEX IF NOT EXISTS idx_posts_account ON posts (platform, account, finished_at);
+CREATE INDEX IF NOT EXISTS idx_posts_content ON posts (content_hash, platform);
+CREATE INDEX IF NOT EXISTS idx_posts_failed ON posts (finished_at) WHERE success = 0;
+CREATE INDEX IF NOT EXISTS idx_posts_platform_failed ON posts (platform, finished_at) WHERE success = 0;
+"""
+
+# Idempotency key states / حالات مفتاح عدم التكرار
+PENDING = 'pending'
+DONE = 'done'
+
+# Result fields holding the ID a platform returned, in order of preference
+REMOTE_ID_FIELDS = ('post_id', 'video_id', 'media_id', 'publish_id')
+
+
+def _media_digest(file_path):
+    """SHA-256 of a local media file (from the media index when enabled)"""
+    index = get_media_index()
+    return index.content_hash(file_path) if index else hash_file(file_path)
+
+
+def content_hash(content_type, content):
+    """
+    Hash the content of a post
+    
+    Local media ('*_path' arguments) is hashed by its bytes rather than its
+    path, so the same file at two paths hashes the same and an edited file
+    does not keep its old hash. Remote media (URLs) is hashed by its URL.
+    
+    Args:
+        content_type (str): Type of content ('text', 'image', 'video')
+        content (dict): Post arguments (message, media paths/URLs, ...)
+    
+    Returns:
+        str: SHA-256 of the content type and arguments
+    """
+    content = dict(content)
+    for name, value in list(content.items()):
+        if name.endswith('_path') and isinstance(value, str) and os.path.isfile(value):
+            try:
+                content[name[:-len('_path')]] = _media_digest(value)
+            except OSError:
+                continue
+            del content[name]
+    payload = json.dumps([content_type, content], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PostHistory:
+    """Append-only post history with idempotency keys / سجل منشورات دائم"""
+    
+    def __init__(self, db_path=None, stale_after=None):
+        """
+        Initialize post history
+        
+        Args:
+            db_path (str, optional): SQLite database path
+                (defaults to Config.POST_HISTORY_DB)
+            stale_after (float, optional): Seconds after which a key whose post
+                never finished (e.g. the process died) may be posted again
+                (defaults to Config.POST_HISTORY_STALE_AFTER)
+        """
+        self.logger = setup_logger(__name__)
+        self.db_path = db_path or Config.POST_HISTORY_DB
+        self.stale_after = stale_after or Config.POST_HISTORY_STALE_AFTER
+        self._local = threading.local()
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+        
+        if self.db_path != ':memory:':
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+    
+    def _connection(self):
+        """Get this thread's SQLite connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    def begin(self, idempotency_key):
+        """
+        Reserve an idempotency key before posting
+        حجز مفتاح عدم التكرار قبل النشر
+        
+        Args:
+            idempotency_key (str): Caller-chosen key for this post
+        
+        Returns:
+            dict: None if the key is now reserved for the caller; otherwise
+                the result to return instead of posting: the recorded result
+                (with 'duplicate': True) if the key already succeeded, or a
+                failed result if another call is still posting it
+        """
+        conn = self._connection()
+        now = time.time()
+        
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT state, post_id, updated_at FROM post_keys WHERE idempotency_key = ?",
+                (idempotency_key,)
+            ).fetchone()
+            if row is not None and (row['state'] == DONE or now - row['updated_at'] < self.stale_after):
+                conn.execute('COMMIT')
+                return self._existing(idempotency_key, row)
+            conn.execute(
+                "INSERT OR REPLACE INTO post_keys (idempotency_key, state, post_id, owner, updated_at) "
+                "VALUES (?, ?, NULL, ?, ?)",
+                (idempotency_key, PENDING, self._owner, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return None
+    
+    def _existing(self, idempotency_key, row):
+        """Result for a key that is already posted or being posted"""
+        if row['state'] == PENDING:
+            return {
+                'success': False,
+                'error': f'Post with idempotency key {idempotency_key} is already in progress',
+                'duplicate': True
+            }
+        post = self._connection().execute("SELECT result FROM posts WHERE id = ?", (row['post_id'],)).fetchone()
+        result = json.loads(post['result']) if post and post['result'] else {'success': True}
+        result['duplicate'] = True
+        return result
+    
+    def record(self, platform, content_type, content, result, started_at, account=None, idempotency_key=None):
+        """
+        Append a publishing result and settle its idempotency key
+        
+        A successful post marks the key done; a failed one releases it so a
+        retry may post again.
+        
+        Args:
+            platform (str): Platform name
+            content_type (str): Type of content
+            content (dict): Post arguments (hashed, not stored)
+            result (dict): Result dict from the publisher
+            started_at (float): time.time() when the call started
+            account (str, optional): Account ID ('' = the Config credentials)
+            idempotency_key (str, optional): Key reserved with begin()
+        
+        Returns:
+            int: History row ID
+        """
+        finished_at = time.time()
+        success = bool(isinstance(result, dict) and result.get('success'))
+        remote_id = next((result[field] for field in REMOTE_ID_FIELDS if result.get(field)), None) \
+            if isinstance(result, dict) else None
+        error = None if success else (result.get('error', 'Unknown error') if isinstance(result, dict) else result)
+        # Hashed before taking the write lock (media files may be large)
+        digest = content_hash(content_type, content)
+        
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = conn.execute(
+                "INSERT INTO posts (platform, account, content_type, content_hash, idempotency_key, success, "
+                "remote_id, result, error, started_at, finished_at, latency_ms) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (platform, account or '', content_type, digest, idempotency_key,
+                 int(success), None if remote_id is None else str(remote_id),
+                 json.dumps(result, default=str), None if error is None else str(error),
+                 started_at, finished_at, (finished_at - started_at) * 1000)
+            )
+            post_id = cursor.lastrowid
+            if idempotency_key and success:
+                conn.execute(
+                    "UPDATE post_keys SET state = ?, post_id = ?, updated_at = ? WHERE idempotency_key = ?",
+                    (DONE, post_id, finished_at, idempotency_key)
+                )
+            elif idempotency_key:
+                conn.execute(
+                    "DELETE FROM post_keys WHERE idempotency_key = ? AND state = ?", (idempotency_key, PENDING)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return post_id
+    
+    def run(self, platform, content_type, content, publish, account=None, idempotency_key=None):
+        """
+        Publish through the history: check the key, call, record the result
+        النشر مع التسجيل ومنع التكرار
+        
+        Args:
+            platform (str): Platform name
+            content_type (str): Type of content
+            content (dict): Post arguments
+            publish (callable): Publishing call returning a result dict
+            account (str, optional): Account ID
+            idempotency_key (str, optional): Skip the call if this key already
+                succeeded (or is being posted right now)
+        
+        Returns:
+            dict: Publisher result, or the recorded one for a duplicate key
+        """
+        if idempotency_key:
+            existing = self.begin(idempotency_key)
+            if existing is not None:
+                self.logger.info(f"Skipping {platform} post: idempotency key {idempotency_key} already used")
+                return existing
+        
+        started_at = time.time()
+        try:
+            result = publish()
+        except BaseException as e:
+            self._record_safely(platform, content_type, content, {'success': False, 'error': str(e)},
+                                started_at, account, idempotency_key)
+            raise
+        self._record_safely(platform, content_type, content, result, started_at, account, idempotency_key)
+        return result
+    
+    def run_future(self, platform, content_type, content, publish, account=None, idempotency_key=None):
+        """
+        Same as run for calls that return a Future (e.g. post_video_async)
+        
+        Returns:
+            Future: Resolves to the publisher result, or at once to the
+                recorded one for a duplicate key
+        """
+        if idempotency_key:
+            existing = self.begin(idempotency_key)
+            if existing is not None:
+                future = Future()
+                future.set_result(existing)
+                return future
+        
+        def settle(done):
+            if done.cancelled():
+                result = {'success': False, 'error': 'Cancelled'}
+            elif done.exception() is not None:
+                result = {'success': False, 'error': str(done.exception())}
+            else:
+                result = done.result()
+            self._record_safely(platform, content_type, content, result, started_at, account, idempotency_key)
+        
+        started_at = time.time()
+        try:
+            future = publish()
+        except BaseException as e:
+            # Nothing was started: release the key so a retry may post
+            self._record_safely(platform, content_type, content, {'success': False, 'error': str(e)},
+                                started_at, account, idempotency_key)
+            raise
+        future.add_done_callback(settle)
+        return future
+    
+    async def run_async(self, platform, content_type, content, publish, account=None, idempotency_key=None):
+        """
+        Same as run for coroutine publishing calls; database access happens
+        on a worker thread so the event loop is never blocked
+        
+        Returns:
+            dict: Publisher result, or the recorded one for a duplicate key
+        """
+        if idempotency_key:
+            existing = await asyncio.to_thread(self.begin, idempotency_key)
+            if existing is not None:
+                return existing
+        
+        started_at = time.time()
+        try:
+            result = await publish()
+        except BaseException as e:
+            await asyncio.to_thread(self._record_safely, platform, content_type, content,
+                                    {'success': False, 'error': str(e)}, started_at, account, idempotency_key)
+            raise
+        await asyncio.to_thread(self._record_safely, platform, content_type, content, result,
+                                started_at, account, idempotency_key)
+        return result
+    
+    def _record_safely(self, *args):
+        """Record a result; a history failure never fails the post itself"""
+        try:
+            self.record(*args)
+        except sqlite3.Error as e:
+            self.logger.warning(f"⚠️ Could not record post in history: {e}")
+    
+    def find(self, idempotency_key):
+        """
+        Get the successful post recorded for an idempotency key
+        
+        Args:
+            idempotency_key (str): Idempotency key
+        
+        Returns:
+            dict: History entry, or None
+        """
+        row = self._connection().execute(
+            "SELECT p.* FROM post_keys k JOIN posts p ON p.id = k.post_id "
+            "WHERE k.idempotency_key = ? AND k.state = ?",
+            (idempotency_key, DONE)
+        ).fetchone()
+        return self._entry(row) if row else None
+    
+    def recent(self, platform=None, account=None, since=None, until=None, success=None,
+               content_hash=None, limit=100, before_id=None):
+        """
+        Query recent history, newest first
+        استعلام عن المنشورات الأخيرة
+        
+        Every filter combination is served from an index, so queries stay
+        fast at millions of rows. Page through long results by passing the
+        last entry's 'id' as before_id.
+        
+        Args:
+            platform (str, optional): Platform name
+            account (str, optional): Account ID ('' = the Config credentials);
+                needs platform to use its index
+            since (float, optional): Earliest finish time (Unix seconds)
+            until (float, optional): Latest finish time (Unix seconds)
+            success (bool, optional): Only successful or only failed posts
+            content_hash (str, optional): Only posts of this content
+                (see content_hash())
+            limit (int): Maximum entries returned
+            before_id (int, optional): Only entries older than this history ID
+        
+        Returns:
+            list: History entries (dicts)
+        """
+        clauses = []
+        params = []
+        for column, value in (('platform', platform), ('account', account), ('content_hash', content_hash)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("finished_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("finished_at <= ?")
+            params.append(until)
+        if success is not None:
+            # A literal, so failed-only queries can use the partial index
+            clauses.append("success = 1" if success else "success = 0")
+        if before_id is not None:
+            clauses.append("(finished_at, id) < (SELECT finished_at, id FROM posts WHERE id = ?)")
+            params.append(before_id)
+        
+        query = "SELECT * FROM posts"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY finished_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return [self._entry(row) for row in self._connection().execute(query, params)]
+    
+    @staticmethod
+    def _entry(row):
+        entry = dict(row)
+        entry['success'] = bool(entry['success'])
+        entry['result'] = json.loads(entry['result']) if entry['result'] else None
+        return entry
+
+
+_default_history = None
+_default_lock = threading.Lock()
+
+
+def get_post_history():
+    """
+    Get the process-wide post history, or None when it is disabled
+    
+    Returns:
+        PostHistory: Shared history
+    """
+    global _default_history
+    
+    if not Config.POST_HISTORY_ENABLED:
+        return None
+    if _default_history is None:
+        with _default_lock:
+            if _default_history is None:
+                _default_history = PostHistory()
+    return _default_history
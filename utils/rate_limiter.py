@@ -0,0 +1,395 @@
+"""
+Rate Limiter Utility
+أداة تحديد معدل الطلبات
+
+Token buckets per platform, access token and page that adapt to the API
+usage headers and throttling errors returned by each platform
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+import requests
+
+from config import Config
+from utils.logger import setup_logger
+
+
+# Graph API throttling error codes / رموز أخطاء تجاوز الحد
+APP_THROTTLE_CODES = {4}
+TOKEN_THROTTLE_CODES = {17, 613}
+PAGE_THROTTLE_CODES = {32} | set(range(80000, 80015))
+
+
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """Raised when a call would have to wait longer than allowed for quota"""
+
+
+class TokenBucket:
+    """Token bucket with an adjustable refill rate / دلو رموز بمعدل متغير"""
+    
+    def __init__(self, rate, capacity, min_factor=0.05, recovery=None):
+        """
+        Initialize token bucket
+        
+        Args:
+            rate (float): Tokens added per second at full speed
+            capacity (float): Maximum burst size
+            min_factor (float): Lowest fraction of the base rate to adapt down to
+            recovery (float, optional): Seconds for a slowed-down rate to double
+                again, once any pause is over (defaults to Config.RATE_LIMIT_RECOVERY)
+        """
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.min_factor = min_factor
+        self.recovery = recovery or Config.RATE_LIMIT_RECOVERY
+        self.tokens = capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        # Climb back toward full speed; platforms without usage headers never report recovery
+        if self.rate < self.base_rate and now > self.blocked_until:
+            since = max(self._updated, self.blocked_until)
+            self.rate = min(self.base_rate, self.rate * 2 ** ((now - since) / self.recovery))
+        self._updated = now
+    
+    def reserve(self, max_wait=None):
+        """
+        Reserve one token
+        
+        Tokens may go negative; later callers queue behind earlier ones
+        instead of racing for the same refill.
+        
+        Args:
+            max_wait (float, optional): Give up instead of waiting longer than this
+        
+        Returns:
+            float: Seconds to wait before using the token, or None if that
+                would exceed max_wait (no token is taken then)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(self.blocked_until - now, 0.0)
+            if self.tokens < 1:
+                wait = max(wait, (1 - self.tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+    
+    def refund(self):
+        """Give back a token taken by reserve() for a call that was not made"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+    
+    def adapt(self, factor):
+        """
+        Scale the refill rate relative to the base rate
+        
+        Args:
+            factor (float): Fraction of the base rate (clamped to [min_factor, 1])
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = self.base_rate * max(self.min_factor, min(1.0, factor))
+    
+    def block(self, seconds):
+        """
+        Stop handing out tokens for a while
+        
+        Args:
+            seconds (float): Pause length
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, 0)
+            self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+def usage_factor(usage):
+    """
+    Map a platform usage percentage to a refill-rate factor
+    
+    Full speed below 50% usage, then slowing linearly to a trickle at 100%.
+    
+    Args:
+        usage (float): Highest reported usage percentage
+    
+    Returns:
+        float: Rate factor
+    """
+    if usage < 50:
+        return 1.0
+    return max(0.0, (100 - usage) / 50)
+
+
+def _max_usage(stats):
+    """Highest of the call count / CPU time / total time percentages"""
+    return max(
+        float(stats.get('call_count', 0) or 0),
+        float(stats.get('total_cputime', 0) or 0),
+        float(stats.get('total_time', 0) or 0)
+    )
+
+
+class RateLimiter:
+    """Per-platform, per-token and per-page rate limiting / تحديد المعدل لكل منصة وحساب"""
+    
+    def __init__(self, app_rate=None, account_rate=None, burst=None, max_wait=None, cooldown=None,
+                 recovery=None):
+        """
+        Initialize rate limiter
+        
+        Args:
+            app_rate (float, optional): Calls per minute per platform
+                (defaults to Config.RATE_LIMIT_APP_PER_MINUTE)
+            account_rate (float, optional): Calls per minute per token and per page
+                (defaults to Config.RATE_LIMIT_ACCOUNT_PER_MINUTE)
+            burst (int, optional): Bucket capacity (defaults to Config.RATE_LIMIT_BURST)
+            max_wait (float, optional): Longest a caller is delayed before the
+                call is rejected (defaults to Config.RATE_LIMIT_MAX_WAIT)
+            cooldown (float, optional): Pause after a throttling error with no
+                reported recovery time (defaults to Config.RATE_LIMIT_COOLDOWN)
+            recovery (float, optional): Seconds for a throttled bucket's rate to
+                double again after its pause (defaults to Config.RATE_LIMIT_RECOVERY)
+        """
+        self.logger = setup_logger(__name__)
+        self.app_rate = (app_rate or Config.RATE_LIMIT_APP_PER_MINUTE) / 60.0
+        self.account_rate = (account_rate or Config.RATE_LIMIT_ACCOUNT_PER_MINUTE) / 60.0
+        self.burst = burst or Config.RATE_LIMIT_BURST
+        self.max_wait = Config.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+        self.cooldown = Config.RATE_LIMIT_COOLDOWN if cooldown is None else cooldown
+        self.recovery = recovery or Config.RATE_LIMIT_RECOVERY
+        
+        self._buckets = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _fingerprint(token):
+        """Short, non-reversible identifier for an access token"""
+        return hashlib.sha1(token.encode('utf-8')).hexdigest()[:12] if token else None
+    
+    def _keys(self, platform, token=None, page=None):
+        """Bucket keys for a call, from widest to narrowest"""
+        keys = [(platform, 'app', None)]
+        if token:
+            keys.append((platform, 'token', self._fingerprint(token)))
+        if page:
+            keys.append((platform, 'page', str(page)))
+        return keys
+    
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    rate = self.app_rate if key[1] == 'app' else self.account_rate
+                    bucket = TokenBucket(rate, self.burst, recovery=self.recovery)
+                    self._buckets[key] = bucket
+        return bucket
+    
+    def acquire(self, platform, token=None, page=None):
+        """
+        Wait until the platform, token and page buckets all allow a call
+        انتظار السماح بالطلب حسب الحصة
+        
+        Args:
+            platform (str): Platform name
+            token (str, optional): Access token used for the call
+            page (str, optional): Page or account ID the call targets
+        
+        Returns:
+            float: Seconds the caller was delayed
+        
+        Raises:
+            RateLimitExceeded: If the call would be delayed longer than max_wait
+        """
+        wait = self.reserve(platform, token, page)
+        if wait > 0:
+            self.logger.debug(f"Rate limiting {platform}: waiting {wait:.2f}s")
+            time.sleep(wait)
+        return wait
+    
+    def reserve(self, platform, token=None, page=None):
+        """
+        Take a call from the platform, token and page buckets without waiting
+        
+        The caller must wait the returned delay before making the call; this
+        lets asyncio code wait with asyncio.sleep instead of blocking.
+        
+        Args:
+            platform (str): Platform name
+            token (str, optional): Access token used for the call
+            page (str, optional): Page or account ID the call targets
+        
+        Returns:
+            float: Seconds to wait before the call
+        
+        Raises:
+            RateLimitExceeded: If the call would be delayed longer than max_wait
+        """
+        wait = 0.0
+        taken = []
+        for key in self._keys(platform, token, page):
+            bucket = self._bucket(key)
+            reserved = bucket.reserve(self.max_wait)
+            if reserved is None:
+                # The call is not made: the wider buckets get their tokens back
+                for earlier in taken:
+                    earlier.refund()
+                raise RateLimitExceeded(f"{platform} rate limit: quota exhausted for {key[1]} {key[2] or ''}".strip())
+            taken.append(bucket)
+            wait = max(wait, reserved)
+        return wait
+    
+    def refund(self, platform, token=None, page=None):
+        """
+        Give back a call reserved with reserve() that was never made
+        
+        Args:
+            platform (str): Platform name
+            token (str, optional): Access token used for the call
+            page (str, optional): Page or account ID the call targets
+        """
+        for key in self._keys(platform, token, page):
+            self._bucket(key).refund()
+    
+    def observe(self, platform, response, token=None, page=None):
+        """
+        Adapt the buckets to the usage headers and errors of a response
+        
+        Args:
+            platform (str): Platform name
+            response (requests.Response): Response to inspect
+            token (str, optional): Access token used for the call
+            page (str, optional): Page or account ID the call targeted
+        
+        Returns:
+            bool: True if the response shows the call was throttled
+        """
+        app_key, *rest = self._keys(platform, token, page)
+        token_key = rest[0] if token else None
+        page_key = rest[-1] if page else (token_key or app_key)
+        headers = response.headers
+        
+        # App-wide usage (Graph API)
+        app_usage = self._parse_json_header(headers.get('X-App-Usage'))
+        if app_usage:
+            self._apply_usage(app_key, _max_usage(app_usage))
+        
+        # Page usage (Graph API)
+        page_usage = self._parse_json_header(headers.get('X-Page-Usage'))
+        if page_usage:
+            self._apply_usage(page_key, _max_usage(page_usage))
+        
+        # Business use case usage, with an estimated time to regain access in minutes
+        buc_usage = self._parse_json_header(headers.get('X-Business-Use-Case-Usage'))
+        if buc_usage:
+            usage = 0.0
+            regain = 0.0
+            for entries in buc_usage.values():
+                for entry in entries if isinstance(entries, list) else [entries]:
+                    usage = max(usage, _max_usage(entry))
+                    regain = max(regain, float(entry.get('estimated_time_to_regain_access', 0) or 0))
+            self._apply_usage(page_key, usage)
+            if regain > 0:
+                self._throttle(page_key, regain * 60)
+        
+        if response.status_code < 400:
+            return False
+        
+        # Explicit throttling errors
+        if response.status_code == 429:
+            retry_after = headers.get('Retry-After')
+            seconds = float(retry_after) if retry_after and retry_after.isdigit() else self.cooldown
+            self._throttle(token_key or page_key, seconds)
+            return True
+        
+        code = self._error_code(response)
+        if code in APP_THROTTLE_CODES:
+            self._throttle(app_key, self.cooldown)
+        elif code in TOKEN_THROTTLE_CODES:
+            self._throttle(token_key or app_key, self.cooldown)
+        elif code in PAGE_THROTTLE_CODES:
+            self._throttle(page_key, self.cooldown)
+        else:
+            return False
+        return True
+    
+    def _apply_usage(self, key, usage):
+        """Slow a bucket down as usage climbs, and pause it at the ceiling"""
+        self._bucket(key).adapt(usage_factor(usage))
+        if usage >= 100:
+            self._throttle(key, self.cooldown)
+    
+    def _throttle(self, key, seconds):
+        """Pause a bucket and halve its rate"""
+        bucket = self._bucket(key)
+        bucket.adapt(bucket.rate / bucket.base_rate / 2)
+        bucket.block(seconds)
+        self.logger.warning(f"⚠️  {key[0]} throttled ({key[1]}): pausing {seconds:.0f}s")
+    
+    @staticmethod
+    def _parse_json_header(value):
+        if not value:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    
+    @staticmethod
+    def _error_code(response):
+        try:
+            error = response.json().get('error', {})
+            return int(error.get('code'))
+        except (ValueError, TypeError, AttributeError):
+            return None
+    
+    def status(self):
+        """
+        Snapshot of the current bucket rates
+        
+        Returns:
+            dict: {"platform:level:id": {'rate_per_minute', 'tokens', 'blocked_for'}}
+        """
+        now = time.monotonic()
+        with self._lock:
+            buckets = list(self._buckets.items())
+        return {
+            ':'.join(str(part) for part in key if part is not None): {
+                'rate_per_minute': round(bucket.rate * 60, 2),
+                'tokens': round(bucket.tokens, 2),
+                'blocked_for': round(max(0.0, bucket.blocked_until - now), 1)
+            }
+            for key, bucket in buckets
+        }
+
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """
+    Get the process-wide shared rate limiter
+    
+    Returns:
+        RateLimiter: Shared rate limiter
+    """
+    global _default_limiter
+    
+    if _default_limiter is None:
+        with _default_lock:
+            if _default_limiter is None:
+                _default_limiter = RateLimiter()
+    return _default_limiter
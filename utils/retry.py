@@ -0,0 +1,254 @@
+"""
+Retry Utility
+أداة إعادة المحاولة وقواطع الدائرة
+
+Retry policy with exponential backoff and jitter, and per-platform circuit
+breakers that shed load while a platform is failing
+"""
+
+import random
+import threading
+import time
+
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from config import Config
+from utils.logger import setup_logger
+
+
+# Circuit breaker states / حالات قاطع الدائرة
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Graph API error codes that are documented as temporary
+TRANSIENT_GRAPH_CODES = {1, 2}
+
+
+def _never_connected(error):
+    """Whether a ConnectionError failed before a connection was made (refused, DNS)"""
+    reason = error.args[0] if error.args else None
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    # NameResolutionError is a NewConnectionError
+    return isinstance(reason, NewConnectionError)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised when a call is rejected because the platform circuit is open"""
+
+
+def _graph_error(response):
+    """Get the Graph API error object from a response, if any"""
+    try:
+        error = response.json().get('error')
+        return error if isinstance(error, dict) else None
+    except (ValueError, AttributeError):
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter / سياسة إعادة المحاولة"""
+    
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None):
+        """
+        Initialize retry policy
+        
+        Args:
+            max_attempts (int, optional): Attempts including the first one
+                (defaults to Config.RETRY_MAX_ATTEMPTS)
+            base_delay (float, optional): Delay before the first retry in seconds
+                (defaults to Config.RETRY_BASE_DELAY)
+            max_delay (float, optional): Upper bound for a single delay
+                (defaults to Config.RETRY_MAX_DELAY)
+        """
+        self.max_attempts = max_attempts or Config.RETRY_MAX_ATTEMPTS
+        self.base_delay = Config.RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = Config.RETRY_MAX_DELAY if max_delay is None else max_delay
+    
+    def delay(self, attempt):
+        """
+        Delay before the next attempt
+        
+        Args:
+            attempt (int): Number of the attempt that just failed (1-based)
+        
+        Returns:
+            float: Seconds to sleep
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+    
+    @staticmethod
+    def is_retryable(response=None, error=None, idempotent=False):
+        """
+        Decide whether a failed call is worth retrying
+        
+        Non-idempotent calls (e.g. creating a post) are only retried when the
+        platform cannot have acted on them: connections that were never made
+        (connect timeouts, refused connections, DNS failures), 429 and 503
+        responses, and Graph errors flagged as transient. Idempotent calls
+        are also retried on read timeouts, connections dropped after the
+        request went out and other 5xx responses.
+        
+        Args:
+            response (requests.Response, optional): Response received
+            error (Exception, optional): Exception raised instead of a response
+            idempotent (bool): Whether repeating the call is safe
+        
+        Returns:
+            bool: True if the call should be retried
+        """
+        if error is not None:
+            if isinstance(error, (CircuitOpenError, requests.exceptions.RetryError)):
+                return False
+            if isinstance(error, requests.exceptions.ConnectTimeout):
+                return True
+            if isinstance(error, requests.exceptions.Timeout):
+                return idempotent
+            if isinstance(error, requests.exceptions.ConnectionError):
+                return _never_connected(error) or idempotent
+            return False
+        
+        if response is None or response.status_code < 400:
+            return False
+        if response.status_code in (429, 503):
+            return True
+        
+        graph_error = _graph_error(response)
+        if graph_error and (graph_error.get('is_transient') or graph_error.get('code') in TRANSIENT_GRAPH_CODES):
+            return True
+        
+        return idempotent and response.status_code >= 500
+
+
+class CircuitBreaker:
+    """Per-platform circuit breaker / قاطع دائرة لكل منصة"""
+    
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        """
+        Initialize circuit breaker
+        
+        Args:
+            name (str): Platform name
+            failure_threshold (int, optional): Consecutive failures that open the
+                circuit (defaults to Config.CIRCUIT_FAILURE_THRESHOLD)
+            reset_timeout (float, optional): Seconds to stay open before letting a
+                probe call through (defaults to Config.CIRCUIT_RESET_TIMEOUT)
+        """
+        self.logger = setup_logger(__name__)
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = Config.CIRCUIT_RESET_TIMEOUT if reset_timeout is None else reset_timeout
+        
+        self.state = CLOSED
+        self.failures = 0
+        self.retries = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+    
+    def before_call(self):
+        """
+        Check that a call may go through
+        
+        A probe that has not reported back within reset_timeout is given up
+        on, so a call that exits without recording its outcome cannot keep
+        the circuit half-open for good.
+        
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a probe
+                already in flight
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                if now - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"{self.name} circuit is open; skipping call")
+                self.state = HALF_OPEN
+                self._probing = False
+            
+            if self.state == HALF_OPEN:
+                if self._probing and now - self._probe_started < self.reset_timeout:
+                    raise CircuitOpenError(f"{self.name} circuit is half-open; probe in progress")
+                if self._probing:
+                    self.logger.warning(f"⚠️  {self.name} circuit probe did not report back; sending another")
+                self._probing = True
+                self._probe_started = now
+    
+    def record_success(self):
+        """Close the circuit after a healthy response"""
+        with self._lock:
+            if self.state != CLOSED:
+                self.logger.info(f"✓ {self.name} circuit closed")
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+    
+    def record_failure(self):
+        """Count a failure and open the circuit once the threshold is reached"""
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.logger.warning(f"⚠️  {self.name} circuit opened after {self.failures} failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+    
+    def release(self):
+        """Let another probe through after a call that never reached the platform"""
+        with self._lock:
+            self._probing = False
+    
+    def record_retry(self):
+        """Count a retried call"""
+        with self._lock:
+            self.retries += 1
+    
+    def status(self):
+        """
+        Current breaker state
+        
+        Returns:
+            dict: state, consecutive failures and total retries
+        """
+        with self._lock:
+            return {'state': self.state, 'failures': self.failures, 'retries': self.retries}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(platform):
+    """
+    Get the shared circuit breaker for a platform
+    
+    Args:
+        platform (str): Platform name
+    
+    Returns:
+        CircuitBreaker: Breaker for that platform
+    """
+    breaker = _breakers.get(platform)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(platform)
+            if breaker is None:
+                breaker = CircuitBreaker(platform)
+                _breakers[platform] = breaker
+    return breaker
+
+
+def circuit_status():
+    """
+    Status of every platform circuit breaker
+    
+    Returns:
+        dict: {platform: {'state', 'failures', 'retries'}}
+    """
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {platform: breaker.status() for platform, breaker in breakers.items()}
@@ -5,10 +5,15 @@ Validation Utility
 Validates URLs, file paths, and other inputs
 """
 
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 from urllib.parse import urlparse
 from pathlib import Path
 
+from utils.media_cache import get_media_index
+from utils.video_probe import ProbeError, check_platform_limits, probe_video
+
 
 def validate_url(url):
     """
@@ -51,23 +56,116 @@ def validate_file_path(file_path, check_exists=True):
         return False
 
 
-def validate_video_file(file_path, max_size_mb=100):
+def validate_video_file(file_path, max_size_mb=100, use_cache=True, platform=None, probe=True):
     """
     Validate video file
     التحقق من صحة ملف الفيديو
     
+    Container headers are probed in place (no decoding, no full read), so
+    broken files and files over a platform's limits are rejected before
+    any upload starts. Results are cached in the media index for as long
+    as the file's path, size and modification time stay the same.
+    
     Args:
         file_path (str): Path to video file
         max_size_mb (int): Maximum file size in MB
+        use_cache (bool): Reuse/record results in the media index
+        platform (str, optional): Platform whose limits to check
+            (e.g. 'instagram'); see PLATFORM_VIDEO_LIMITS
+        probe (bool): Read container metadata (duration, resolution, codecs)
     
     Returns:
-        dict: Validation result
+        dict: Validation result, with a 'metadata' dict when probed
     """
     if not validate_file_path(file_path):
         return {'valid': False, 'error': 'File not found'}
     
+    index = get_media_index() if use_cache else None
+    kind = _video_kind(max_size_mb, platform, probe)
+    if index:
+        cached = index.get_validation(file_path, kind)
+        if cached is not None:
+            return cached
+    
+    result = _check_video_file(file_path, max_size_mb, platform, probe)
+    
+    if index:
+        index.record_validation(file_path, kind, result)
+    return result
+
+
+def validate_video_files(file_paths, max_size_mb=100, platform=None, workers=None):
+    """
+    Validate many video files in parallel
+    التحقق من عدة ملفات فيديو بالتوازي
+    
+    Cached results are served from the media index; the remaining files
+    are probed in a process pool and their results recorded.
+    
+    Args:
+        file_paths (list): Paths to video files
+        max_size_mb (int): Maximum file size in MB
+        platform (str, optional): Platform whose limits to check
+        workers (int, optional): Worker processes (defaults to CPU count)
+    
+    Returns:
+        dict: file path -> validation result
+    """
+    index = get_media_index()
+    kind = _video_kind(max_size_mb, platform, True)
+    results = {}
+    pending = []
+    
+    for file_path in file_paths:
+        if not validate_file_path(file_path):
+            results[file_path] = {'valid': False, 'error': 'File not found'}
+            continue
+        cached = index.get_validation(file_path, kind) if index else None
+        if cached is not None:
+            results[file_path] = cached
+        else:
+            pending.append(file_path)
+    
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, len(pending) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as executor:
+            checked = executor.map(
+                _check_video_file,
+                pending,
+                [max_size_mb] * len(pending),
+                [platform] * len(pending),
+                chunksize=chunksize
+            )
+            for file_path, result in zip(pending, checked):
+                results[file_path] = result
+                if index:
+                    index.record_validation(file_path, kind, result)
+    
+    return {file_path: results[file_path] for file_path in file_paths}
+
+
+def _pool_context():
+    """
+    Start method for worker processes
+    
+    Forking copies the logging, poller and credential-refresh threads' locks
+    in whatever state they are in, so workers come from a clean forkserver
+    (or are spawned where there is none).
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _video_kind(max_size_mb, platform, probe):
+    """Media index cache key for a video validation"""
+    return f"video:{max_size_mb}:{platform or 'any'}:{'probe' if probe else 'stat'}"
+
+
+def _check_video_file(file_path, max_size_mb, platform=None, probe=True):
+    """Run the video file checks"""
     # Check file extension
-    valid_extensions = ['.mp4', '.mov', '.avi', '.mkv']
+    valid_extensions = ['.mp4', '.mov', '.avi', '.mkv', '.webm']
     path = Path(file_path)
     if path.suffix.lower() not in valid_extensions:
         return {'valid': False, 'error': f'Invalid file extension. Allowed: {valid_extensions}'}
@@ -77,7 +175,20 @@ def validate_video_file(file_path, max_size_mb=100):
     if file_size_mb > max_size_mb:
         return {'valid': False, 'error': f'File too large ({file_size_mb:.1f}MB). Max: {max_size_mb}MB'}
     
-    return {'valid': True, 'size_mb': file_size_mb}
+    if not probe:
+        return {'valid': True, 'size_mb': file_size_mb}
+    
+    # Check container metadata
+    try:
+        metadata = probe_video(file_path)
+    except (ProbeError, OSError) as e:
+        return {'valid': False, 'error': f'Unreadable video: {e}', 'size_mb': file_size_mb}
+    
+    errors = check_platform_limits(metadata, file_size_mb, platform) if platform else []
+    if errors:
+        return {'valid': False, 'error': '; '.join(errors), 'size_mb': file_size_mb, 'metadata': metadata}
+    
+    return {'valid': True, 'size_mb': file_size_mb, 'metadata': metadata}
 
 
 def validate_image_file(file_path, max_size_mb=10):
@@ -0,0 +1,424 @@
+"""
+Video Probe Utility
+أداة فحص ملفات الفيديو
+
+Reads container metadata (duration, resolution, codecs, bitrate) straight
+from MP4/MOV atoms, Matroska/WebM EBML headers and AVI RIFF headers through
+a memory map, without decoding or reading the media payload
+"""
+
+import mmap
+import os
+import struct
+
+
+class ProbeError(Exception):
+    """Raised when a file's container metadata cannot be read"""
+
+
+# Per-platform upload limits / حدود الرفع لكل منصة
+PLATFORM_VIDEO_LIMITS = {
+    'facebook': {
+        'containers': {'mp4', 'mov', 'matroska', 'webm', 'avi'},
+        'max_size_mb': 10 * 1024,
+        'max_duration': 240 * 60,
+        'min_duration': 1
+    },
+    'instagram': {
+        'containers': {'mp4', 'mov'},
+        'video_codecs': {'h264', 'hevc'},
+        'max_size_mb': 1024,
+        'max_duration': 15 * 60,
+        'min_duration': 3,
+        'max_width': 1920
+    },
+    'tiktok': {
+        'containers': {'mp4', 'mov', 'webm'},
+        'video_codecs': {'h264', 'hevc', 'vp8', 'vp9'},
+        'max_size_mb': 4 * 1024,
+        'max_duration': 10 * 60,
+        'min_duration': 1,
+        'min_height': 360,
+        'max_width': 4096
+    },
+    'youtube': {
+        'max_size_mb': 256 * 1024,
+        'max_duration': 12 * 60 * 60
+    }
+}
+
+# Codec identifiers normalized to short names
+CODEC_NAMES = {
+    'avc1': 'h264', 'avc3': 'h264', 'h264': 'h264', 'x264': 'h264', 'V_MPEG4/ISO/AVC': 'h264',
+    'hvc1': 'hevc', 'hev1': 'hevc', 'V_MPEGH/ISO/HEVC': 'hevc',
+    'vp08': 'vp8', 'V_VP8': 'vp8', 'vp09': 'vp9', 'V_VP9': 'vp9',
+    'av01': 'av1', 'V_AV1': 'av1',
+    'mp4v': 'mpeg4', 'xvid': 'mpeg4', 'divx': 'mpeg4', 'dx50': 'mpeg4',
+    'mp4a': 'aac', 'A_AAC': 'aac', 'ac-3': 'ac3', 'A_AC3': 'ac3', 'ec-3': 'eac3',
+    'Opus': 'opus', 'A_OPUS': 'opus', 'A_VORBIS': 'vorbis', '.mp3': 'mp3', 'A_MPEG/L3': 'mp3'
+}
+
+
+def _codec_name(raw):
+    raw = raw.strip('\x00 ')
+    return CODEC_NAMES.get(raw, CODEC_NAMES.get(raw.lower(), raw.lower()))
+
+
+def probe_video(file_path):
+    """
+    Read video metadata from the container headers
+    قراءة بيانات الفيديو من ترويسة الحاوية
+    
+    Args:
+        file_path (str): Path to video file
+    
+    Returns:
+        dict: container, duration (s), width, height, video_codec,
+            audio_codec, fps and bitrate (bits/s); missing values are None
+    
+    Raises:
+        ProbeError: If the container is unsupported or its headers are broken
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < 12:
+            raise ProbeError('File too small to be a video')
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                if data[4:8] in (b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip'):
+                    info = _probe_mp4(data, size)
+                elif data[0:4] == b'\x1a\x45\xdf\xa3':
+                    info = _probe_ebml(data, size)
+                elif data[0:4] == b'RIFF' and data[8:12] == b'AVI ':
+                    info = _probe_avi(data, size)
+                else:
+                    raise ProbeError('Unrecognized video container')
+            except (struct.error, IndexError, ValueError) as e:
+                raise ProbeError(f'Corrupt container headers: {e}')
+    
+    result = {
+        'container': None, 'duration': None, 'width': None, 'height': None,
+        'video_codec': None, 'audio_codec': None, 'fps': None, 'bitrate': None
+    }
+    result.update(info)
+    if result['duration']:
+        result['bitrate'] = int(size * 8 / result['duration'])
+    return result
+
+
+# --- MP4 / MOV ---------------------------------------------------------------
+
+def _iter_boxes(data, start, end):
+    """Yield (type, payload_start, box_end) for ISO-BMFF boxes in a range"""
+    offset = start
+    while offset + 8 <= end:
+        box_size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if box_size == 1:
+            box_size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif box_size == 0:
+            box_size = end - offset
+        if box_size < header or offset + box_size > end:
+            raise ProbeError(f'Invalid {box_type!r} box size')
+        yield box_type, offset + header, offset + box_size
+        offset += box_size
+
+
+def _find_box(data, start, end, box_type):
+    for found, payload, box_end in _iter_boxes(data, start, end):
+        if found == box_type:
+            return payload, box_end
+    return None
+
+
+def _probe_mp4(data, size):
+    info = {'container': 'mp4'}
+    
+    moov = None
+    for box_type, payload, box_end in _iter_boxes(data, 0, size):
+        if box_type == b'ftyp':
+            if data[payload:payload + 4] == b'qt  ':
+                info['container'] = 'mov'
+        elif box_type == b'moov':
+            moov = (payload, box_end)
+            break
+    if moov is None:
+        raise ProbeError('No moov atom found')
+    
+    mvhd = _find_box(data, moov[0], moov[1], b'mvhd')
+    if mvhd:
+        version = data[mvhd[0]]
+        if version == 1:
+            timescale, duration = struct.unpack_from('>IQ', data, mvhd[0] + 20)
+        else:
+            timescale, duration = struct.unpack_from('>II', data, mvhd[0] + 12)
+        if timescale:
+            info['duration'] = duration / timescale
+    
+    for box_type, payload, box_end in _iter_boxes(data, moov[0], moov[1]):
+        if box_type == b'trak':
+            _probe_mp4_track(data, payload, box_end, info)
+    return info
+
+
+def _probe_mp4_track(data, start, end, info):
+    mdia = _find_box(data, start, end, b'mdia')
+    if not mdia:
+        return
+    hdlr = _find_box(data, mdia[0], mdia[1], b'hdlr')
+    handler = data[hdlr[0] + 8:hdlr[0] + 12] if hdlr else b''
+    
+    codec = None
+    sample_count = None
+    minf = _find_box(data, mdia[0], mdia[1], b'minf')
+    stbl = _find_box(data, minf[0], minf[1], b'stbl') if minf else None
+    if stbl:
+        stsd = _find_box(data, stbl[0], stbl[1], b'stsd')
+        if stsd and struct.unpack_from('>I', data, stsd[0] + 4)[0] > 0:
+            codec = data[stsd[0] + 12:stsd[0] + 16].decode('latin-1')
+        stsz = _find_box(data, stbl[0], stbl[1], b'stsz')
+        if stsz:
+            sample_count = struct.unpack_from('>I', data, stsz[0] + 8)[0]
+    
+    if handler == b'vide' and info.get('video_codec') is None:
+        info['video_codec'] = _codec_name(codec) if codec else None
+        tkhd = _find_box(data, start, end, b'tkhd')
+        if tkhd:
+            width, height = struct.unpack_from('>II', data, tkhd[1] - 8)
+            info['width'] = width >> 16
+            info['height'] = height >> 16
+        
+        mdhd = _find_box(data, mdia[0], mdia[1], b'mdhd')
+        if mdhd and sample_count:
+            if data[mdhd[0]] == 1:
+                timescale, duration = struct.unpack_from('>IQ', data, mdhd[0] + 20)
+            else:
+                timescale, duration = struct.unpack_from('>II', data, mdhd[0] + 12)
+            if timescale and duration:
+                info['fps'] = round(sample_count * timescale / duration, 3)
+    elif handler == b'soun' and info.get('audio_codec') is None:
+        info['audio_codec'] = _codec_name(codec) if codec else None
+
+
+# --- Matroska / WebM ---------------------------------------------------------
+
+EBML_DOCTYPE = 0x4282
+MKV_SEGMENT = 0x18538067
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACK_ENTRY = 0xAE
+MKV_TRACK_TYPE = 0x83
+MKV_CODEC_ID = 0x86
+MKV_VIDEO = 0xE0
+MKV_PIXEL_WIDTH = 0xB0
+MKV_PIXEL_HEIGHT = 0xBA
+MKV_DEFAULT_DURATION = 0x23E383
+MKV_CLUSTER = 0x1F43B675
+
+
+def _read_vint(data, offset, keep_marker):
+    """Read an EBML variable-length integer; returns (value, length, unknown)"""
+    first = data[offset]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ProbeError('Invalid EBML variable-length integer')
+    
+    value = first if keep_marker else first & (mask - 1)
+    for i in range(1, length):
+        value = (value << 8) | data[offset + i]
+    unknown = not keep_marker and value == (1 << (7 * length)) - 1
+    return value, length, unknown
+
+
+def _iter_elements(data, start, end):
+    """Yield (id, payload_start, payload_end) for EBML elements in a range"""
+    offset = start
+    while offset < end:
+        element_id, id_length, _ = _read_vint(data, offset, keep_marker=True)
+        size, size_length, unknown = _read_vint(data, offset + id_length, keep_marker=False)
+        payload = offset + id_length + size_length
+        payload_end = end if unknown else min(payload + size, end)
+        yield element_id, payload, payload_end
+        if unknown:
+            return
+        offset = payload_end
+
+
+def _ebml_uint(data, start, end):
+    return int.from_bytes(data[start:end], 'big')
+
+
+def _ebml_float(data, start, end):
+    return struct.unpack('>f' if end - start == 4 else '>d', data[start:end])[0]
+
+
+def _probe_ebml(data, size):
+    info = {'container': 'matroska'}
+    segment = None
+    
+    for element_id, payload, payload_end in _iter_elements(data, 0, size):
+        if element_id == 0x1A45DFA3:
+            for child_id, child, child_end in _iter_elements(data, payload, payload_end):
+                if child_id == EBML_DOCTYPE and data[child:child_end].rstrip(b'\x00') == b'webm':
+                    info['container'] = 'webm'
+        elif element_id == MKV_SEGMENT:
+            segment = (payload, payload_end)
+            break
+    if segment is None:
+        raise ProbeError('No Matroska segment found')
+    
+    timecode_scale = 1000000
+    duration = None
+    found_info = found_tracks = False
+    
+    for element_id, payload, payload_end in _iter_elements(data, *segment):
+        if element_id == MKV_INFO:
+            found_info = True
+            for child_id, child, child_end in _iter_elements(data, payload, payload_end):
+                if child_id == MKV_TIMECODE_SCALE:
+                    timecode_scale = _ebml_uint(data, child, child_end)
+                elif child_id == MKV_DURATION:
+                    duration = _ebml_float(data, child, child_end)
+        elif element_id == MKV_TRACKS:
+            found_tracks = True
+            for child_id, child, child_end in _iter_elements(data, payload, payload_end):
+                if child_id == MKV_TRACK_ENTRY:
+                    _probe_mkv_track(data, child, child_end, info)
+        elif element_id == MKV_CLUSTER:
+            # Media data starts here; metadata is always written before it
+            break
+        if found_info and found_tracks:
+            break
+    
+    if duration is not None:
+        info['duration'] = duration * timecode_scale / 1e9
+    return info
+
+
+def _probe_mkv_track(data, start, end, info):
+    track_type = None
+    codec = None
+    width = height = None
+    frame_duration = None
+    
+    for element_id, payload, payload_end in _iter_elements(data, start, end):
+        if element_id == MKV_TRACK_TYPE:
+            track_type = _ebml_uint(data, payload, payload_end)
+        elif element_id == MKV_CODEC_ID:
+            codec = data[payload:payload_end].decode('latin-1')
+        elif element_id == MKV_DEFAULT_DURATION:
+            frame_duration = _ebml_uint(data, payload, payload_end)
+        elif element_id == MKV_VIDEO:
+            for child_id, child, child_end in _iter_elements(data, payload, payload_end):
+                if child_id == MKV_PIXEL_WIDTH:
+                    width = _ebml_uint(data, child, child_end)
+                elif child_id == MKV_PIXEL_HEIGHT:
+                    height = _ebml_uint(data, child, child_end)
+    
+    if track_type == 1 and info.get('video_codec') is None:
+        info['video_codec'] = _codec_name(codec) if codec else None
+        info['width'] = width
+        info['height'] = height
+        if frame_duration:
+            info['fps'] = round(1e9 / frame_duration, 3)
+    elif track_type == 2 and info.get('audio_codec') is None:
+        info['audio_codec'] = _codec_name(codec) if codec else None
+
+
+# --- AVI ---------------------------------------------------------------------
+
+def _iter_riff(data, start, end):
+    """Yield (fourcc, list_type, payload_start, chunk_end) for RIFF chunks"""
+    offset = start
+    while offset + 8 <= end:
+        fourcc, chunk_size = struct.unpack_from('<4sI', data, offset)
+        payload = offset + 8
+        chunk_end = min(payload + chunk_size, end)
+        list_type = data[payload:payload + 4] if fourcc in (b'LIST', b'RIFF') else None
+        yield fourcc, list_type, payload, chunk_end
+        offset = payload + chunk_size + (chunk_size & 1)
+
+
+def _probe_avi(data, size):
+    info = {'container': 'avi'}
+    riff_end = min(size, 8 + struct.unpack_from('<I', data, 4)[0])
+    
+    for fourcc, list_type, payload, chunk_end in _iter_riff(data, 12, riff_end):
+        if fourcc != b'LIST' or list_type != b'hdrl':
+            if list_type == b'movi':
+                break
+            continue
+        for sub, sub_type, sub_payload, sub_end in _iter_riff(data, payload + 4, chunk_end):
+            if sub == b'avih':
+                usec_per_frame, = struct.unpack_from('<I', data, sub_payload)
+                total_frames, = struct.unpack_from('<I', data, sub_payload + 16)
+                info['width'], info['height'] = struct.unpack_from('<II', data, sub_payload + 32)
+                if usec_per_frame:
+                    info['fps'] = round(1e6 / usec_per_frame, 3)
+                    info['duration'] = total_frames * usec_per_frame / 1e6
+            elif sub == b'LIST' and sub_type == b'strl':
+                strh = _find_riff(data, sub_payload + 4, sub_end, b'strh')
+                if strh is None:
+                    continue
+                stream_type = data[strh:strh + 4]
+                handler = data[strh + 4:strh + 8].decode('latin-1')
+                if stream_type == b'vids' and info.get('video_codec') is None:
+                    info['video_codec'] = _codec_name(handler)
+                elif stream_type == b'auds' and info.get('audio_codec') is None:
+                    info['audio_codec'] = 'pcm' if not handler.strip('\x00 ') else _codec_name(handler)
+        break
+    return info
+
+
+def _find_riff(data, start, end, fourcc):
+    for found, _, payload, _ in _iter_riff(data, start, end):
+        if found == fourcc:
+            return payload
+    return None
+
+
+def check_platform_limits(metadata, size_mb, platform):
+    """
+    Check probed metadata against a platform's upload limits
+    التحقق من حدود المنصة قبل الرفع
+    
+    Args:
+        metadata (dict): Result of probe_video
+        size_mb (float): File size in MB
+        platform (str): Platform name
+    
+    Returns:
+        list: Human-readable violations (empty if the file is acceptable)
+    """
+    limits = PLATFORM_VIDEO_LIMITS.get(platform)
+    if not limits:
+        return []
+    
+    errors = []
+    if 'containers' in limits and metadata['container'] not in limits['containers']:
+        errors.append(f"{metadata['container']} container not supported by {platform}")
+    if 'video_codecs' in limits and metadata['video_codec'] not in limits['video_codecs']:
+        errors.append(f"{metadata['video_codec']} codec not supported by {platform}")
+    if size_mb > limits.get('max_size_mb', float('inf')):
+        errors.append(f"File too large for {platform} ({size_mb:.1f}MB > {limits['max_size_mb']}MB)")
+    
+    duration = metadata['duration']
+    if duration is not None:
+        if duration > limits.get('max_duration', float('inf')):
+            errors.append(f"Video too long for {platform} ({duration:.0f}s > {limits['max_duration']}s)")
+        if duration < limits.get('min_duration', 0):
+            errors.append(f"Video too short for {platform} ({duration:.1f}s < {limits['min_duration']}s)")
+    
+    if metadata['width'] and metadata['width'] > limits.get('max_width', float('inf')):
+        errors.append(f"Video too wide for {platform} ({metadata['width']}px > {limits['max_width']}px)")
+    if metadata['height'] and metadata['height'] < limits.get('min_height', 0):
+        errors.append(f"Video resolution too low for {platform} ({metadata['height']}px < {limits['min_height']}px)")
+    return errors